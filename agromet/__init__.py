@@ -0,0 +1 @@
+"""Couche de données et de calcul de l'application AGROMET_RCI."""
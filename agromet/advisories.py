@@ -0,0 +1,271 @@
+"""Moteur de règles des avis et alertes agrométéorologiques.
+
+Les règles sont déclaratives : une catégorie, un niveau d'affichage, un
+message et une liste de conditions (variable, opérateur, seuil) qui doivent
+toutes être vérifiées. Elles sont compilées une fois en tableaux (variable,
+opérateur et seuil de chaque condition, appartenance des conditions aux
+règles), puis évaluées d'un coup sur le tableau des conditions les plus
+récentes de toutes les stations du réseau : une comparaison par opérateur
+sur (stations × conditions), puis un produit matriciel pour combiner les
+conditions de chaque règle.
+
+Les conditions observées (pluies, vent, réserve en eau, WRSI) sont tirées
+des séries contrôlées (une valeur rejetée par le contrôle qualité ne
+déclenche pas d'avis) et les conditions annoncées (vent prévu) viennent des
+prévisions journalières.
+
+Les résultats du réseau sont calculés une fois par jour et gardés dans le
+cache partagé ; l'interface n'en extrait que les stations de la région affichée.
+"""
+import operator
+import threading
+
+import numpy as np
+
+from agromet.cache import get_cache
+from agromet.forecasts import get_forecast_provider
+from agromet.soil import get_soil_balance
+from agromet.stations import STATIONS_DATA, all_stations, station_coordinates
+from agromet.wrsi import get_season_wrsi
+
+CATEGORIES = ('Riziculture', 'Cultures Vivrières', 'Alertes')
+# Niveaux d'affichage (success, info, warning, error de Streamlit)
+LEVELS = ('success', 'info', 'warning', 'error')
+
+# Jours d'observations utilisés pour les conditions récentes
+RECENT_DAYS = 15
+# Pluie journalière (mm) en deçà de laquelle un jour compte comme sec
+DRY_DAY_MM = 1.0
+# Jours de prévision (à partir du lendemain) des conditions annoncées
+FORECAST_HORIZON_DAYS = 3
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Variables disponibles dans les conditions (colonnes de ``station_conditions``)
+CONDITION_VARIABLES = {
+    'rain_day': 'Pluie du jour (mm)',
+    'rain_3d': 'Pluie des 3 derniers jours (mm)',
+    'rain_7d': 'Pluie des 7 derniers jours (mm)',
+    'dry_days': 'Jours secs consécutifs',
+    'wind_max_3d': 'Vent maximal sur 3 jours (m/s)',
+    'wind_forecast_3d': 'Vent maximal prévu sur 3 jours (m/s)',
+    'tmax_7d': 'Température max moyenne sur 7 jours (°C)',
+    'reserve_pct': 'Réserve en eau du sol (%)',
+    'wrsi_riz': 'WRSI Riz (%)',
+    'wrsi_mais': 'WRSI Maïs (%)',
+    'wrsi_arachide': 'WRSI Arachide (%)',
+}
+WRSI_VARIABLES = {'wrsi_riz': 'Riz', 'wrsi_mais': 'Maïs', 'wrsi_arachide': 'Arachide'}
+
+
+class AdvisoryRule:
+    """Avis affiché lorsque toutes les conditions (variable, opérateur, seuil) sont vérifiées."""
+
+    def __init__(self, category, level, message, conditions):
+        self.category = category
+        self.level = level
+        self.message = message
+        self.conditions = conditions
+
+
+RULES = [
+    # Riziculture
+    AdvisoryRule('Riziculture', 'success', "✅ **Préparation des champs**: Conditions favorables pour le labour",
+                 [('reserve_pct', '>=', 30), ('rain_3d', '<', 40)]),
+    AdvisoryRule('Riziculture', 'warning', "⚠️ **Préparation des champs**: Sol trop sec, attendre les prochaines pluies pour le labour",
+                 [('reserve_pct', '<', 30)]),
+    AdvisoryRule('Riziculture', 'success', "🌱 **Semis**: Période optimale pour les variétés précoces",
+                 [('wrsi_riz', '>=', 80)]),
+    AdvisoryRule('Riziculture', 'warning', "⚠️ **Semis**: Besoins en eau mal couverts, privilégier les variétés tolérantes à la sécheresse",
+                 [('wrsi_riz', '<', 60)]),
+    AdvisoryRule('Riziculture', 'warning', "💧 **Irrigation**: Maintenir 5cm d'eau dans les rizières",
+                 [('reserve_pct', '<', 50)]),
+    AdvisoryRule('Riziculture', 'warning', "🚜 **Travaux**: Éviter les interventions mécaniques lourdes",
+                 [('rain_3d', '>=', 40)]),
+    AdvisoryRule('Riziculture', 'success', "🌿 **Fertilisation**: Apporter l'engrais de fond avant repiquage",
+                 [('reserve_pct', '>=', 50), ('rain_day', '<', 20)]),
+    # Cultures vivrières
+    AdvisoryRule('Cultures Vivrières', 'warning', "⚠️ **Maïs**: Reporter les semis de 7 jours",
+                 [('wrsi_mais', '<', 60)]),
+    AdvisoryRule('Cultures Vivrières', 'success', "✅ **Maïs**: Conditions favorables pour le semis",
+                 [('wrsi_mais', '>=', 80)]),
+    AdvisoryRule('Cultures Vivrières', 'success', "✅ **Igname**: Conditions favorables pour la plantation",
+                 [('reserve_pct', '>=', 50)]),
+    AdvisoryRule('Cultures Vivrières', 'success', "🌿 **Légumineuses**: Période idéale pour le semis",
+                 [('wrsi_arachide', '>=', 80)]),
+    AdvisoryRule('Cultures Vivrières', 'warning', "⚠️ **Légumineuses**: Reporter les semis d'arachide",
+                 [('wrsi_arachide', '<', 60)]),
+    AdvisoryRule('Cultures Vivrières', 'warning', "💨 **Protection**: Installer des brise-vents si nécessaire",
+                 [('wind_max_3d', '>=', 6)]),
+    AdvisoryRule('Cultures Vivrières', 'warning', "🐛 **Phytosanitaire**: Surveiller les attaques de chenilles",
+                 [('rain_7d', '>=', 30), ('tmax_7d', '>=', 30)]),
+    # Alertes
+    AdvisoryRule('Alertes', 'warning', "🌧️ **Fort risque de pluies intenses**: Sécuriser les récoltes en cours de séchage",
+                 [('rain_3d', '>=', 50)]),
+    AdvisoryRule('Alertes', 'error', "💨 **Vents forts prévus**: Renforcer les tuteurages des jeunes plants",
+                 [('wind_forecast_3d', '>=', 7)]),
+    AdvisoryRule('Alertes', 'info', "☀️ **Période sèche prolongée**: Planifier l'irrigation des cultures sensibles",
+                 [('dry_days', '>=', 5)]),
+    AdvisoryRule('Alertes', 'error', "🏜️ **Réserve en eau critique**: Irriguer en priorité les cultures en floraison",
+                 [('reserve_pct', '<', 30)]),
+]
+
+
+class CompiledRules:
+    """Règles mises sous forme de tableaux pour une évaluation vectorisée."""
+
+    def __init__(self, rules, variables=tuple(CONDITION_VARIABLES)):
+        self.rules = list(rules)
+        self.variables = list(variables)
+        conditions = [(row, condition) for row, rule in enumerate(self.rules) for condition in rule.conditions]
+        for rule in self.rules:
+            if rule.category not in CATEGORIES or rule.level not in LEVELS:
+                raise ValueError(f"Règle invalide : {rule.message}")
+        for _, (variable, op, _) in conditions:
+            if variable not in self.variables or op not in OPERATORS:
+                raise ValueError(f"Condition invalide : {variable} {op}")
+
+        self.columns = np.array([self.variables.index(variable) for _, (variable, _, _) in conditions], dtype=np.int64)
+        self.thresholds = np.array([threshold for _, (_, _, threshold) in conditions], dtype=np.float64)
+        operators = [op for _, (_, op, _) in conditions]
+        # Conditions regroupées par opérateur : une comparaison par opérateur
+        self.groups = [(OPERATORS[op], np.array([i for i, o in enumerate(operators) if o == op]))
+                       for op in sorted(set(operators))]
+        # Appartenance des conditions aux règles (conditions × règles)
+        self.membership = np.zeros((len(conditions), len(self.rules)), dtype=np.float64)
+        self.membership[np.arange(len(conditions)), [row for row, _ in conditions]] = 1.0
+
+    def evaluate(self, conditions):
+        """Règles déclenchées (N, R) pour le tableau des conditions (N, variables).
+
+        Une condition portant sur une valeur manquante (NaN) n'est pas vérifiée.
+        """
+        conditions = np.asarray(conditions, dtype=np.float64)
+        values = conditions[:, self.columns]
+        satisfied = np.zeros(values.shape, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for compare, members in self.groups:
+                satisfied[:, members] = compare(values[:, members], self.thresholds[members])
+        # Une règle est déclenchée quand aucune de ses conditions n'échoue
+        return (~satisfied).astype(np.float64) @ self.membership == 0
+
+
+def _consecutive_dry_days(rain):
+    # Jours secs consécutifs se terminant au dernier jour de la fenêtre
+    wet = ~(rain < DRY_DAY_MM)
+    last_wet = np.where(wet.any(axis=1), rain.shape[1] - 1 - np.argmax(wet[:, ::-1], axis=1), -1)
+    return (rain.shape[1] - 1 - last_wet).astype(np.float64)
+
+
+def station_conditions(store, normals, stations, day, forecast=None):
+    """Conditions les plus récentes (N, variables) des stations, à la date `day`.
+
+    `forecast` donne les prévisions journalières ({variable: (N, jours)})
+    des jours qui suivent `day`.
+    """
+    day = np.datetime64(day, 'D')
+    _, values = store.read_many(stations, day - (RECENT_DAYS - 1), day, columns=('tmax', 'rain', 'wind'))
+    rain = values['rain'].astype(np.float64)
+    balance = get_soil_balance(store)
+    balance.update(day)
+    _, reserve = balance.series(stations, day, day)
+
+    with np.errstate(invalid='ignore'):
+        table = {
+            'rain_day': rain[:, -1],
+            'rain_3d': np.nansum(rain[:, -3:], axis=1),
+            'rain_7d': np.nansum(rain[:, -7:], axis=1),
+            'dry_days': _consecutive_dry_days(rain),
+            'wind_max_3d': np.max(np.where(np.isnan(values['wind'][:, -3:]), -np.inf, values['wind'][:, -3:]), axis=1).astype(np.float64),
+            'tmax_7d': np.nanmean(values['tmax'][:, -7:].astype(np.float64), axis=1),
+            'reserve_pct': reserve[:, -1].astype(np.float64) / balance.capacity * 100,
+        }
+    table['wind_max_3d'][np.isinf(table['wind_max_3d'])] = np.nan
+    # Vent prévu : NaN (aucun avis) pour les stations sans prévision
+    table['wind_forecast_3d'] = np.full(len(stations), np.nan)
+    if forecast is not None:
+        wind = forecast['wind'][:, :FORECAST_HORIZON_DAYS]
+        known = ~np.isnan(wind).all(axis=1)
+        table['wind_forecast_3d'][known] = np.nanmax(wind[known], axis=1)
+
+    # WRSI de chaque station à la meilleure date de semis de sa région
+    season = int(str(day.astype('datetime64[Y]')))
+    rows = {station: row for row, station in enumerate(stations)}
+    for variable in WRSI_VARIABLES:
+        table[variable] = np.full(len(stations), np.nan)
+    for region, region_stations in STATIONS_DATA.items():
+        members = [station for station in region_stations if station in rows]
+        if not members:
+            continue
+        result = get_season_wrsi(store, normals, region, season, day)
+        for variable, crop in WRSI_VARIABLES.items():
+            best = result.best_sowing(crop)
+            crop_wrsi = result.wrsi[:, result.crop_index(crop), best]
+            for station in members:
+                table[variable][rows[station]] = crop_wrsi[result.stations.index(station)]
+
+    return np.stack([table[variable] for variable in CONDITION_VARIABLES], axis=1)
+
+
+class NetworkAdvisories:
+    """Règles déclenchées pour chaque station du réseau, un jour donné."""
+
+    def __init__(self, rules, stations, conditions, fired):
+        self.rules = rules
+        self.stations = stations
+        self.conditions = conditions
+        self.fired = fired
+
+    def region(self, region):
+        """Avis de la région par catégorie : [(niveau, message, stations concernées)].
+
+        Une règle est retenue dès qu'elle est déclenchée pour une station de
+        la région ; les règles gardent l'ordre de leur déclaration.
+        """
+        rows = [self.stations.index(station) for station in STATIONS_DATA[region]]
+        fired = self.fired[rows]
+        advice = {category: [] for category in CATEGORIES}
+        for column in np.flatnonzero(fired.any(axis=0)):
+            rule = self.rules[column]
+            stations = [self.stations[rows[i]] for i in np.flatnonzero(fired[:, column])]
+            advice[rule.category].append((rule.level, rule.message, stations))
+        return advice
+
+
+_compiled = None
+_lock = threading.Lock()
+
+
+def compiled_rules():
+    global _compiled
+    with _lock:
+        if _compiled is None:
+            _compiled = CompiledRules(RULES)
+        return _compiled
+
+
+def get_network_advisories(store, normals, day):
+    """Avis de toutes les stations pour `day`, calculés en une passe et mis en cache par jour.
+
+    L'entrée du jour est recalculée lorsque les données d'une station ou les
+    prévisions changent.
+    """
+    stations = all_stations()
+    provider = get_forecast_provider(store)
+    versions = (store.name, tuple(store.version(station) for station in stations), provider.version('daily'))
+
+    def build():
+        rules = compiled_rules()
+        # Lecture du cache des prévisions : le rafraîchissement se fait en arrière-plan
+        points = {station: station_coordinates(station) for station in stations}
+        dates = np.datetime64(day, 'D') + 1 + np.arange(FORECAST_HORIZON_DAYS)
+        forecast, _ = provider.daily(points, dates)
+        conditions = station_conditions(store, normals, stations, day, forecast)
+        return NetworkAdvisories(rules.rules, stations, conditions, rules.evaluate(conditions))
+
+    return get_cache().get('advisories', 'network', str(np.datetime64(day, 'D')), versions, build)
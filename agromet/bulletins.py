@@ -0,0 +1,209 @@
+"""Génération des bulletins agrométéorologiques (PDF et Excel) en arrière-plan.
+
+Les bulletins sont produits par un groupe de processus : un rendu long ne
+bloque jamais le fil d'exécution du script Streamlit, et les bulletins de
+toutes les régions se calculent en parallèle sur les cœurs disponibles.
+
+Un bulletin est identifié par (région, jour, version des données des
+stations de la région) : une observation reçue dans la journée produit un
+nouveau bulletin. Les données sont celles du stockage transmis à la
+demande (séries contrôlées lorsqu'elles sont prêtes). Les fichiers terminés sont gardés sur disque
+(``<données>/bulletins/<jour>/``) et resservis tels quels ; une demande
+identique à un travail en cours rejoint ce travail au lieu d'en lancer un
+second.
+
+Le bilan hydrique est avancé dans le processus de l'application, qui
+transmet la réserve du jour aux processus de rendu : ceux-ci n'écrivent
+que leurs propres fichiers.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from openpyxl import Workbook
+
+from agromet.dekads import dekad_of, get_aggregator
+from agromet.jobs import JobQueue
+from agromet.normals import get_normals
+from agromet.schema import DISPLAY_LABELS
+from agromet.soil import get_soil_balance
+from agromet.stations import STATIONS_DATA
+from agromet.store import StationStore, station_slug
+from agromet.wrsi import get_season_wrsi
+
+BULLETIN_FORMATS = ('pdf', 'xlsx')
+# Jours d'observations résumés par station dans le bulletin
+SUMMARY_DAYS = 7
+SOWING_CROP = 'Riz'
+
+
+def bulletin_name(region, day):
+    """Nom de base des fichiers du bulletin proposés au téléchargement."""
+    return f"bulletin_{station_slug(region)}_{day}"
+
+
+def bulletin_paths(data_root, region, day, version):
+    directory = os.path.join(data_root, 'bulletins', str(day))
+    name = f"{bulletin_name(region, day)}_{version}"
+    return {fmt: os.path.join(directory, f"{name}.{fmt}") for fmt in BULLETIN_FORMATS}
+
+
+def bulletin_content(store, region, day, reserve):
+    """Tableaux du bulletin de `region` pour `day` (date ``datetime64[D]``).
+
+    `reserve` donne la réserve en eau (%) de chaque station de la région
+    ce jour-là, tirée du bilan hydrique du processus de l'application.
+    Les normales ne sont que lues : leur index est construit par sa propre
+    file de travaux, et le bulletin échoue tant qu'il n'existe pas.
+    """
+    day = np.datetime64(day, 'D')
+    stations = list(STATIONS_DATA[region])
+    normals = get_normals(store)
+    if normals is None:
+        raise RuntimeError("normales climatologiques pas encore disponibles")
+
+    # Résumé des derniers jours par station
+    _, values = store.read_many(stations, day - (SUMMARY_DAYS - 1), day, columns=('tmin', 'tmax', 'rain'))
+    values = {name: column.astype(np.float64) for name, column in values.items()}
+    with np.errstate(invalid='ignore'):
+        observations = pd.DataFrame({
+            'Station': stations,
+            'Température Min moyenne (°C)': np.nanmean(values['tmin'], axis=1).round(1),
+            'Température Max moyenne (°C)': np.nanmean(values['tmax'], axis=1).round(1),
+            f'Pluie {SUMMARY_DAYS} jours (mm)': np.nansum(values['rain'], axis=1).round(1),
+            'Pluie du jour (mm)': values['rain'][:, -1].round(1),
+            'Réserve en eau (%)': np.asarray(reserve, dtype=np.float64).round(0),
+        })
+
+    # Décades écoulées de l'année
+    year = int(str(day.astype('datetime64[Y]')))
+    dekads = get_aggregator(store).region_frame(stations, year, normals.region_dekad_rain(region))
+    dekads = dekads.iloc[:int(dekad_of(day)) + 1]
+    columns = ['period', 'rain_obs', 'rain_normal', 'rain_dev', 'rain_dev_pct', 'rain_prev']
+    dekads = dekads[columns].astype({c: np.float64 for c in columns[1:]}).round(1).rename(columns=DISPLAY_LABELS)
+    dekads['Période'] = dekads['Période'].astype(str)
+
+    # Fenêtres de semis selon le WRSI de la campagne
+    season = get_season_wrsi(store, normals, region, year, day)
+    sowing = pd.DataFrame(
+        [(label, str(first), str(last), None if np.isnan(level) else round(level)) for label, first, last, level in season.sowing_windows(SOWING_CROP)],
+        columns=['Fenêtre', 'Du', 'Au', f'WRSI {SOWING_CROP} (%)']
+    )
+
+    return {
+        'region': region,
+        'day': pd.Timestamp(day).strftime('%d/%m/%Y'),
+        'sections': [
+            ('Observations des stations', observations),
+            ('Pluviométrie décadaire', dekads),
+            ('Dates de semis', sowing),
+        ],
+    }
+
+
+def _latin1(text):
+    # Les polices PDF de base ne couvrent que le latin-1 (pas d'émojis)
+    return str(text).encode('latin-1', 'ignore').decode('latin-1')
+
+
+def render_pdf(content, path):
+    pdf = FPDF(orientation='L')
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 16)
+    pdf.cell(0, 10, _latin1('AGROMET_RCI - Bulletin agrométéorologique'), new_x='LMARGIN', new_y='NEXT', align='C')
+    pdf.set_font('Helvetica', '', 12)
+    pdf.cell(0, 8, _latin1(f"Région {content['region']} - Bulletin du {content['day']}"), new_x='LMARGIN', new_y='NEXT', align='C')
+
+    for title, table in content['sections']:
+        pdf.ln(4)
+        pdf.set_font('Helvetica', 'B', 12)
+        pdf.cell(0, 8, _latin1(title), new_x='LMARGIN', new_y='NEXT')
+        width = pdf.epw / len(table.columns)
+        pdf.set_font('Helvetica', 'B', 8)
+        for column in table.columns:
+            pdf.cell(width, 7, _latin1(column), border=1, align='C')
+        pdf.ln()
+        pdf.set_font('Helvetica', '', 8)
+        for row in table.itertuples(index=False):
+            for value in row:
+                pdf.cell(width, 6, _latin1('' if pd.isna(value) else value), border=1, align='C')
+            pdf.ln()
+
+    pdf.ln(6)
+    pdf.set_font('Helvetica', 'I', 9)
+    pdf.cell(0, 6, _latin1('SODEXAM - Direction de la Météorologie Nationale'), align='C')
+    pdf.output(path)
+
+
+def render_excel(content, path):
+    workbook = Workbook(write_only=True)
+    for title, table in content['sections']:
+        sheet = workbook.create_sheet(title[:31])
+        sheet.append([f"Région {content['region']} - Bulletin du {content['day']}"])
+        sheet.append(list(table.columns))
+        for row in table.itertuples(index=False):
+            sheet.append([None if pd.isna(value) else value for value in row])
+    workbook.save(path)
+
+
+def render_bulletin(region, day, version, reserve, data_root, name='stations'):
+    """Point d'entrée des processus de rendu : écrit le PDF et l'Excel."""
+    paths = bulletin_paths(data_root, region, day, version)
+    os.makedirs(os.path.dirname(paths['pdf']), exist_ok=True)
+    content = bulletin_content(StationStore(data_root, name), region, day, reserve)
+    for fmt, render in (('pdf', render_pdf), ('xlsx', render_excel)):
+        # Écriture dans un fichier temporaire : un bulletin servi est toujours complet
+        tmp = f"{paths[fmt]}.tmp"
+        render(content, tmp)
+        os.replace(tmp, paths[fmt])
+    return paths
+
+
+class BulletinQueue(JobQueue):
+    """File des travaux de rendu, dédupliqués par (région, jour, version des données)."""
+
+    def __init__(self, data_root, max_workers=None):
+        super().__init__(data_root, max_workers)
+        # Réserve du jour et stockage lu par chaque rendu demandé
+        self._inputs = {}
+
+    def paths(self, key):
+        return bulletin_paths(self.data_root, *key)
+
+    def outputs(self, key):
+        return list(self.paths(key).values())
+
+    def task(self, key):
+        reserve, name = self._inputs[key]
+        return render_bulletin, *key, reserve, self.data_root, name
+
+    def submit(self, store, region, day):
+        """Demande le bulletin (région, jour) sur les données actuelles de `store` et retourne sa clé."""
+        day = np.datetime64(day, 'D')
+        versions = ','.join(f"{station}:{store.version(station)}" for station in STATIONS_DATA[region])
+        versions = f"{store.name};{versions}"
+        key = (region, str(day), hashlib.sha1(versions.encode('utf-8')).hexdigest()[:12])
+        # Bilan hydrique avancé avant la prise du verrou de la file : les
+        # processus de rendu ne reçoivent que la réserve du jour
+        balance = get_soil_balance(store)
+        balance.update(day)
+        _, reserve = balance.series(list(STATIONS_DATA[region]), day, day)
+        self._inputs[key] = ((reserve[:, -1] / balance.capacity * 100).tolist(), store.name)
+        return super().submit(key)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_bulletin_queue(store):
+    """File partagée par toutes les sessions du processus."""
+    global _queue
+    with _queue_lock:
+        if _queue is None or _queue.data_root != store.data_root:
+            _queue = BulletinQueue(store.data_root)
+        return _queue
@@ -0,0 +1,198 @@
+"""Cache partagé entre toutes les sessions du processus.
+
+Tableaux de stations, agrégats décadaires, sorties de modèles et figures
+sont rangés dans un même cache, sous la clé (jeu de données, station ou
+région, fenêtre) et avec la version des données dont ils sont issus :
+
+- une lecture dont la version diffère de celle de l'entrée la remplace ;
+  l'arrivée de nouvelles observations (qui fait évoluer la version des
+  stations concernées dans le stockage) invalide donc exactement les
+  entrées qui en dépendent ;
+- la taille totale des entrées est bornée par un budget en octets, les
+  entrées les moins récemment utilisées étant évincées en premier ;
+- une seule session calcule une entrée manquante : les sessions qui la
+  demandent pendant le calcul en attendent le résultat au lieu de le
+  recalculer chacune (protection contre les afflux simultanés) ;
+- les entrées dont une session aura probablement besoin (stations voisines
+  de celle affichée) peuvent être calculées d'avance, en arrière-plan.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+# Budget par défaut (Mo), modifiable par la variable d'environnement AGROMET_CACHE_MB
+DEFAULT_BUDGET_MB = 512
+# Fils de calcul des entrées demandées d'avance
+PREFETCH_WORKERS = 2
+
+
+def sizeof(value, _seen=None):
+    """Estimation de l'empreinte mémoire d'une valeur mise en cache, en octets."""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'memory_usage'):
+        # Tableaux et séries pandas
+        return int(np.sum(value.memory_usage(deep=True)))
+    if hasattr(value, 'to_plotly_json'):
+        return sizeof(value.to_plotly_json(), seen)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k, seen) + sizeof(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(item, seen) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sizeof(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('version', 'value', 'size')
+
+    def __init__(self, version, value, size):
+        self.version = version
+        self.value = value
+        self.size = size
+
+
+class SharedCache:
+    """Cache LRU borné en octets, avec calcul unique des entrées manquantes."""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'waits': 0, 'invalidations': 0, 'evictions': 0, 'prefetches': 0}
+        # Consultations par jeu de données : {dataset: [hits, misses, waits]}
+        self.lookups = {}
+        self._prefetcher = None
+
+    def get(self, dataset, subject, window, version, build, size=None):
+        """Valeur de (dataset, subject, window) pour `version`, calculée par `build()` si besoin.
+
+        `subject` est la station ou la région, `window` la fenêtre de dates
+        (ou tout autre paramètre du calcul) ; `size` remplace l'estimation
+        de l'empreinte mémoire de la valeur.
+        """
+        key = (dataset, subject, window)
+        with self._lock:
+            lookups = self.lookups.setdefault(dataset, [0, 0, 0])
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                lookups[0] += 1
+                return entry.value
+            pending = self._pending.get((key, version))
+            if pending is None:
+                self.counters['misses'] += 1
+                lookups[1] += 1
+                if entry is not None:
+                    self.counters['invalidations'] += 1
+                    self._discard(key)
+                pending = self._pending[(key, version)] = Future()
+                owner = True
+            else:
+                self.counters['waits'] += 1
+                lookups[2] += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = build()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[(key, version)]
+            pending.set_exception(error)
+            raise
+        size = sizeof(value) if size is None else size
+        with self._lock:
+            del self._pending[(key, version)]
+            current = self._entries.get(key)
+            # Une entrée plus grande que tout le budget est servie sans être gardée
+            if size <= self.max_bytes and (current is None or current.version != version):
+                if current is not None:
+                    self._discard(key)
+                self._entries[key] = _Entry(version, value, size)
+                self.bytes += size
+                self._evict()
+        pending.set_result(value)
+        return value
+
+    def prefetch(self, dataset, subject, window, version, build, size=None):
+        """Calcule l'entrée en arrière-plan si elle n'est ni en cache ni en cours de calcul.
+
+        Une session qui la demande ensuite la trouve en cache, ou attend le
+        calcul déjà lancé. Retourne True si un calcul a été lancé.
+        """
+        key = (dataset, subject, window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and entry.version == version) or (key, version) in self._pending:
+                return False
+            self.counters['prefetches'] += 1
+            if self._prefetcher is None:
+                self._prefetcher = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix='agromet-prefetch')
+        self._prefetcher.submit(self._prefetch, dataset, subject, window, version, build, size)
+        return True
+
+    def _prefetch(self, *args):
+        try:
+            self.get(*args)
+        except Exception:
+            # L'erreur sera levée à nouveau dans la session qui demandera l'entrée
+            pass
+
+    def _discard(self, key):
+        self.bytes -= self._entries.pop(key).size
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.counters['evictions'] += 1
+
+    def invalidate(self, dataset=None, subject=None):
+        """Retire les entrées d'un jeu de données et/ou d'une station ou région."""
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (dataset is None or key[0] == dataset) and (subject is None or key[1] == subject)]
+            for key in keys:
+                self._discard(key)
+            self.counters['invalidations'] += len(keys)
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(entries=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes)
+            stats['datasets'] = {dataset: dict(zip(('hits', 'misses', 'waits'), counts))
+                                 for dataset, counts in sorted(self.lookups.items())}
+        lookups = stats['hits'] + stats['misses'] + stats['waits']
+        stats['hit_ratio'] = (stats['hits'] + stats['waits']) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache partagé par toutes les sessions du processus."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            budget = float(os.environ.get('AGROMET_CACHE_MB', DEFAULT_BUDGET_MB))
+            _cache = SharedCache(int(budget * 1024 * 1024))
+        return _cache
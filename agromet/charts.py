@@ -0,0 +1,79 @@
+"""Réduction des séries longues à la résolution de l'écran et cache des figures.
+
+Une série de plusieurs années compte des dizaines de milliers de points,
+alors qu'un graphique n'en affiche utilement que quelques centaines à
+quelques milliers. Les séries sont donc réduites côté serveur avant la
+construction des figures :
+
+- ``lttb`` (Largest-Triangle-Three-Buckets) pour les courbes, qui conserve
+  la forme visuelle de la série ;
+- ``minmax_downsample`` pour les barres, qui conserve le minimum et le
+  maximum de chaque paquet (les pics de pluie restent visibles).
+
+Les figures construites sont gardées dans le cache partagé
+(``agromet.cache``), indexées par (graphique, station ou région, fenêtre,
+version des données).
+"""
+import numpy as np
+
+# Nombre de points conservés pour la largeur d'un graphique à l'écran
+SCREEN_POINTS = 1000
+
+
+def _as_numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def minmax_downsample(x, y, n_out=SCREEN_POINTS):
+    """Garde le minimum et le maximum de chaque paquet (n_out // 2 paquets)."""
+    y = np.asarray(y, dtype=np.float64)
+    if y.size <= n_out:
+        return np.asarray(x), y
+    n_buckets = max(n_out // 2, 1)
+    edges = np.linspace(0, y.size, n_buckets + 1).astype(np.int64)
+    # Les NaN ne doivent être ni le minimum ni le maximum d'un paquet
+    low = np.where(np.isnan(y), np.inf, y)
+    high = np.where(np.isnan(y), -np.inf, y)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    order_low = np.lexsort((low, bucket))
+    order_high = np.lexsort((-high, bucket))
+    keep = np.unique(np.concatenate([order_low[edges[:-1]], order_high[edges[:-1]]]))
+    return np.asarray(x)[keep], y[keep]
+
+
+def lttb(x, y, n_out=SCREEN_POINTS):
+    """Largest-Triangle-Three-Buckets : n_out points représentatifs de la courbe."""
+    y = np.asarray(y, dtype=np.float64)
+    if y.size <= n_out or n_out < 3:
+        return np.asarray(x), y
+    numeric_x = _as_numeric(x)
+    filled_y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    # Paquets intérieurs (le premier et le dernier point sont toujours gardés)
+    edges = np.linspace(1, y.size - 1, n_out - 1).astype(np.int64)
+    # Moyenne de chaque paquet, calculée d'un coup par sommes cumulées
+    cumulative_x = np.concatenate([[0.0], np.cumsum(numeric_x)])
+    cumulative_y = np.concatenate([[0.0], np.cumsum(filled_y)])
+    sizes = np.maximum(np.diff(edges), 1)
+    mean_x = (cumulative_x[edges[1:]] - cumulative_x[edges[:-1]]) / sizes
+    mean_y = (cumulative_y[edges[1:]] - cumulative_y[edges[:-1]]) / sizes
+    mean_x = np.append(mean_x, numeric_x[-1])
+    mean_y = np.append(mean_y, filled_y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, y.size - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # Aire du triangle (point retenu, candidat, moyenne du paquet suivant)
+        area = np.abs(
+            (numeric_x[previous] - mean_x[bucket + 1]) * (filled_y[start:end] - filled_y[previous])
+            - (numeric_x[previous] - numeric_x[start:end]) * (mean_y[bucket + 1] - filled_y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        keep[bucket + 1] = previous
+    return np.asarray(x)[keep], y[keep]
+
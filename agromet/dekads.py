@@ -0,0 +1,191 @@
+"""Agrégation décadaire des pluies journalières des stations.
+
+Une décade couvre les jours 1 à 10, 11 à 20 et 21 à la fin du mois : une
+année compte 36 décades. Les cumuls sont tenus par station dans un tableau
+(années × 36) alimenté de façon incrémentale : chaque nouvelle observation
+met à jour une seule case, sans réagréger l'archive. Une observation en
+retard ou corrigée ne fait recalculer que la décade qui la contient.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+N_DEKADS = 36
+MONTH_LABELS = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Jun', 'Jul', 'Aoû', 'Sep', 'Oct', 'Nov', 'Déc']
+PERIOD_DTYPE = pd.CategoricalDtype(
+    [f"{month} - Décade {decade}" for month in MONTH_LABELS for decade in (1, 2, 3)],
+    ordered=True
+)
+
+
+def dekad_of(dates):
+    """Indice de décade (0 à 35) de chaque date."""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    day_in_month = (dates - months).astype(np.int64)
+    return (months.astype(np.int64) % 12) * 3 + np.minimum(day_in_month // 10, 2)
+
+
+def dekad_bounds(day):
+    """Premier et dernier jour de la décade qui contient `day`."""
+    day = np.datetime64(day, 'D')
+    month = day.astype('datetime64[M]')
+    first = month.astype('datetime64[D]') + 10 * min(int((day - month).astype(int)) // 10, 2)
+    if first - month.astype('datetime64[D]') == 20:
+        last = (month + 1).astype('datetime64[D]') - 1
+    else:
+        last = first + 9
+    return first, last
+
+
+def year_of(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _nanmean(stack):
+    # Moyenne sur le premier axe en ignorant les NaN, sans avertissement
+    # pour les colonnes entièrement vides (qui restent NaN)
+    stack = np.asarray(stack, dtype=np.float64).reshape(-1, N_DEKADS)
+    valid = ~np.isnan(stack)
+    n_valid = valid.sum(axis=0)
+    sums = np.where(valid, stack, 0.0).sum(axis=0)
+    return np.where(n_valid > 0, sums / np.maximum(n_valid, 1), np.nan)
+
+
+class StationDekads:
+    """Cumuls et nombres de jours observés d'une station, par année × décade."""
+
+    def __init__(self, first_year, n_years):
+        self.first_year = first_year
+        self.totals = np.zeros((n_years, N_DEKADS), dtype=np.float64)
+        self.counts = np.zeros((n_years, N_DEKADS), dtype=np.int16)
+        # Version des données de la station prise en compte
+        self.version = 0
+
+    def _grow(self, years):
+        low, high = int(years.min()), int(years.max())
+        if low < self.first_year:
+            pad = self.first_year - low
+            self.totals = np.vstack([np.zeros((pad, N_DEKADS)), self.totals])
+            self.counts = np.vstack([np.zeros((pad, N_DEKADS), dtype=np.int16), self.counts])
+            self.first_year = low
+        last_year = self.first_year + len(self.totals) - 1
+        if high > last_year:
+            pad = high - last_year
+            self.totals = np.vstack([self.totals, np.zeros((pad, N_DEKADS))])
+            self.counts = np.vstack([self.counts, np.zeros((pad, N_DEKADS), dtype=np.int16)])
+
+    def add(self, dates, rain, previous=None):
+        """Intègre des pluies journalières ; `previous` remplace d'anciennes valeurs."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if dates.size == 0:
+            return
+        rain = np.asarray(rain, dtype=np.float64)
+        previous = np.full(rain.shape, np.nan) if previous is None else np.asarray(previous, dtype=np.float64)
+        years = year_of(dates)
+        self._grow(years)
+
+        rows = years - self.first_year
+        cols = dekad_of(dates)
+        np.add.at(self.totals, (rows, cols), np.nan_to_num(rain) - np.nan_to_num(previous))
+        np.add.at(self.counts, (rows, cols), (~np.isnan(rain)).astype(np.int16) - (~np.isnan(previous)).astype(np.int16))
+
+    def replace(self, dates, rain):
+        """Recalcule les décades couvertes par `dates`, qui doivent être des décades entières."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if dates.size == 0:
+            return
+        years = year_of(dates)
+        self._grow(years)
+        rows, cols = years - self.first_year, dekad_of(dates)
+        self.totals[rows, cols] = 0.0
+        self.counts[rows, cols] = 0
+        self.add(dates, rain)
+
+    def years(self, start_year, end_year):
+        """Cumuls des années [start_year, end_year[ ; NaN pour les décades non observées."""
+        low = min(max(start_year - self.first_year, 0), len(self.totals))
+        high = min(max(end_year - self.first_year, 0), len(self.totals))
+        return np.where(self.counts[low:high] > 0, self.totals[low:high], np.nan)
+
+
+class DekadAggregator:
+    """Cumuls décadaires de toutes les stations, tenus à jour depuis le stockage."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._stations = {}
+
+    def station(self, station):
+        """Cumuls de la station, recalculés sur les décades modifiées depuis le dernier appel.
+
+        Nouveaux jours, observations en retard et corrections passent par le
+        journal des modifications du stockage : seules les décades qui
+        contiennent des jours modifiés sont relues et recalculées.
+        """
+        with self._lock:
+            manifest = self.store.manifest(station)
+            if manifest is None:
+                return None
+            dekads = self._stations.get(station)
+            if dekads is None:
+                first = np.datetime64(manifest['first_date'], 'D')
+                last = np.datetime64(manifest['last_date'], 'D')
+                dekads = StationDekads(int(year_of(first)), int(year_of(last) - year_of(first)) + 1)
+                self._stations[station] = dekads
+                changed = (first, last)
+            else:
+                changed = self.store.changes_since(station, dekads.version)
+            if changed is not None:
+                first, last = dekad_bounds(changed[0])[0], dekad_bounds(changed[1])[1]
+                dates, values = self.store.read(station, first, last, columns=('rain',))
+                dekads.replace(dates, values['rain'])
+            dekads.version = manifest['version']
+            return dekads
+
+    def region_frame(self, stations, year, rain_normal):
+        """Tableau des 36 décades de `year`, moyenné sur les stations.
+
+        Colonnes : pluie observée, normale (`rain_normal`, lue dans l'index
+        des normales), année précédente, écarts à la normale en mm et en %.
+        Les décades sans aucun jour observé valent NaN.
+        """
+        observed, previous = [], []
+        with self._lock:
+            for station in stations:
+                dekads = self.station(station)
+                if dekads is None:
+                    continue
+                observed.append(_nanmean(dekads.years(year, year + 1)))
+                previous.append(_nanmean(dekads.years(year - 1, year)))
+
+        rain_obs = _nanmean(observed)
+        rain_prev = _nanmean(previous)
+        rain_normal = np.asarray(rain_normal, dtype=np.float64)
+        rain_dev = rain_obs - rain_normal
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rain_dev_pct = rain_dev / rain_normal * 100
+
+        return pd.DataFrame({
+            'period': pd.Categorical.from_codes(np.arange(N_DEKADS), dtype=PERIOD_DTYPE),
+            'rain_obs': rain_obs.astype(np.float32),
+            'rain_normal': rain_normal.astype(np.float32),
+            'rain_dev': rain_dev.astype(np.float32),
+            'rain_dev_pct': rain_dev_pct.astype(np.float32),
+            'rain_prev': rain_prev.astype(np.float32),
+        })
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator(store):
+    """Agrégateur partagé par toutes les sessions du processus."""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None or _aggregator.store is not store:
+            _aggregator = DekadAggregator(store)
+        return _aggregator
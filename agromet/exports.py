@@ -0,0 +1,280 @@
+"""Exports en volume des observations journalières et des cumuls décadaires.
+
+Un export couvre une région ou tout le réseau, sur une plage de dates
+quelconque (jusqu'à l'historique complet). Il est produit par morceaux de
+``CHUNK_ROWS`` lignes au plus, lus dans le stockage puis écrits aussitôt :
+
+- CSV : les morceaux sont ajoutés au fichier les uns après les autres ;
+- Excel : classeur openpyxl en écriture seule (les lignes écrites ne sont
+  pas gardées en mémoire), une nouvelle feuille au-delà de la limite de
+  lignes d'Excel ;
+- Parquet : un groupe de lignes par morceau.
+
+La mémoire utilisée ne dépend donc pas de la taille de l'export. Comme les
+bulletins, les exports sont produits par un groupe de processus : un
+export de plusieurs années ne bloque ni la session qui le demande ni les
+autres. Le fichier d'un export porte l'empreinte de la version des données
+des stations : une demande identique est resservie tant que les données
+n'ont pas changé. Les fichiers des versions précédentes d'une même demande
+sont supprimés, comme tout export plus ancien que ``EXPORT_MAX_AGE``.
+"""
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from agromet.dekads import N_DEKADS, PERIOD_DTYPE, dekad_of
+from agromet.jobs import JobQueue
+from agromet.normals import ensure_normals
+from agromet.schema import DISPLAY_LABELS, observation_frame, to_display
+from agromet.stations import STATIONS_DATA
+from agromet.store import StationStore, station_slug
+
+EXPORT_DATASETS = {
+    'observations': 'Observations journalières',
+    'dekads': 'Cumuls décadaires',
+}
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Étendue d'un export : une région ou tout le réseau
+NETWORK = 'Réseau'
+# Lignes au plus par morceau lu et écrit
+CHUNK_ROWS = 100_000
+# Lignes par feuille Excel (limite du format, en-tête compris)
+EXCEL_MAX_ROWS = 1_048_576
+# Durée de conservation d'un export sur disque (secondes)
+EXPORT_MAX_AGE = 24 * 3600
+
+EXPORT_LABELS = dict(DISPLAY_LABELS, year='Année')
+
+
+def scope_stations(scope):
+    """[(région, stations)] couverts par l'étendue `scope` (une région ou ``NETWORK``)."""
+    regions = list(STATIONS_DATA) if scope == NETWORK else [scope]
+    return [(region, list(STATIONS_DATA[region])) for region in regions]
+
+
+def _windows(start, end, days):
+    # Découpe [start, end] en fenêtres d'au plus `days` jours
+    first = start
+    while first <= end:
+        last = min(end, first + (days - 1))
+        yield first, last
+        first = last + 1
+
+
+def observation_chunks(store, scope, start, end, chunk_rows=CHUNK_ROWS):
+    """Tableaux successifs des observations de [start, end], station par station."""
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    n_days = int((end - start).astype(int)) + 1
+    for region, stations in scope_stations(scope):
+        if n_days >= chunk_rows:
+            # Longue période : une station à la fois, par fenêtres de dates
+            for station in stations:
+                for first, last in _windows(start, end, chunk_rows):
+                    dates, values = store.read(station, first, last)
+                    yield observation_frame(region, [station], dates, values)
+        else:
+            per_chunk = chunk_rows // n_days
+            for i in range(0, len(stations), per_chunk):
+                group = stations[i:i + per_chunk]
+                dates, values = store.read_many(group, start, end)
+                yield observation_frame(region, group, dates, values)
+
+
+def _station_dekads(store, stations, first, last):
+    # Cumuls (N, décades) et décades couvertes de [first, last], dans une même année
+    dates, values = store.read_many(stations, first, last, columns=('rain',))
+    rain = values['rain'].astype(np.float64)
+    dekads = dekad_of(dates)
+    # Les dates sont consécutives : chaque décade est une plage contiguë de colonnes
+    starts = np.flatnonzero(np.r_[True, np.diff(dekads) != 0])
+    totals = np.add.reduceat(np.nan_to_num(rain), starts, axis=1)
+    counts = np.add.reduceat(~np.isnan(rain), starts, axis=1)
+    return dekads[starts], np.where(counts > 0, totals, np.nan)
+
+
+def dekad_chunks(store, normals, scope, start, end, chunk_rows=CHUNK_ROWS):
+    """Tableaux successifs des cumuls décadaires de [start, end], par station et par année.
+
+    Les décades en bordure de la plage ne comptent que les jours inclus.
+    """
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    first_year, last_year = (int(str(day.astype('datetime64[Y]'))) for day in (start, end))
+    years = [(year, max(start, np.datetime64(f'{year}-01-01')), min(end, np.datetime64(f'{year}-12-31')))
+             for year in range(first_year, last_year + 1)]
+    per_chunk = max(1, chunk_rows // (N_DEKADS * len(years)))
+    for region, stations in scope_stations(scope):
+        for i in range(0, len(stations), per_chunk):
+            group = stations[i:i + per_chunk]
+            normal = np.stack([normals.station_dekad_rain(station) for station in group]).astype(np.float64)
+            parts = []
+            for year, first, last in years:
+                dekads, rain = _station_dekads(store, group, first, last)
+                rows, cols = np.divmod(np.arange(rain.size), len(dekads))
+                rain_normal = normal[rows, dekads[cols]]
+                rain_obs = rain.ravel()
+                rain_dev = rain_obs - rain_normal
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    rain_dev_pct = rain_dev / rain_normal * 100
+                parts.append(pd.DataFrame({
+                    'year': np.full(rain.size, year, dtype=np.int16),
+                    'period': pd.Categorical.from_codes(dekads[cols], dtype=PERIOD_DTYPE),
+                    'region': pd.Categorical.from_codes(np.zeros(rain.size, dtype=np.int8), categories=[region]),
+                    'station': pd.Categorical.from_codes(rows.astype(np.int16), categories=group),
+                    'rain_obs': rain_obs.astype(np.float32),
+                    'rain_normal': rain_normal.astype(np.float32),
+                    'rain_dev': rain_dev.astype(np.float32),
+                    'rain_dev_pct': rain_dev_pct.astype(np.float32),
+                }))
+            # Ordre station par station, puis chronologique
+            frame = pd.concat(parts, ignore_index=True)
+            yield frame.sort_values(['station', 'year', 'period'], kind='stable', ignore_index=True)
+
+
+def _display(chunk):
+    return to_display(chunk).rename(columns=EXPORT_LABELS)
+
+
+def write_csv(chunks, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        header = True
+        for chunk in chunks:
+            _display(chunk).to_csv(f, index=False, header=header)
+            header = False
+
+
+def write_excel(chunks, path, title):
+    workbook = Workbook(write_only=True)
+    sheet, rows = None, EXCEL_MAX_ROWS
+    for chunk in chunks:
+        display = _display(chunk)
+        for row in display.itertuples(index=False, name=None):
+            if rows >= EXCEL_MAX_ROWS:
+                n_sheets = len(workbook.worksheets)
+                sheet = workbook.create_sheet(f"{title[:25]} ({n_sheets + 1})" if n_sheets else title[:31])
+                sheet.append(list(display.columns))
+                rows = 1
+            sheet.append([None if pd.isna(value) else value for value in row])
+            rows += 1
+    if sheet is None:
+        workbook.create_sheet(title[:31])
+    workbook.save(path)
+
+
+def write_parquet(chunks, path):
+    # pyarrow n'est nécessaire qu'aux exports Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            # Les indices des catégories dépendent de leur nombre dans chaque
+            # morceau : un type unique pour que tous les groupes de lignes
+            # partagent le schéma du fichier
+            schema = pa.schema([
+                pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered))
+                if pa.types.is_dictionary(field.type) else field
+                for field in table.schema
+            ])
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_path(data_root, dataset, scope, start, end, fmt, version):
+    name = f"{dataset}_{station_slug(scope)}_{start}_{end}_{version}.{fmt}"
+    return os.path.join(data_root, 'exports', name)
+
+
+def render_export(dataset, scope, start, end, fmt, version, data_root):
+    """Point d'entrée des processus d'export : écrit le fichier et retourne son chemin."""
+    store = StationStore(data_root)
+    if dataset == 'observations':
+        chunks = observation_chunks(store, scope, start, end)
+    else:
+        chunks = dekad_chunks(store, ensure_normals(store), scope, start, end)
+    path = export_path(data_root, dataset, scope, start, end, fmt, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Écriture dans un fichier temporaire : un export servi est toujours complet
+    tmp = f"{path}.tmp"
+    if fmt == 'csv':
+        write_csv(chunks, tmp)
+    elif fmt == 'xlsx':
+        write_excel(chunks, tmp, EXPORT_DATASETS[dataset])
+    else:
+        write_parquet(chunks, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+class ExportQueue(JobQueue):
+    """File des exports, dédupliqués par (jeu, étendue, dates, format, version des données)."""
+
+    def path(self, key):
+        return export_path(self.data_root, *key)
+
+    def outputs(self, key):
+        return [self.path(key)]
+
+    def task(self, key):
+        return (render_export, *key, self.data_root)
+
+    def prune(self, key):
+        """Supprime les autres versions de l'export `key` et les exports trop anciens.
+
+        Le fichier de `key` et ceux des exports en cours sont gardés.
+        """
+        with self._lock:
+            keep = {self.path(key)} | {self.path(other) for other, job in self._jobs.items() if not job.done()}
+        keep |= {f"{path}.tmp" for path in keep}
+        dataset, scope, start, end, fmt, _ = key
+        stale = set(glob.glob(export_path(self.data_root, dataset, scope, start, end, fmt, '*')))
+        directory = os.path.join(self.data_root, 'exports')
+        if os.path.isdir(directory):
+            limit = time.time() - EXPORT_MAX_AGE
+            stale.update(entry.path for entry in os.scandir(directory) if entry.stat().st_mtime < limit)
+        for path in stale - keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def submit(self, dataset, scope, start, end, fmt):
+        """Demande un export et retourne sa clé."""
+        if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Export inconnu : {dataset} ({fmt})")
+        store = StationStore(self.data_root)
+        stations = [station for _, members in scope_stations(scope) for station in members]
+        versions = ','.join(f"{station}:{store.version(station)}" for station in stations)
+        version = hashlib.sha1(versions.encode('utf-8')).hexdigest()[:12]
+        start, end = str(np.datetime64(start, 'D')), str(np.datetime64(end, 'D'))
+        key = (dataset, scope, start, end, fmt, version)
+        self.prune(key)
+        return super().submit(key)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_export_queue(store):
+    """File partagée par toutes les sessions du processus."""
+    global _queue
+    with _queue_lock:
+        if _queue is None or _queue.data_root != store.data_root:
+            _queue = ExportQueue(store.data_root)
+        return _queue
@@ -0,0 +1,479 @@
+"""Prévisions météorologiques des stations, obtenues auprès d'un service HTTP.
+
+Le service interrogé (AGROMET_FORECAST_URL, p. ex. ``http://prevision:8080``)
+répond, pour un point, au format des API de prévision ouvertes de type
+Open-Meteo :
+
+    GET /v1/forecast?latitude=6.65&longitude=-4.7&daily=precipitation_sum,...&forecast_days=8
+    -> {"daily": {"time": ["2026-10-16", ...], "precipitation_sum": [...], ...}}
+
+    GET /v1/seasonal?latitude=6.65&longitude=-4.7&monthly=precipitation_sum,...&forecast_months=6
+    -> {"monthly": {"time": ["2026-11", ...], "precipitation_sum": [...], ...}}
+
+Les prévisions de toutes les stations sont demandées en même temps, par
+des coroutines ``asyncio`` qui se partagent le groupe borné de connexions
+persistantes d'une session ``aiohttp`` (une requête par point, sans poignée
+de main TCP par requête ; compression, redirections, mandataire et TLS pris
+en charge par aiohttp et l'environnement) ; chaque requête a un délai
+maximal.
+
+Les pages ne lisent que le cache : une prévision trop ancienne est servie
+telle quelle et son rafraîchissement est lancé en arrière-plan, dans un
+fil qui fait tourner la boucle d'événements (« stale-while-revalidate »).
+Les dernières prévisions reçues sont enregistrées sur disque
+(``<données>/forecasts/<type>.npz``) et rechargées au démarrage. Sans
+service configuré ou sans prévision pour une station, les pages se
+rabattent sur les normales climatologiques.
+
+Un serveur de substitution, qui répond des prévisions simulées, remplace
+le service pour les essais et les mesures de performance :
+
+    python -m agromet.forecasts --stub 8765
+    AGROMET_FORECAST_URL=http://127.0.0.1:8765 streamlit run code.py
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from agromet.metrics import span
+from agromet.stations import STATIONS_DATA
+
+# Jours de prévision journalière demandés (aujourd'hui compris)
+FORECAST_DAYS = 8
+# Mois de prévision saisonnière demandés (à partir du mois prochain)
+SEASONAL_MONTHS = 6
+# Délai maximal d'une requête, connexion comprise (secondes)
+TIMEOUT_SECONDS = 5.0
+# Connexions simultanées vers le service
+MAX_CONNECTIONS = 64
+# Âge (secondes) au-delà duquel une prévision est rafraîchie
+MAX_AGE_SECONDS = {'daily': 3 * 3600, 'seasonal': 24 * 3600}
+# Délai avant une nouvelle tentative pour une station en échec (secondes)
+RETRY_SECONDS = 300
+
+# Variables de l'application -> variables du service, par type de prévision
+KINDS = {
+    'daily': {
+        'path': '/v1/forecast',
+        'block': 'daily',
+        'variables': {'rain': 'precipitation_sum', 'tmin': 'temperature_2m_min', 'tmax': 'temperature_2m_max',
+                      'wind': 'wind_speed_10m_max'},
+        'params': {'forecast_days': FORECAST_DAYS, 'timezone': 'GMT', 'wind_speed_unit': 'ms'},
+    },
+    'seasonal': {
+        'path': '/v1/seasonal',
+        'block': 'monthly',
+        'variables': {'rain': 'precipitation_sum', 'tmean': 'temperature_2m_mean'},
+        'params': {'forecast_months': SEASONAL_MONTHS},
+    },
+}
+
+
+def _member_keys(block, remote):
+    # Variable du service puis ses membres d'ensemble (« precipitation_sum_member01 » ...)
+    keys = [remote] if remote in block else []
+    member = 1
+    while f"{remote}_member{member:02d}" in block:
+        keys.append(f"{remote}_member{member:02d}")
+        member += 1
+    return keys
+
+
+def _same_forecast(entry, result):
+    # Mêmes échéances et mêmes valeurs que la prévision enregistrée
+    if entry is None:
+        return False
+    _, times, series = entry
+    new_times, new_series = result
+    return (np.array_equal(times, new_times) and series.keys() == new_series.keys()
+            and all(np.array_equal(series[name], new_series[name], equal_nan=True) for name in series))
+
+
+class ForecastProvider:
+    """Prévisions par station, servies depuis le cache et rafraîchies en arrière-plan."""
+
+    def __init__(self, data_root, url=None, points=None, timeout=TIMEOUT_SECONDS, max_connections=MAX_CONNECTIONS):
+        self.url = url
+        self.path = os.path.join(data_root, 'forecasts')
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # Points rafraîchis ensemble : {station: {"lat", "lon"}}
+        self.points = dict(points or {})
+        # {type: {station: (heure de réception, périodes, {variable: tableau (membres, périodes)})}}
+        self._entries = {kind: self._load(kind) for kind in KINDS}
+        self._versions = {kind: 0 for kind in KINDS}
+        self._failures = {}
+        self._inflight = set()
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._http = None
+        self._slots = None
+
+    # -- Lecture (jamais bloquante) ----------------------------------------------
+
+    def version(self, kind):
+        """Nombre de rafraîchissements qui ont changé une prévision (clé des caches de figures)."""
+        return self._versions[kind]
+
+    def daily(self, points, dates):
+        """Prévisions journalières aux `dates` : ({variable: tableau (N, D)}, réception)."""
+        return self._values('daily', points, np.datetime_as_string(np.asarray(dates, dtype='datetime64[D]')))
+
+    def seasonal(self, points, months, members=False):
+        """Prévisions mensuelles aux `months` : ({variable: tableau (N, M)}, réception).
+
+        Avec `members`, les tableaux sont (E, N, M) : un par membre de
+        l'ensemble (``<variable>`` puis ``<variable>_member01`` ...), NaN pour
+        les membres absents d'une station.
+        """
+        return self._values('seasonal', points, np.datetime_as_string(np.asarray(months, dtype='datetime64[M]')), members)
+
+    def _values(self, kind, points, periods, members=False):
+        # Valeurs NaN là où aucune prévision n'est connue ; la réception est
+        # l'heure de la plus ancienne prévision utilisée (None si aucune)
+        variables = KINDS[kind]['variables']
+        found_values = {name: [] for name in variables}
+        now = time.time()
+        received, stale = [], {}
+        with self._lock:
+            entries = [self._entries[kind].get(station) for station in points]
+            for station, entry in zip(points, entries):
+                if self._is_stale(kind, station, entry, now):
+                    stale[station] = points[station]
+        for row, entry in enumerate(entries):
+            if entry is None:
+                continue
+            received_at, times, series = entry
+            columns = {period: column for column, period in enumerate(times)}
+            index = np.array([columns.get(period, -1) for period in periods])
+            found = index >= 0
+            if not found.any():
+                continue
+            received.append(received_at)
+            for name, members_values in series.items():
+                # (membres, périodes du service) ; le premier est la prévision principale
+                found_values[name].append((row, found, members_values[:None if members else 1, index[found]]))
+
+        values = {}
+        for name, found in found_values.items():
+            n_members = max((series.shape[0] for _, _, series in found), default=1)
+            array = np.full((n_members, len(points), len(periods)), np.nan)
+            for row, columns, series in found:
+                array[:len(series), row, columns] = series
+            values[name] = array if members else array[0]
+        if stale:
+            self.refresh(kind, stale)
+        return values, min(received) if received else None
+
+    def _is_stale(self, kind, station, entry, now):
+        if self.url is None or (kind, station) in self._inflight:
+            return False
+        if now - self._failures.get((kind, station), 0) < RETRY_SECONDS:
+            return False
+        return entry is None or now - entry[0] > MAX_AGE_SECONDS[kind]
+
+    # -- Rafraîchissement --------------------------------------------------------
+
+    def refresh(self, kind, points=None):
+        """Lance le rafraîchissement des points (par défaut tous) ; retourne un Future.
+
+        Les points déjà en cours de rafraîchissement sont ignorés ; avec les
+        points demandés sont rafraîchis tous les points connus périmés.
+        """
+        if self.url is None:
+            return None
+        now = time.time()
+        with self._lock:
+            self.points.update(points or {})
+            todo = {station: point for station, point in self.points.items()
+                    if (kind, station) not in self._inflight
+                    and (points is None or station in points
+                         or self._is_stale(kind, station, self._entries[kind].get(station), now))}
+            self._inflight.update((kind, station) for station in todo)
+        if not todo:
+            return None
+        return asyncio.run_coroutine_threadsafe(self._refresh(kind, todo), self._event_loop())
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='agromet-forecasts', daemon=True).start()
+            return self._loop
+
+    def close(self):
+        """Ferme la session HTTP et arrête la boucle d'événements du rafraîchissement."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._http is not None:
+            asyncio.run_coroutine_threadsafe(self._http.close(), loop).result()
+            self._http = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _client(self):
+        # aiohttp n'est nécessaire qu'avec un service configuré ; la session
+        # est créée dans la boucle d'événements qui l'utilise
+        import aiohttp
+
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections),
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout), headers={'Accept': 'application/json'},
+                                     raise_for_status=True, trust_env=True)
+
+    async def _refresh(self, kind, points):
+        try:
+            if self._http is None:
+                self._http = self._client()
+                # Attente d'une connexion libre hors du délai de la requête
+                self._slots = asyncio.Semaphore(self.max_connections)
+            with span(f'forecast.refresh_{kind}'):
+                results = await asyncio.gather(*(self._fetch(kind, point) for point in points.values()),
+                                               return_exceptions=True)
+        finally:
+            with self._lock:
+                self._inflight.difference_update((kind, station) for station in points)
+
+        now = time.time()
+        with self._lock:
+            entries = dict(self._entries[kind])
+            fetched = changed = 0
+            for station, result in zip(points, results):
+                if isinstance(result, BaseException):
+                    # La prévision précédente reste servie
+                    self._failures[(kind, station)] = now
+                    self.errors += 1
+                else:
+                    self._failures.pop((kind, station), None)
+                    changed += not _same_forecast(entries.get(station), result)
+                    entries[station] = (now, *result)
+                    fetched += 1
+            self._entries[kind] = entries
+            # Nouvelle version seulement si une prévision servie a changé
+            if changed:
+                self._versions[kind] += 1
+        if fetched:
+            self._save(kind, entries)
+        return fetched
+
+    async def _fetch(self, kind, point):
+        spec = KINDS[kind]
+        params = {'latitude': point['lat'], 'longitude': point['lon'],
+                  spec['block']: ','.join(spec['variables'].values()), **spec['params']}
+        async with self._slots:
+            async with self._http.get(f"{self.url.rstrip('/')}{spec['path']}", params=params) as response:
+                payload = await response.json()
+        block = payload[spec['block']]
+        # Tableaux (membres, périodes) : None -> NaN
+        series = {}
+        for name, remote in spec['variables'].items():
+            keys = _member_keys(block, remote)
+            if keys:
+                series[name] = np.array([block[key] for key in keys], dtype=np.float32)
+        return np.array(block['time']), series
+
+    # -- Persistance -------------------------------------------------------------
+
+    def _file(self, kind):
+        return os.path.join(self.path, f"{kind}.npz")
+
+    def _load(self, kind):
+        try:
+            archive = np.load(self._file(kind))
+        except (FileNotFoundError, ValueError, OSError):
+            return {}
+        with archive:
+            names = [name for name in KINDS[kind]['variables'] if name in archive]
+            columns = {name: archive[name] for name in names}
+            members = {name: archive[f"{name}_members"] for name in names}
+            entries = {}
+            for row, (station, received_at, times) in enumerate(zip(archive['stations'], archive['received'], archive['time'])):
+                times = times[times != '']
+                entries[str(station)] = (float(received_at), times, {
+                    name: columns[name][:members[name][row], row, :times.size] for name in names})
+            return entries
+
+    def _save(self, kind, entries):
+        # Tableaux (membres, stations, périodes) complétés par des NaN, et
+        # échéances complétées par des chaînes vides (retirées au chargement)
+        stations = list(entries)
+        n_periods = max(times.size for _, times, _ in entries.values())
+        arrays = {
+            'stations': np.array(stations),
+            'received': np.array([entries[station][0] for station in stations]),
+            'time': np.array([np.pad(entries[station][1].astype(str), (0, n_periods - entries[station][1].size), constant_values='')
+                              for station in stations]),
+        }
+        for name in KINDS[kind]['variables']:
+            found = [(row, entries[station][2][name]) for row, station in enumerate(stations) if name in entries[station][2]]
+            n_members = max((series.shape[0] for _, series in found), default=0)
+            array = np.full((n_members, len(stations), n_periods), np.nan, dtype=np.float32)
+            counts = np.zeros(len(stations), dtype=np.int64)
+            for row, series in found:
+                array[:series.shape[0], row, :series.shape[1]] = series
+                counts[row] = series.shape[0]
+            arrays[name] = array
+            arrays[f"{name}_members"] = counts
+
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(kind)
+        tmp = f"{path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_forecast_provider(store):
+    """Fournisseur partagé par toutes les sessions, pour les stations du réseau."""
+    global _provider
+    with _provider_lock:
+        if _provider is None or _provider.path != os.path.join(store.data_root, 'forecasts'):
+            points = {station: point for stations in STATIONS_DATA.values() for station, point in stations.items()}
+            if _provider is not None:
+                _provider.close()
+            _provider = ForecastProvider(store.data_root, os.environ.get('AGROMET_FORECAST_URL') or None, points)
+            # Session HTTP fermée proprement à l'arrêt du serveur
+            atexit.register(_provider.close)
+        return _provider
+
+
+# -- Serveur de substitution ---------------------------------------------------
+
+# Membres de l'ensemble saisonnier simulé
+STUB_MEMBERS = 51
+
+
+@lru_cache(maxsize=4)
+def _stub_ensemble(first_month, n_months):
+    # Cumuls de pluie et températures moyennes mensuels (membres, mois) de
+    # l'ensemble simulé, tirés une fois pour tous les points
+    from agromet.synthetic import synthesize_weather
+
+    months = first_month + np.arange(n_months)
+    dates = np.arange(months[0], months[-1] + 1, dtype='datetime64[D]')
+    drawn = synthesize_weather([f"membre {member}" for member in range(STUB_MEMBERS)], dates)
+    starts = (months.astype('datetime64[D]') - dates[0]).astype(np.int64)
+    days = np.diff(np.append(starts, dates.size))
+    tmean = (drawn['tmin'].astype(np.float64) + drawn['tmax']) / 2
+    return (np.add.reduceat(drawn['rain'].astype(np.float64), starts, axis=1),
+            np.add.reduceat(tmean, starts, axis=1) / days)
+
+
+def stub_payload(target, today=None):
+    """Réponse simulée du service pour une requête (chemin et paramètres)."""
+    from agromet.synthetic import synthesize_weather
+
+    parts = urlsplit(target)
+    query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+    point = f"{float(query['latitude']):.4f},{float(query['longitude']):.4f}"
+    today = np.datetime64(today or 'today', 'D')
+    if parts.path.endswith('/forecast'):
+        dates = today + np.arange(int(query.get('forecast_days', FORECAST_DAYS)))
+        drawn = synthesize_weather([point], dates)
+        return {'daily': {
+            'time': np.datetime_as_string(dates).tolist(),
+            'precipitation_sum': np.round(drawn['rain'][0].astype(np.float64), 1).tolist(),
+            'temperature_2m_min': np.round(drawn['tmin'][0].astype(np.float64), 1).tolist(),
+            'temperature_2m_max': np.round(drawn['tmax'][0].astype(np.float64), 1).tolist(),
+            'wind_speed_10m_max': np.round(drawn['wind'][0].astype(np.float64), 1).tolist(),
+        }}
+    if parts.path.endswith('/seasonal'):
+        months = today.astype('datetime64[M]') + 1 + np.arange(int(query.get('forecast_months', SEASONAL_MONTHS)))
+        rain, tmean = _stub_ensemble(months[0], months.size)
+        # Ensemble commun, propre au point par une permutation des membres, un
+        # facteur par membre (±10 %) et une tendance par mois (±20 % de pluie)
+        keys = synthesize_weather([point], months[0] + np.arange(max(STUB_MEMBERS, months.size)))
+        order = np.argsort(keys['wind'][0][:STUB_MEMBERS])
+        factor = 0.9 + keys['rain'][0][:STUB_MEMBERS, None] / 25 * 0.2
+        trend = 0.8 + (keys['sun'][0][:months.size] - 4) / 8 * 0.4
+        rain = np.round(rain[order] * factor * trend, 1)
+        tmean = np.round(tmean[order], 1)
+        block = {'time': np.datetime_as_string(months).tolist()}
+        for remote, values in (('precipitation_sum', rain), ('temperature_2m_mean', tmean)):
+            block[remote] = values[0].tolist()
+            block.update((f"{remote}_member{member:02d}", values[member].tolist()) for member in range(1, STUB_MEMBERS))
+        return {'monthly': block}
+    return None
+
+
+async def _serve_stub_connection(reader, writer, delay):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                payload = stub_payload(request_line.split()[1].decode('ascii'))
+            except (KeyError, ValueError, IndexError):
+                payload = None
+            body = json.dumps(payload).encode('utf-8') if payload else b'{}'
+            status = '200 OK' if payload else '404 Not Found'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_stub(host='127.0.0.1', port=0, delay=0.0, reuse_port=False):
+    """Démarre le serveur de substitution ; `delay` simule la latence du service.
+
+    Avec `reuse_port`, plusieurs processus peuvent écouter le même port
+    (Linux), comme les instances d'un service réel derrière un répartiteur.
+    """
+    return await asyncio.start_server(lambda r, w: _serve_stub_connection(r, w, delay), host, port,
+                                      reuse_port=reuse_port or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prévisions météorologiques des stations.")
+    parser.add_argument('--stub', type=int, metavar='PORT', help="démarre le serveur de prévisions simulées")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--delay', type=float, default=0.0, help="latence simulée par requête (secondes)")
+    parser.add_argument('--reuse-port', action='store_true', help="partage le port avec d'autres serveurs simulés")
+    args = parser.parse_args()
+
+    if args.stub is not None:
+        async def run():
+            server = await serve_stub(args.host, args.stub, args.delay, args.reuse_port)
+            print(f"Prévisions simulées sur http://{args.host}:{server.sockets[0].getsockname()[1]}", flush=True)
+            await server.serve_forever()
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Sans --stub : rafraîchit les prévisions de toutes les stations du réseau
+    from agromet.store import get_store
+
+    provider = get_forecast_provider(get_store())
+    if provider.url is None:
+        parser.error("AGROMET_FORECAST_URL n'est pas défini")
+    for kind in KINDS:
+        start = time.perf_counter()
+        fetched = provider.refresh(kind).result()
+        print(f"{kind} : {fetched}/{len(provider.points)} stations en {time.perf_counter() - start:.2f} s")
+    provider.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""Acquisition des observations des stations : fichiers CSV et messages de type SYNOP.
+
+Le service tourne à côté de l'application et alimente le même stockage :
+
+    python -m agromet.ingest --watch <répertoire>   # dépôts de fichiers
+    python -m agromet.ingest --listen 8765          # messages reçus par TCP
+
+Les observations sont lues, validées et écrites par lots : une écriture
+par station et par lot, qui incrémente la version de la station et note
+les jours modifiés dans son journal (voir ``agromet.store``). Les
+traitements dérivés (cumuls décadaires, bilan hydrique, caches de
+l'application) ne recalculent ainsi que les stations et les jours touchés.
+
+Chaque station a un filigrane : son dernier jour observé. Un jour
+postérieur est ajouté ; un jour antérieur (observation en retard ou
+corrigée) remplace le jour stocké, les variables absentes du message
+gardant leur valeur précédente. Les jours simulés d'amorçage (voir
+``StationStore.ensure_history``) ne sont pas repris : une variable absente
+y reste manquante, et une station alimentée par ce service n'est plus
+complétée de jours simulés.
+
+Formats acceptés :
+
+- CSV avec en-tête ``station,date,tmin,tmax,rhmin,rhmax,rain,wind,wind_dir,sun``
+  (ou les libellés d'affichage, p. ex. « Température Max (°C) ») ; les
+  colonnes de mesures sont facultatives ;
+- texte de type SYNOP : une ligne ``SYNOP AAAA-MM-JJ`` donne le jour des
+  messages qui suivent, un message par station terminé par « = » ::
+
+      SYNOP 2026-10-16
+      Dimbokro TN=21.5 TX=32.0 UN=45 UX=95 RR=12.4 FF=3.2 DD=SW SS=6.1=
+      Bocanda TN=22.0 TX=// RR=0.0=
+
+  « / » marque une valeur manquante, comme dans les messages SYNOP.
+"""
+import argparse
+import io
+import os
+import queue
+import shutil
+import socketserver
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from agromet.schema import DISPLAY_LABELS
+from agromet.stations import all_stations
+from agromet.store import COLUMNS, HISTORY_YEARS, MISSING, get_store, synthetic_until
+from agromet.synthetic import WIND_DIRECTIONS
+
+# Enregistrements validés et écrits ensemble
+BATCH_SIZE = 5000
+# Intervalle de scrutation des sources (secondes)
+POLL_SECONDS = 2.0
+
+MEASURES = tuple(column for column in COLUMNS if column != 'wind_dir')
+# Bornes physiquement plausibles ; une valeur hors bornes est rejetée (manquante)
+VALID_RANGES = {
+    'tmin': (-10, 50),
+    'tmax': (-10, 55),
+    'rhmin': (0, 100),
+    'rhmax': (0, 100),
+    'rain': (0, 500),
+    'wind': (0, 75),
+    'sun': (0, 14),
+}
+# Groupes des messages de type SYNOP -> colonnes du stockage
+SYNOP_GROUPS = {
+    'TN': 'tmin',
+    'TX': 'tmax',
+    'UN': 'rhmin',
+    'UX': 'rhmax',
+    'RR': 'rain',
+    'FF': 'wind',
+    'DD': 'wind_dir',
+    'SS': 'sun',
+}
+# En-têtes CSV acceptés : noms courts ou libellés d'affichage
+CSV_HEADERS = {label: column for column, label in DISPLAY_LABELS.items()}
+
+CSV_EXTENSIONS = ('.csv',)
+SYNOP_EXTENSIONS = ('.txt', '.synop')
+
+
+def _records(frame):
+    # Tableau normalisé : station, date, puis toutes les colonnes du stockage
+    frame = frame.rename(columns=lambda name: CSV_HEADERS.get(str(name).strip(), str(name).strip()))
+    records = pd.DataFrame({
+        'station': frame['station'].astype(str).str.strip() if 'station' in frame else pd.Series(dtype=str),
+        'date': pd.to_datetime(frame['date'], errors='coerce') if 'date' in frame else pd.Series(dtype='datetime64[ns]'),
+    })
+    for column in MEASURES:
+        records[column] = pd.to_numeric(frame[column], errors='coerce') if column in frame else np.nan
+    records['wind_dir'] = frame['wind_dir'].str.strip().str.upper() if 'wind_dir' in frame else None
+    return records
+
+
+def parse_csv(source, batch_size=BATCH_SIZE):
+    """Lots successifs d'enregistrements d'un fichier (ou texte) CSV."""
+    if isinstance(source, str) and not os.path.exists(source):
+        source = io.StringIO(source)
+    for chunk in pd.read_csv(source, chunksize=batch_size, dtype=str, skipinitialspace=True):
+        yield _records(chunk)
+
+
+def parse_synop(text, batch_size=BATCH_SIZE):
+    """Lots successifs d'enregistrements d'un texte de type SYNOP."""
+    rows, day = [], None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line == 'NNNN':
+            continue
+        if line.upper().startswith('SYNOP'):
+            parts = line.split()
+            day = parts[1] if len(parts) > 1 else None
+            continue
+        tokens = line.rstrip('=').split()
+        groups = [token for token in tokens if '=' in token]
+        row = {'station': ' '.join(token for token in tokens if '=' not in token), 'date': day}
+        for group in groups:
+            code, _, value = group.partition('=')
+            column = SYNOP_GROUPS.get(code.upper())
+            if column is not None and not value.startswith('/'):
+                row[column] = value
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield _records(pd.DataFrame(rows))
+            rows = []
+    if rows:
+        yield _records(pd.DataFrame(rows))
+
+
+def validate(records, today=None):
+    """Sépare les enregistrements valides des rejetés, en une passe sur le lot.
+
+    Un enregistrement est rejeté si la station est inconnue, la date invalide
+    ou future (ou antérieure à l'historique) ou s'il ne porte aucune mesure
+    valide. Une mesure hors bornes, une température minimale supérieure à la
+    maximale ou une direction de vent inconnue rendent la mesure manquante.
+    Retourne (enregistrements valides, motifs de rejet comptés).
+    """
+    today = np.datetime64(today or datetime.now().date(), 'D')
+    records = records.copy()
+    rejected = Counter()
+
+    for column, (low, high) in VALID_RANGES.items():
+        out_of_range = records[column].notna() & ~records[column].between(low, high)
+        rejected[f"{column} hors bornes"] += int(out_of_range.sum())
+        records.loc[out_of_range, column] = np.nan
+    for low, high in (('tmin', 'tmax'), ('rhmin', 'rhmax')):
+        inverted = records[low] > records[high]
+        rejected[f"{low} > {high}"] += int(inverted.sum())
+        records.loc[inverted, [low, high]] = np.nan
+    directions = records['wind_dir'].where(records['wind_dir'].isin(WIND_DIRECTIONS))
+    rejected['direction du vent inconnue'] += int((records['wind_dir'].notna() & directions.isna()).sum())
+    records['wind_dir'] = directions
+
+    dates = records['date'].values.astype('datetime64[D]')
+    history_start = np.datetime64(f"{int(str(today.astype('datetime64[Y]'))) - HISTORY_YEARS + 1}-01-01", 'D')
+    checks = {
+        'station inconnue': ~records['station'].isin(all_stations()),
+        'date invalide': records['date'].isna(),
+        'date hors historique': records['date'].notna() & ((dates > today) | (dates < history_start)),
+        'aucune mesure': records[list(MEASURES) + ['wind_dir']].isna().all(axis=1),
+    }
+    invalid = np.zeros(len(records), dtype=bool)
+    for reason, failed in checks.items():
+        failed = failed.to_numpy() & ~invalid
+        rejected[reason] += int(failed.sum())
+        invalid |= failed
+    return records[~invalid], +rejected
+
+
+class IngestReport:
+    """Bilan d'un lot : enregistrements reçus, écrits, rejetés ; jours ajoutés ou remplacés."""
+
+    def __init__(self):
+        self.received = 0
+        self.accepted = 0
+        self.rejected = Counter()
+        self.appended = 0
+        self.late = 0
+        self.stations = set()
+
+    def merge(self, other):
+        self.received += other.received
+        self.accepted += other.accepted
+        self.rejected += other.rejected
+        self.appended += other.appended
+        self.late += other.late
+        self.stations |= other.stations
+
+    def __str__(self):
+        rejected = ', '.join(f"{reason} : {count}" for reason, count in self.rejected.items()) or 'aucun'
+        return (f"{self.received} reçus, {self.accepted} écrits ({self.appended} jours ajoutés, "
+                f"{self.late} en retard ou corrigés) sur {len(self.stations)} stations ; rejets : {rejected}")
+
+
+class Ingestor:
+    """Écrit des lots d'enregistrements validés dans le stockage des stations."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def ingest(self, records):
+        report = IngestReport()
+        report.received = len(records)
+        records, report.rejected = validate(records)
+        # Dans un lot, le dernier enregistrement d'un (station, jour) l'emporte
+        records = records.assign(date=records['date'].dt.normalize()).drop_duplicates(['station', 'date'], keep='last')
+        report.accepted = len(records)
+
+        for station, group in records.groupby('station', sort=False):
+            group = group.sort_values('date')
+            dates = group['date'].values.astype('datetime64[D]')
+            values = {column: group[column].to_numpy(dtype=np.float32) for column in MEASURES}
+            codes = pd.Categorical(group['wind_dir'], categories=WIND_DIRECTIONS).codes
+            values['wind_dir'] = np.where(codes < 0, MISSING['wind_dir'], codes).astype(np.uint8)
+
+            # Jours en retard ou corrigés : antérieurs au filigrane, hors des
+            # jours simulés (qu'une observation remplace entièrement)
+            manifest = self.store.manifest(station)
+            if manifest is None:
+                late = np.zeros(dates.size, dtype=bool)
+            else:
+                late = (dates <= np.datetime64(manifest['last_date'], 'D')) & (dates > synthetic_until(manifest))
+
+            # Les variables absentes d'une correction gardent leur valeur
+            # stockée : fusion faite sous le verrou de la station, qui n'est
+            # plus complétée de jours simulés (voir StationStore.ensure_history)
+            self.store.write(station, dates, values, {'observed': True}, keep_stored=True)
+            report.appended += int((~late).sum())
+            report.late += int(late.sum())
+            report.stations.add(station)
+        return report
+
+    def ingest_batches(self, batches):
+        report = IngestReport()
+        for batch in batches:
+            report.merge(self.ingest(batch))
+        return report
+
+
+def parse_file(path):
+    """Lots d'enregistrements d'un fichier déposé, selon son extension."""
+    if path.lower().endswith(CSV_EXTENSIONS):
+        return parse_csv(path)
+    with open(path, encoding='utf-8') as f:
+        return parse_synop(f.read())
+
+
+def parse_message(text):
+    """Lots d'enregistrements d'un message reçu : SYNOP s'il commence par « SYNOP », CSV sinon."""
+    if text.lstrip().upper().startswith('SYNOP'):
+        return parse_synop(text)
+    return parse_csv(text)
+
+
+class DirectorySource:
+    """Répertoire de dépôt : chaque fichier est traité une fois puis déplacé.
+
+    Les fichiers traités vont dans ``traites/``, ceux qui n'ont pas pu être
+    lus dans ``rejets/``. Un fichier en cours d'écriture doit être déposé
+    sous un nom temporaire (commençant par « . ») puis renommé.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_dir = os.path.join(path, 'traites')
+        self.failed_dir = os.path.join(path, 'rejets')
+        for directory in (path, self.done_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def poll(self, ingestor):
+        """Traite les fichiers présents ; retourne [(nom, bilan ou erreur)]."""
+        results = []
+        names = sorted(name for name in os.listdir(self.path)
+                       if not name.startswith('.') and name.lower().endswith(CSV_EXTENSIONS + SYNOP_EXTENSIONS))
+        for name in names:
+            path = os.path.join(self.path, name)
+            try:
+                result = ingestor.ingest_batches(parse_file(path))
+                target = self.done_dir
+            except (ValueError, KeyError, UnicodeDecodeError, pd.errors.ParserError) as error:
+                result = error
+                target = self.failed_dir
+            shutil.move(path, os.path.join(target, f"{datetime.now():%Y%m%d%H%M%S}_{name}"))
+            results.append((name, result))
+        return results
+
+
+class _MessageHandler(socketserver.StreamRequestHandler):
+    # Une connexion transmet un message complet puis se ferme
+    def handle(self):
+        text = self.rfile.read().decode('utf-8', errors='replace')
+        if text.strip():
+            self.server.messages.put((self.client_address[0], text))
+
+
+class SocketSource:
+    """Réception de messages par TCP, mis en file puis traités par lots."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = socketserver.ThreadingTCPServer((host, port), _MessageHandler)
+        self.server.daemon_threads = True
+        self.server.messages = queue.Queue()
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, name='agromet-ingest', daemon=True)
+        self._thread.start()
+
+    def poll(self, ingestor, max_messages=1000):
+        results = []
+        for _ in range(max_messages):
+            try:
+                sender, text = self.server.messages.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                results.append((sender, ingestor.ingest_batches(parse_message(text))))
+            except (ValueError, KeyError, pd.errors.ParserError) as error:
+                results.append((sender, error))
+        return results
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(ingestor, sources, once=False, poll_seconds=POLL_SECONDS):
+    while True:
+        for source in sources:
+            for name, result in source.poll(ingestor):
+                status = f"ERREUR : {result}" if isinstance(result, Exception) else result
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {name} : {status}", flush=True)
+        if once:
+            return
+        time.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition des observations des stations.")
+    parser.add_argument('--watch', nargs='?', const='', metavar='RÉPERTOIRE',
+                        help="répertoire de dépôt des fichiers (par défaut <données>/entrees)")
+    parser.add_argument('--listen', type=int, metavar='PORT', help="port TCP de réception des messages")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--once', action='store_true', help="traite les fichiers présents puis s'arrête")
+    args = parser.parse_args()
+
+    store = get_store()
+    sources = []
+    if args.watch is not None or args.listen is None:
+        sources.append(DirectorySource(args.watch or os.path.join(store.data_root, 'entrees')))
+        print(f"Dépôts surveillés : {sources[-1].path}")
+    if args.listen is not None:
+        sources.append(SocketSource(args.host, args.listen))
+        print(f"Messages attendus sur {sources[-1].address[0]}:{sources[-1].address[1]}")
+    try:
+        run(Ingestor(store), sources, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for source in sources:
+            if isinstance(source, SocketSource):
+                source.close()
+
+
+if __name__ == '__main__':
+    main()
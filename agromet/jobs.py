@@ -0,0 +1,82 @@
+"""Travaux longs (bulletins, exports) confiés à un groupe de processus.
+
+Un travail écrit ses fichiers sur disque ; tant qu'ils existent, une
+nouvelle demande identique est servie sans relancer le calcul, et une
+demande identique à un travail en cours rejoint ce travail. Le groupe de
+processus est démarré en « spawn » (pas de fork d'un serveur multi-fils)
+et recréé si l'un de ses processus meurt.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+STATUS_QUEUED = 'en attente'
+STATUS_RUNNING = 'en cours'
+STATUS_DONE = 'terminé'
+STATUS_FAILED = 'échec'
+
+
+class JobQueue:
+    """File de travaux dédupliqués par clé, exécutés par un groupe de processus.
+
+    Les sous-classes définissent ``outputs(key)`` (fichiers produits par le
+    travail) et ``task(key)`` (fonction et arguments exécutés dans un
+    processus du groupe).
+    """
+
+    def __init__(self, data_root, max_workers=None):
+        self.data_root = data_root
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def outputs(self, key):
+        raise NotImplementedError
+
+    def task(self, key):
+        raise NotImplementedError
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _done_on_disk(self, key):
+        return all(os.path.exists(path) for path in self.outputs(key))
+
+    def submit(self, key):
+        """Lance le travail `key` si ses fichiers manquent et qu'il n'est pas en cours ; retourne la clé."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done():
+                return key
+            # Travail terminé dont les fichiers ont disparu (ou échoué) : relancé
+            if self._done_on_disk(key):
+                return key
+            func, *args = self.task(key)
+            try:
+                self._jobs[key] = self._pool().submit(func, *args)
+            except BrokenProcessPool:
+                # Un processus mort rend le groupe inutilisable : on le recrée
+                self._executor = None
+                self._jobs[key] = self._pool().submit(func, *args)
+        return key
+
+    def status(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is None:
+            return STATUS_DONE if self._done_on_disk(key) else None
+        if job.running():
+            return STATUS_RUNNING
+        if not job.done():
+            return STATUS_QUEUED
+        return STATUS_FAILED if job.exception() is not None else STATUS_DONE
+
+    def error(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+        return job.exception() if job is not None and job.done() else None
@@ -0,0 +1,263 @@
+"""Mesures de performance des réexécutions, agrégées sur toutes les sessions.
+
+Les portions chronométrées (« spans ») entourent les pages, les fonctions
+qui produisent les données et les appels d'affichage (``st.plotly_chart``,
+``st.dataframe``) :
+
+    @timed('page.daily_weather')
+    def show_daily_weather(region): ...
+
+    with span('render.plotly_chart'):
+        st.plotly_chart(fig)
+
+Chaque span alimente un histogramme (nombre, somme, maximum, répartition
+par seuils de durée) partagé par toutes les sessions du processus. S'y
+ajoutent l'empreinte de l'état des sessions (total, maximum et nombre :
+pas une série par session), la mémoire du processus et les compteurs du
+cache partagé. ``prometheus_text`` met le tout au format texte de
+Prometheus, ``write_prometheus`` l'écrit dans un fichier lu par le
+collecteur « textfile » de node_exporter, et ``start_writer`` le réécrit
+périodiquement depuis un fil d'arrière-plan.
+
+Les mesures sont désactivées par défaut (AGROMET_METRICS=1 pour les
+activer, ou depuis la page d'administration) : désactivées, un span ne
+coûte qu'un test de booléen.
+
+Ce module n'importe que la bibliothèque standard : il est chargé dès
+l'écran de connexion.
+"""
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Seuils (secondes) des histogrammes de durée
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Une session sans réexécution depuis ce délai (secondes) n'est plus comptée
+SESSION_TIMEOUT = 3600
+# Intervalle (secondes) entre deux écritures du fichier lu par node_exporter
+WRITE_INTERVAL = 15
+
+_enabled = os.environ.get('AGROMET_METRICS', '0') == '1'
+_lock = threading.Lock()
+_spans = {}
+_sessions = {}
+_writer = None
+_null_span = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+class _Histogram:
+    __slots__ = ('count', 'total', 'maximum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+def record(name, seconds):
+    with _lock:
+        histogram = _spans.get(name)
+        if histogram is None:
+            histogram = _spans[name] = _Histogram()
+        histogram.add(seconds)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Contexte chronométré ; sans effet si les mesures sont désactivées."""
+    return _Span(name) if _enabled else _null_span
+
+
+def timed(name):
+    """Décorateur : chaque appel de la fonction est un span `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_session(session_id, state_bytes):
+    """Empreinte (octets) de l'état d'une session, relevée à la fin de chaque exécution."""
+    if not _enabled:
+        return
+    now = time.time()
+    with _lock:
+        _sessions[session_id] = (state_bytes, now)
+        for stale in [key for key, (_, seen) in _sessions.items() if now - seen > SESSION_TIMEOUT]:
+            del _sessions[stale]
+
+
+def process_memory_bytes():
+    """Mémoire résidente du processus (octets), lue dans /proc si disponible."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def span_stats():
+    """{span: (nombre, somme, maximum, répartition cumulée par seuil)}."""
+    with _lock:
+        stats = {}
+        for name, histogram in sorted(_spans.items()):
+            cumulative, running = [], 0
+            for count in histogram.buckets:
+                running += count
+                cumulative.append(running)
+            stats[name] = (histogram.count, histogram.total, histogram.maximum, cumulative)
+        return stats
+
+
+def session_stats():
+    with _lock:
+        return {session: state_bytes for session, (state_bytes, _) in _sessions.items()}
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _sessions.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(cache_stats=None):
+    """Toutes les mesures au format d'exposition texte de Prometheus."""
+    lines = [
+        '# HELP agromet_span_duration_seconds Durée des portions chronométrées des réexécutions.',
+        '# TYPE agromet_span_duration_seconds histogram',
+    ]
+    for name, (count, total, _, cumulative) in span_stats().items():
+        label = f'span="{_escape(name)}"'
+        for bound, value in zip(BUCKETS, cumulative):
+            lines.append(f'agromet_span_duration_seconds_bucket{{{label},le="{bound}"}} {value}')
+        lines.append(f'agromet_span_duration_seconds_bucket{{{label},le="+Inf"}} {count}')
+        lines.append(f'agromet_span_duration_seconds_sum{{{label}}} {total:.6f}')
+        lines.append(f'agromet_span_duration_seconds_count{{{label}}} {count}')
+
+    lines += [
+        '# HELP agromet_span_duration_seconds_max Durée maximale observée par portion.',
+        '# TYPE agromet_span_duration_seconds_max gauge',
+    ]
+    for name, (_, _, maximum, _) in span_stats().items():
+        lines.append(f'agromet_span_duration_seconds_max{{span="{_escape(name)}"}} {maximum:.6f}')
+
+    sessions = session_stats()
+    lines += [
+        '# HELP agromet_sessions Sessions actives.',
+        '# TYPE agromet_sessions gauge',
+        f'agromet_sessions {len(sessions)}',
+        '# HELP agromet_session_state_bytes_total Empreinte cumulée de l\'état des sessions actives.',
+        '# TYPE agromet_session_state_bytes_total gauge',
+        f'agromet_session_state_bytes_total {sum(sessions.values())}',
+        '# HELP agromet_session_state_bytes_max Plus grande empreinte de l\'état d\'une session active.',
+        '# TYPE agromet_session_state_bytes_max gauge',
+        f'agromet_session_state_bytes_max {max(sessions.values(), default=0)}',
+        '# HELP agromet_process_resident_memory_bytes Mémoire résidente du processus.',
+        '# TYPE agromet_process_resident_memory_bytes gauge',
+        f'agromet_process_resident_memory_bytes {process_memory_bytes()}',
+    ]
+
+    if cache_stats is not None:
+        for counter in ('hits', 'misses', 'waits', 'invalidations', 'evictions', 'prefetches'):
+            lines += [
+                f'# HELP agromet_cache_{counter}_total Cache partagé : {counter}.',
+                f'# TYPE agromet_cache_{counter}_total counter',
+                f'agromet_cache_{counter}_total {cache_stats[counter]}',
+            ]
+        lines += [
+            '# HELP agromet_cache_bytes Taille des entrées du cache partagé.',
+            '# TYPE agromet_cache_bytes gauge',
+            f'agromet_cache_bytes {cache_stats["bytes"]}',
+            '# HELP agromet_cache_entries Nombre d\'entrées du cache partagé.',
+            '# TYPE agromet_cache_entries gauge',
+            f'agromet_cache_entries {cache_stats["entries"]}',
+            '# HELP agromet_cache_lookups_total Consultations du cache partagé par jeu de données.',
+            '# TYPE agromet_cache_lookups_total counter',
+        ]
+        for dataset, counts in cache_stats.get('datasets', {}).items():
+            for result, value in counts.items():
+                lines.append(f'agromet_cache_lookups_total{{dataset="{_escape(dataset)}",result="{result}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, cache_stats=None):
+    """Écrit les mesures dans `path` (collecteur « textfile » de node_exporter)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(cache_stats))
+    os.replace(tmp, path)
+    return path
+
+
+def start_writer(path, cache_stats=None, interval=WRITE_INTERVAL):
+    """Réécrit les mesures dans `path` toutes les `interval` secondes.
+
+    Un seul fil (démon) par processus, qui n'écrit que si les mesures sont
+    activées ; `cache_stats` est appelée à chaque écriture pour relever les compteurs du cache partagé.
+    """
+    global _writer
+
+    def run():
+        while True:
+            if _enabled:
+                try:
+                    write_prometheus(path, cache_stats() if cache_stats is not None else None)
+                except OSError:
+                    # Disque plein ou répertoire non accessible : nouvel essai au tour suivant
+                    pass
+            time.sleep(interval)
+
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=run, name='agromet-prometheus', daemon=True)
+            _writer.start()
+        return _writer
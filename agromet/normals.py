@@ -0,0 +1,268 @@
+"""Index des normales climatologiques sur 30 ans, par station.
+
+L'index contient, pour chaque station, la pluie normale des 36 décades et
+les normales journalières (par jour de l'année) des températures, humidités,
+pluies et vents. Il est calculé une fois par un traitement hors ligne :
+
+    python -m agromet.normals
+
+puis enregistré sur disque (``<données>/normals/normals_<début>-<fin>.npz``),
+chargé à la première consultation et partagé par toutes les sessions. Les
+consultations sont de simples accès par indice de ligne.
+
+Les pages ne construisent jamais l'index : s'il manque, elles confient sa
+construction à la file de travaux (``NormalsQueue``) et annoncent que les
+normales ne sont pas encore disponibles.
+"""
+import argparse
+import hashlib
+import os
+import threading
+import zipfile
+from datetime import date
+
+import numpy as np
+
+from agromet.dekads import N_DEKADS, dekad_of, year_of
+from agromet.jobs import JobQueue
+from agromet.stations import STATIONS_DATA, all_stations
+from agromet.store import StationStore, get_store
+
+DAILY_VARIABLES = ('tmin', 'tmax', 'rhmin', 'rhmax', 'rain', 'wind')
+DAYS_PER_YEAR = 366
+# Demi-largeur (en jours) de la fenêtre glissante qui lisse les normales journalières
+SMOOTHING_HALF_WINDOW = 7
+
+
+def default_period(today=None):
+    """Les 30 dernières années complètes."""
+    year = (today or date.today()).year
+    return year - 30, year - 1
+
+
+def day_of_year(dates):
+    """Indice du jour dans l'année (0 à 365)."""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return (dates - dates.astype('datetime64[Y]')).astype(np.int64)
+
+
+def _circular_window_sum(values, half_window):
+    # Somme glissante circulaire sur l'axe des jours, par sommes cumulées
+    padded = np.concatenate([values[:, -half_window:], values, values[:, :half_window]], axis=1)
+    cumulative = np.cumsum(padded, axis=1)
+    cumulative = np.concatenate([np.zeros((values.shape[0], 1)), cumulative], axis=1)
+    width = 2 * half_window + 1
+    return cumulative[:, width:] - cumulative[:, :-width]
+
+
+class NormalsIndex:
+    """Normales station × décade et station × jour de l'année."""
+
+    def __init__(self, stations, start_year, end_year, dekad_rain, daily):
+        self.stations = list(stations)
+        self.start_year = start_year
+        self.end_year = end_year
+        self.dekad_rain = dekad_rain
+        self.daily = daily
+        self._rows = {station: row for row, station in enumerate(self.stations)}
+
+    def covers(self, stations):
+        return all(station in self._rows for station in stations)
+
+    def station_dekad_rain(self, station):
+        row = self._rows.get(station)
+        if row is None:
+            return np.full(N_DEKADS, np.nan, dtype=np.float32)
+        return self.dekad_rain[row]
+
+    def station_daily(self, station, variable, day):
+        """Normale de `variable` pour la station au jour `day` (date ou indice)."""
+        row = self._rows.get(station)
+        if row is None:
+            return np.nan
+        if not isinstance(day, (int, np.integer)):
+            day = int(day_of_year(day))
+        return self.daily[variable][row, day]
+
+    def daily_values(self, stations, variable, dates):
+        """Normales (N, D) de `variable` pour des stations et des dates."""
+        rows = np.array([self._rows.get(station, -1) for station in stations])
+        values = self.daily[variable][rows[:, None], day_of_year(dates)[None, :]]
+        return np.where(rows[:, None] >= 0, values, np.nan)
+
+    def region_dekad_rain(self, region):
+        """Pluie normale par décade de la région : moyenne de ses stations."""
+        rows = [self._rows[station] for station in STATIONS_DATA[region] if station in self._rows]
+        if not rows:
+            return np.full(N_DEKADS, np.nan, dtype=np.float32)
+        return self.dekad_rain[rows].mean(axis=0)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            stations=np.array(self.stations),
+            period=np.array([self.start_year, self.end_year]),
+            dekad_rain=self.dekad_rain,
+            **{f"daily_{name}": values for name, values in self.daily.items()}
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            start_year, end_year = (int(year) for year in archive['period'])
+            daily = {name: archive[f"daily_{name}"] for name in DAILY_VARIABLES}
+            return cls(archive['stations'].tolist(), start_year, end_year, archive['dekad_rain'], daily)
+
+
+def build_normals(store, stations, start_year, end_year):
+    """Calcule l'index à partir des données journalières du stockage."""
+    n_years = end_year - start_year + 1
+    dekad_rain = np.full((len(stations), N_DEKADS), np.nan, dtype=np.float32)
+    daily = {name: np.full((len(stations), DAYS_PER_YEAR), np.nan, dtype=np.float32) for name in DAILY_VARIABLES}
+
+    for row, station in enumerate(stations):
+        dates, values = store.read(station, f"{start_year}-01-01", f"{end_year}-12-31", columns=DAILY_VARIABLES)
+        days = day_of_year(dates)
+
+        # Pluie décadaire : cumul par (année, décade), puis moyenne des années observées
+        rain = values['rain'].astype(np.float64)
+        observed = ~np.isnan(rain)
+        cells = (year_of(dates) - start_year) * N_DEKADS + dekad_of(dates)
+        totals = np.bincount(cells[observed], weights=rain[observed], minlength=n_years * N_DEKADS)
+        counts = np.bincount(cells[observed], minlength=n_years * N_DEKADS)
+        totals = np.where(counts > 0, totals, np.nan).reshape(n_years, N_DEKADS)
+        valid = ~np.isnan(totals)
+        with np.errstate(invalid='ignore'):
+            dekad_rain[row] = np.where(valid, totals, 0).sum(axis=0) / valid.sum(axis=0)
+
+        # Normales journalières : moyenne par jour de l'année, lissée sur ±7 jours
+        for name in DAILY_VARIABLES:
+            column = values[name].astype(np.float64)
+            observed = ~np.isnan(column)
+            sums = np.bincount(days[observed], weights=column[observed], minlength=DAYS_PER_YEAR)
+            counts = np.bincount(days[observed], minlength=DAYS_PER_YEAR).astype(np.float64)
+            sums = _circular_window_sum(sums[None, :], SMOOTHING_HALF_WINDOW)[0]
+            counts = _circular_window_sum(counts[None, :], SMOOTHING_HALF_WINDOW)[0]
+            with np.errstate(invalid='ignore'):
+                daily[name][row] = sums / counts
+
+    return NormalsIndex(stations, start_year, end_year, dekad_rain, daily)
+
+
+def normals_path(data_root, start_year, end_year):
+    return os.path.join(data_root, 'normals', f"normals_{start_year}-{end_year}.npz")
+
+
+_normals = None
+_queue = None
+_normals_lock = threading.Lock()
+
+
+def get_normals(store, period=None):
+    """Index partagé par toutes les sessions, chargé au premier appel.
+
+    Retourne None si le fichier de la période manque ou ne couvre pas toutes
+    les stations du réseau : l'index n'est jamais construit ici. Un fichier
+    illisible (l'écriture étant atomique, il est corrompu) est supprimé pour
+    que la file de travaux le reconstruise.
+    """
+    global _normals
+    start_year, end_year = period or default_period()
+    stations = all_stations()
+    with _normals_lock:
+        if (_normals is not None and (_normals.start_year, _normals.end_year) == (start_year, end_year)
+                and _normals.covers(stations)):
+            return _normals
+        path = normals_path(store.data_root, start_year, end_year)
+        if not os.path.exists(path):
+            return None
+        try:
+            index = NormalsIndex.load(path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            os.remove(path)
+            return None
+        if not index.covers(stations):
+            return None
+        _normals = index
+        return _normals
+
+
+def ensure_normals(store, period=None):
+    """Index de la période, construit puis enregistré s'il manque.
+
+    Réservé au traitement hors ligne et aux processus de la file de travaux.
+    """
+    start_year, end_year = period or default_period()
+    path = normals_path(store.data_root, start_year, end_year)
+    normals = get_normals(store, period)
+    # L'index gardé en mémoire ne suffit pas : le fichier peut avoir été supprimé
+    if normals is not None and os.path.exists(path):
+        return normals
+    stations = all_stations()
+    for station in stations:
+        store.ensure_history(station, date.today())
+    build_normals(store, stations, start_year, end_year).save(path)
+    return get_normals(store, period)
+
+
+def build_task(data_root, start_year, end_year, marker):
+    """Point d'entrée du processus de construction de l'index."""
+    ensure_normals(StationStore(data_root), (start_year, end_year))
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(f"{start_year}-{end_year}\n")
+    return marker
+
+
+class NormalsQueue(JobQueue):
+    """File de construction de l'index, dédupliquée par période et stations du réseau."""
+
+    def path(self, key):
+        start_year, end_year, network = key
+        return os.path.join(self.data_root, 'normals', f"normals_{start_year}-{end_year}_{network}.done")
+
+    def outputs(self, key):
+        # L'index lui-même en plus du marqueur : un index supprimé est reconstruit
+        start_year, end_year, _ = key
+        return [normals_path(self.data_root, start_year, end_year), self.path(key)]
+
+    def task(self, key):
+        start_year, end_year, _ = key
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        return build_task, self.data_root, start_year, end_year, self.path(key)
+
+    def submit(self, period=None):
+        """Demande la construction de l'index de la période et retourne sa clé."""
+        start_year, end_year = period or default_period()
+        network = hashlib.sha1(','.join(all_stations()).encode('utf-8')).hexdigest()[:12]
+        return super().submit((start_year, end_year, network))
+
+
+def get_normals_queue(store):
+    """File de construction partagée par toutes les sessions du processus."""
+    global _queue
+    with _normals_lock:
+        if _queue is None or _queue.data_root != store.data_root:
+            _queue = NormalsQueue(store.data_root, max_workers=1)
+        return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit l'index des normales sur 30 ans.")
+    parser.add_argument('--start-year', type=int)
+    parser.add_argument('--end-year', type=int)
+    args = parser.parse_args()
+
+    default_start, default_end = default_period()
+    start_year = args.start_year or default_start
+    end_year = args.end_year or default_end
+
+    store = get_store()
+    normals = ensure_normals(store, (start_year, end_year))
+    print(f"Normales {start_year}-{end_year} de {len(normals.stations)} stations : {normals_path(store.data_root, start_year, end_year)}")
+
+
+if __name__ == '__main__':
+    main()
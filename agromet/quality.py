@@ -0,0 +1,363 @@
+"""Contrôle qualité et bouchage des séries journalières des stations.
+
+Les observations brutes du stockage passent trois contrôles :
+
+- bornes : valeur hors des bornes plausibles (``VALID_RANGES``), ou
+  température minimale supérieure à la maximale ;
+- pas : pic isolé, qui s'écarte de plus de ``STEP_LIMITS`` des jours
+  précédent et suivant ;
+- cohérence spatiale : écart de plus de ``SPATIAL_TOLERANCES`` à
+  l'estimation tirée des stations voisines de ``STATIONS_DATA``
+  (pondération par l'inverse de la distance ; pour la pluie, cumul
+  dépassant de plus de la tolérance le plus fort des voisins).
+
+Les valeurs rejetées et les jours manquants sont ensuite bouchés : par
+interpolation linéaire dans le temps pour les trous d'au plus
+``MAX_GAP_DAYS`` jours (sauf la pluie), puis par l'estimation des stations
+voisines. Chaque valeur porte un octet d'indicateurs (``FLAG_*``), rangé à
+côté des valeurs contrôlées dans un second stockage (colonnes
+``<variable>_qc``, voir ``agromet.store``), que lisent les pages.
+
+Toutes les stations et tous les jours d'une fenêtre sont traités ensemble,
+par opérations sur des tableaux (stations × jours). La mise à jour suit le
+journal des modifications du stockage brut : seuls les jours modifiés,
+élargis de ``MARGIN_DAYS`` (pics et trous dépendent des jours voisins),
+sont retraités, pour chaque station modifiée et ses voisines. Les pages ne
+retraitent que les petites plages (``PAGE_DAYS`` jours au plus) ; le
+premier contrôle d'une station et les grosses corrections sont confiés à
+la file de travaux (``QualityQueue``), et les pages servent en attendant
+les séries déjà contrôlées. Le retraitement complet de l'historique avance
+année par année :
+
+    python -m agromet.quality --reprocess
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from agromet.ingest import VALID_RANGES
+from agromet.jobs import JobQueue
+from agromet.spatial import SpatialIndex
+from agromet.stations import STATIONS_DATA
+from agromet.store import COLUMNS, FLAG_COLUMNS, StationStore, get_store
+
+VARIABLES = tuple(column for column in COLUMNS if column != 'wind_dir')
+
+# Indicateurs (bits) : motif du rejet, puis mode de bouchage
+FLAG_RANGE = 1
+FLAG_STEP = 2
+FLAG_SPATIAL = 4
+FLAG_INTERPOLATED = 8
+FLAG_ESTIMATED = 16
+FLAG_MISSING = 32
+REJECTED = FLAG_RANGE | FLAG_STEP | FLAG_SPATIAL
+FLAG_LABELS = {
+    FLAG_RANGE: 'hors bornes',
+    FLAG_STEP: 'pic isolé',
+    FLAG_SPATIAL: 'incohérente avec les voisines',
+    FLAG_INTERPOLATED: 'interpolée',
+    FLAG_ESTIMATED: 'estimée par les voisines',
+    FLAG_MISSING: 'manquante',
+}
+
+# Écart maximal d'un jour aux jours précédent et suivant
+STEP_LIMITS = {'tmin': 10, 'tmax': 10, 'rhmin': 40, 'rhmax': 40, 'wind': 15}
+# Écart maximal à l'estimation des stations voisines
+SPATIAL_TOLERANCES = {'tmin': 8, 'tmax': 8, 'rhmin': 35, 'rhmax': 35, 'rain': 80, 'wind': 12}
+# Variables bouchées dans le temps (la pluie ne s'interpole pas d'un jour à l'autre)
+INTERPOLATED = ('tmin', 'tmax', 'rhmin', 'rhmax', 'wind', 'sun')
+MAX_GAP_DAYS = 3
+
+# Stations voisines : nombre, distance maximale, et minimum requis pour
+# contrôler ou estimer une valeur
+NEIGHBOURS = 4
+MAX_NEIGHBOUR_KM = 150.0
+MIN_NEIGHBOURS = 2
+
+# Jours relus et réécrits de part et d'autre des jours modifiés
+MARGIN_DAYS = MAX_GAP_DAYS + 2
+# Plage modifiée au-delà de laquelle une station est retraitée en arrière-plan plutôt que dans la page
+PAGE_DAYS = 92
+
+
+def _neighbour_reference(values, neighbours, weights, rain=False):
+    # Estimation (moyenne pondérée, ou maximum pour la pluie) des voisins de
+    # chaque station pour chaque jour ; NaN avec moins de MIN_NEIGHBOURS voisins observés
+    nearby = values[np.maximum(neighbours, 0)]
+    observed = ~np.isnan(nearby) & (neighbours >= 0)[:, :, None]
+    count = observed.sum(axis=1)
+    if rain:
+        reference = np.where(observed, nearby, -np.inf).max(axis=1)
+    else:
+        weighted = np.where(observed, weights[:, :, None], 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            reference = (weighted * np.where(observed, nearby, 0.0)).sum(axis=1) / weighted.sum(axis=1)
+    return np.where(count >= MIN_NEIGHBOURS, reference, np.nan)
+
+
+def _spikes(values, limit):
+    # Jours qui s'écartent de plus de `limit` de leurs deux voisins dans le
+    # temps (ou du seul voisin connu)
+    padded = np.pad(values, ((0, 0), (1, 1)), constant_values=np.nan)
+    before = np.abs(values - padded[:, :-2])
+    after = np.abs(values - padded[:, 2:])
+    known_before, known_after = ~np.isnan(before), ~np.isnan(after)
+    with np.errstate(invalid='ignore'):
+        return ((before > limit) | ~known_before) & ((after > limit) | ~known_after) & (known_before | known_after)
+
+
+def _interpolate(values, max_gap):
+    # Interpolation linéaire des trous d'au plus `max_gap` jours, bornés de
+    # part et d'autre par une valeur
+    n_days = values.shape[1]
+    days = np.arange(n_days)
+    valid = ~np.isnan(values)
+    previous = np.maximum.accumulate(np.where(valid, days, -1), axis=1)
+    following = np.minimum.accumulate(np.where(valid, days, n_days)[:, ::-1], axis=1)[:, ::-1]
+    fill = ~valid & (previous >= 0) & (following < n_days) & (following - previous - 1 <= max_gap)
+    low = np.take_along_axis(values, np.clip(previous, 0, n_days - 1), axis=1)
+    high = np.take_along_axis(values, np.clip(following, 0, n_days - 1), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        interpolated = low + (high - low) * (days - previous) / (following - previous)
+    return np.where(fill, interpolated, values), fill
+
+
+def check_series(values, neighbours, weights):
+    """Contrôle et bouche des séries (stations, jours) en une passe.
+
+    `values` associe à chaque variable un tableau (N, D) ; `neighbours`
+    donne les lignes (N, K) des stations voisines (-1 si aucune) et
+    `weights` leurs poids (N, K). Retourne les valeurs contrôlées et les
+    indicateurs {variable: tableau (N, D) d'octets}.
+    """
+    checked = {name: np.array(values[name], dtype=np.float32) for name in VARIABLES if name in values}
+    flags = {name: np.zeros(column.shape, dtype=np.uint8) for name, column in checked.items()}
+
+    # Bornes et pics : chaque station seule
+    for name, column in checked.items():
+        low, high = VALID_RANGES[name]
+        with np.errstate(invalid='ignore'):
+            flags[name][(column < low) | (column > high)] |= FLAG_RANGE
+        if name in STEP_LIMITS:
+            flags[name][_spikes(np.where(flags[name] == 0, column, np.nan), STEP_LIMITS[name])] |= FLAG_STEP
+    if 'tmin' in checked and 'tmax' in checked:
+        inverted = checked['tmin'] > checked['tmax']
+        flags['tmin'][inverted] |= FLAG_RANGE
+        flags['tmax'][inverted] |= FLAG_RANGE
+    for name, column in checked.items():
+        column[flags[name] != 0] = np.nan
+
+    # Cohérence spatiale, contre les valeurs des voisines qui ont passé les
+    # contrôles précédents
+    for name, column in checked.items():
+        if name not in SPATIAL_TOLERANCES:
+            continue
+        reference = _neighbour_reference(column, neighbours, weights, rain=name == 'rain')
+        with np.errstate(invalid='ignore'):
+            difference = column - reference if name == 'rain' else np.abs(column - reference)
+            outlier = difference > SPATIAL_TOLERANCES[name]
+        flags[name][outlier] |= FLAG_SPATIAL
+        column[outlier] = np.nan
+
+    # Bouchage : dans le temps, puis par les voisines
+    for name, column in checked.items():
+        if name in INTERPOLATED:
+            column[:], filled = _interpolate(column, MAX_GAP_DAYS)
+            flags[name][filled] |= FLAG_INTERPOLATED
+        estimate = _neighbour_reference(column, neighbours, weights)
+        filled = np.isnan(column) & ~np.isnan(estimate)
+        column[filled] = estimate[filled]
+        flags[name][filled] |= FLAG_ESTIMATED
+        flags[name][np.isnan(column)] |= FLAG_MISSING
+        np.round(column, 1, out=column)
+    return checked, flags
+
+
+def describe(flag):
+    """Libellé des indicateurs d'une valeur, p. ex. « pic isolé, interpolée »."""
+    return ', '.join(label for bit, label in FLAG_LABELS.items() if int(flag) & bit)
+
+
+class QualityControl:
+    """Séries contrôlées et bouchées de toutes les stations, tenues à jour depuis le stockage brut."""
+
+    def __init__(self, source, store, stations_data=STATIONS_DATA):
+        self.source = source
+        self.store = store
+        index = SpatialIndex.from_stations(stations_data)
+        self.stations = index.names
+
+        # Voisines de chaque station (elle-même exclue), dans le rayon maximal
+        k = min(NEIGHBOURS + 1, len(index))
+        nearest, distances = index.nearest_many(index.lats, index.lons, k)
+        own = nearest == np.arange(len(index))[:, None]
+        order = np.argsort(own, axis=1, kind='stable')[:, :k - 1]
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        self.neighbours = np.where(distances <= MAX_NEIGHBOUR_KM, nearest, -1)
+        self.weights = np.where(self.neighbours >= 0, 1.0 / np.maximum(distances, 1.0) ** 2, 0.0)
+
+        self.backlog = []
+        self._lock = threading.RLock()
+
+    def source_version(self, station):
+        """Version des données brutes prise en compte dans les séries contrôlées (0 si aucune).
+
+        Lue dans le manifeste des séries contrôlées : un retraitement fait
+        par un autre processus (file de travaux, ligne de commande) est vu.
+        """
+        manifest = self.store.manifest(station)
+        return manifest.get('source_version', 0) if manifest else 0
+
+    def ready(self):
+        """Vrai si toutes les stations du stockage brut ont des séries contrôlées."""
+        return all(self.source_version(station) > 0 for station in self.stations if self.source.manifest(station) is not None)
+
+    def update(self, until, full=False, max_days=None):
+        """Retraite les jours modifiés depuis le dernier appel (tout l'historique si `full`).
+
+        Chaque station n'est retraitée que sur sa propre plage modifiée,
+        avec ses voisines. Avec `max_days`, les stations jamais contrôlées
+        ou dont la plage modifiée dépasse `max_days` jours sont laissées au
+        retraitement en arrière-plan et listées dans ``backlog``. Retourne
+        le nombre de stations dont les séries ont été réécrites.
+        """
+        until = np.datetime64(until, 'D')
+        with self._lock:
+            # Stations regroupées par plage retraitée : une nouvelle journée
+            # touche les mêmes jours de toutes les stations
+            groups, backlog = {}, []
+            for row, station in enumerate(self.stations):
+                manifest = self.source.manifest(station)
+                if manifest is None:
+                    continue
+                seen = self.source_version(station)
+                history_start = np.datetime64(manifest['first_date'], 'D')
+                if full:
+                    days = history_start, np.datetime64(manifest['last_date'], 'D')
+                else:
+                    days = self.source.changes_since(station, seen)
+                if days is None or days[0] > until:
+                    continue
+                if max_days is not None and (seen == 0 or days[1] - days[0] >= max_days):
+                    backlog.append(station)
+                    continue
+                window = max(days[0] - MARGIN_DAYS, history_start), min(days[1] + MARGIN_DAYS, until)
+                groups.setdefault(window, {})[row] = {'source_version': manifest['version']}
+            self.backlog = backlog
+
+            rewritten = set()
+            for (first, last), metadata in groups.items():
+                rows = self._with_neighbours(np.array(sorted(metadata)))
+                # Année par année : une partition par colonne et par station
+                # écrite à chaque fois ; la version vue n'est notée qu'à la fin
+                years = np.arange(first.astype('datetime64[Y]'), last.astype('datetime64[Y]') + 1)
+                for year in years:
+                    start = max(first, year.astype('datetime64[D]'))
+                    end = min(last, (year + 1).astype('datetime64[D]') - 1)
+                    self._process(rows, start, end, metadata if year == years[-1] else {})
+                rewritten.update(rows.tolist())
+            return len(rewritten)
+
+    def _with_neighbours(self, rows):
+        neighbours = self.neighbours[rows]
+        return np.union1d(rows, neighbours[neighbours >= 0])
+
+    def _process(self, rows, start, end, metadata):
+        # Stations réécrites et leurs voisines, relues avec une marge de part et d'autre
+        read_rows = self._with_neighbours(rows)
+        stations = [self.stations[row] for row in read_rows]
+        dates, values = self.source.read_many(stations, start - MARGIN_DAYS, end + MARGIN_DAYS)
+        position = np.searchsorted(read_rows, self.neighbours[read_rows])
+        position = np.minimum(position, len(read_rows) - 1)
+        neighbours = np.where((self.neighbours[read_rows] >= 0) & (read_rows[position] == self.neighbours[read_rows]), position, -1)
+        checked, flags = check_series(values, neighbours, self.weights[read_rows])
+
+        days = slice(MARGIN_DAYS, dates.size - MARGIN_DAYS)
+        for row in np.searchsorted(read_rows, rows):
+            columns = {name: checked[name][row, days] for name in VARIABLES}
+            columns.update({f"{name}_qc": flags[name][row, days] for name in VARIABLES})
+            columns['wind_dir'] = values['wind_dir'][row, days]
+            station = stations[row]
+            self.store.write(station, dates[days], columns, metadata.get(read_rows[row]))
+
+    def flags(self, stations, start, end):
+        """Indicateurs {variable: tableau (N, D)} des stations sur [start, end]."""
+        _, flags = self.store.read_many(stations, start, end, columns=FLAG_COLUMNS)
+        return {name: flags[f"{name}_qc"] for name in VARIABLES}
+
+
+def backfill(data_root, until, marker):
+    """Point d'entrée du processus de retraitement : contrôle les stations en retard."""
+    quality = QualityControl(StationStore(data_root), StationStore(data_root, 'quality'))
+    count = quality.update(until)
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(f"{count}\n")
+    return count
+
+
+class QualityQueue(JobQueue):
+    """File du retraitement en arrière-plan, dédupliqué par état des stations en retard."""
+
+    def path(self, key):
+        return os.path.join(self.data_root, 'quality', f"backfill_{key[1]}.done")
+
+    def outputs(self, key):
+        return [self.path(key)]
+
+    def task(self, key):
+        return backfill, self.data_root, key[0], self.path(key)
+
+    def submit(self, store, until, stations):
+        """Demande le retraitement des `stations` (versions brutes actuelles) et retourne sa clé."""
+        versions = ','.join(f"{station}:{store.version(station)}" for station in stations)
+        version = hashlib.sha1(versions.encode('utf-8')).hexdigest()[:12]
+        return super().submit((str(np.datetime64(until, 'D')), version))
+
+
+_quality = None
+_queue = None
+_quality_lock = threading.Lock()
+
+
+def get_quality(source):
+    """Contrôle qualité partagé par toutes les sessions du processus.
+
+    Les séries contrôlées sont rangées à côté des données brutes, dans
+    ``<données>/quality``.
+    """
+    global _quality
+    with _quality_lock:
+        if _quality is None or _quality.source is not source:
+            _quality = QualityControl(source, StationStore(source.data_root, 'quality'))
+        return _quality
+
+
+def get_quality_queue(store):
+    """File de retraitement partagée par toutes les sessions du processus."""
+    global _queue
+    with _quality_lock:
+        if _queue is None or _queue.data_root != store.data_root:
+            _queue = QualityQueue(store.data_root, max_workers=1)
+        return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contrôle qualité et bouchage des séries des stations")
+    parser.add_argument('--reprocess', action='store_true', help="retraite tout l'historique")
+    args = parser.parse_args()
+
+    quality = get_quality(get_store())
+    start = time.perf_counter()
+    count = quality.update(datetime.now().date(), full=args.reprocess)
+    print(f"{count} stations contrôlées en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Agrégats régionaux des observations journalières.
+
+Pour chaque région et chaque jour des ``ROLLUP_DAYS`` derniers jours sont
+tenus la moyenne, le minimum, le maximum, les centiles (10, 50, 90) et
+l'écart-type (dispersion spatiale) des températures, humidités et pluies de
+ses stations, ainsi que le nombre de stations observées. S'y ajoute le
+classement des stations de chaque région sur les derniers jours.
+
+Le calcul est une passe groupée sur un tableau (stations × jours) par
+variable, les stations étant rangées région par région : sommes, minimums
+et maximums par région sont obtenus par ``reduceat`` sur l'axe des
+stations, et les centiles de toutes les régions par un seul tri, chaque
+valeur étant décalée selon le rang de sa région pour que les régions
+restent groupées dans l'ordre trié.
+
+Les agrégats sont tenus à jour comme les cumuls décadaires : seules les
+régions dont une station a changé (``changes_since`` du stockage) sont
+recalculées, et seulement sur les jours modifiés. Les pages lisent des
+tableaux (statistiques × jours) par région, dont la taille ne dépend pas
+du nombre de stations.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agromet.stations import STATIONS_DATA
+
+VARIABLES = ('tmin', 'tmax', 'rhmin', 'rhmax', 'rain')
+PERCENTILES = (10, 50, 90)
+STATISTICS = ('mean', 'min', 'max', 'p10', 'p50', 'p90', 'std', 'count')
+# Jours tenus (fenêtre glissante se terminant au dernier jour mis à jour)
+ROLLUP_DAYS = 366
+# Jours pris en compte dans le classement des stations
+RANKING_DAYS = 7
+
+
+def grouped_statistics(values, starts):
+    """Statistiques (groupes, STATISTICS, jours) de valeurs (stations, jours).
+
+    Les lignes de `values` sont rangées par groupe ; `starts` donne la
+    première ligne de chaque groupe (groupes non vides). Les NaN sont
+    ignorés ; un groupe sans valeur un jour donné vaut NaN ce jour-là.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    sizes = np.diff(np.append(starts, values.shape[0]))
+    group = np.repeat(np.arange(starts.size), sizes)[:, None]
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    count = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    total = np.add.reduceat(filled, starts, axis=0)
+    squares = np.add.reduceat(filled * filled, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+    statistics = {
+        'mean': mean,
+        'min': np.fmin.reduceat(values, starts, axis=0),
+        'max': np.fmax.reduceat(values, starts, axis=0),
+        'std': std,
+        'count': count,
+    }
+
+    # Centiles : les valeurs du groupe g sont ramenées dans [g × étendue,
+    # (g + 1) × étendue[ (NaN en fin d'intervalle), si bien qu'un seul tri
+    # de chaque colonne range chaque groupe, trié, sur ses propres lignes
+    low = np.nanmin(values) if valid.any() else 0.0
+    span = (np.nanmax(values) - low if valid.any() else 0.0) + 1.0
+    shifted = np.where(valid, values - low, span - 0.5) + group * span
+    ordered = np.sort(shifted, axis=0) - group * span + low
+    last = np.maximum(count - 1, 0)
+    for percentile in PERCENTILES:
+        position = percentile / 100 * last
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, last)
+        low_values = np.take_along_axis(ordered, starts[:, None] + below, axis=0)
+        high_values = np.take_along_axis(ordered, starts[:, None] + above, axis=0)
+        value = low_values + (high_values - low_values) * (position - below)
+        statistics[f"p{percentile}"] = np.where(count > 0, value, np.nan)
+
+    return np.stack([statistics[name] for name in STATISTICS], axis=1)
+
+
+class RegionRollups:
+    """Agrégats journaliers et classements des stations, par région."""
+
+    def __init__(self, store, regions=None, days=ROLLUP_DAYS):
+        self.store = store
+        regions = {region: list(stations) for region, stations in (regions or STATIONS_DATA).items() if stations}
+        self.regions = list(regions)
+        self.stations = [station for region in self.regions for station in regions[region]]
+        sizes = np.array([len(regions[region]) for region in self.regions])
+        self.starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.sizes = sizes
+        self.days = days
+        self.end = None
+        self.values = {name: np.full((len(self.regions), len(STATISTICS), days), np.nan, dtype=np.float32)
+                       for name in VARIABLES}
+        self.rankings = {}
+        # Versions des stations prises en compte, et compteur de mises à jour par région
+        self._seen = np.zeros(len(self.stations), dtype=np.int64)
+        self._versions = np.zeros(len(self.regions), dtype=np.int64)
+        self._index = {region: index for index, region in enumerate(self.regions)}
+        self._lock = threading.RLock()
+
+    def dates(self):
+        return self.end - (self.days - 1) + np.arange(self.days)
+
+    def version(self, region):
+        """Nombre de mises à jour des agrégats de la région (clé des caches de figures)."""
+        return int(self._versions[self._index[region]])
+
+    # -- Mise à jour ---------------------------------------------------------
+
+    def update(self, until):
+        """Avance la fenêtre jusqu'à `until` et recalcule les jours modifiés."""
+        until = np.datetime64(until, 'D')
+        with self._lock:
+            changed = {}
+            if self.end is None or until - self.end >= self.days:
+                self.end = until
+                changed = {index: (until - (self.days - 1), until) for index in range(len(self.regions))}
+            elif until > self.end:
+                # Glissement de la fenêtre : les nouveaux jours de toutes les régions
+                shift = int((until - self.end).astype(int))
+                for values in self.values.values():
+                    values[:, :, :-shift] = values[:, :, shift:]
+                    values[:, :, -shift:] = np.nan
+                self.end = until
+                changed = {index: (until - (shift - 1), until) for index in range(len(self.regions))}
+
+            # Jours modifiés (nouvelles observations, retards, corrections)
+            # depuis la version vue de chaque station
+            first_day = self.end - (self.days - 1)
+            current = np.array([self.store.version(station) for station in self.stations])
+            for row in np.flatnonzero(current != self._seen):
+                days = self.store.changes_since(self.stations[row], self._seen[row])
+                if days is None or days[1] < first_day or days[0] > self.end:
+                    continue
+                index = int(np.searchsorted(self.starts, row, side='right') - 1)
+                first, last = max(days[0], first_day), min(days[1], self.end)
+                if index in changed:
+                    first, last = min(first, changed[index][0]), max(last, changed[index][1])
+                changed[index] = (first, last)
+            self._seen = current
+
+            if changed:
+                regions = np.array(sorted(changed))
+                first = min(days[0] for days in changed.values())
+                last = max(days[1] for days in changed.values())
+                self._compute(regions, first, last)
+                self._rank(regions)
+                self._versions[regions] += 1
+
+    def _members(self, regions):
+        # Lignes des stations des régions, et début de chaque région dans cette sélection
+        rows = np.concatenate([np.arange(self.starts[index], self.starts[index] + self.sizes[index]) for index in regions])
+        starts = np.concatenate([[0], np.cumsum(self.sizes[regions])[:-1]])
+        return [self.stations[row] for row in rows], starts
+
+    def _compute(self, regions, first, last):
+        # Une lecture et une passe groupée pour toutes les régions concernées
+        stations, starts = self._members(regions)
+        _, values = self.store.read_many(stations, first, last, columns=VARIABLES)
+        offset = int((first - (self.end - (self.days - 1))).astype(int))
+        for name in VARIABLES:
+            self.values[name][regions, :, offset:offset + values[name].shape[1]] = grouped_statistics(values[name], starts)
+
+    def _rank(self, regions):
+        # Classement des stations sur les RANKING_DAYS derniers jours :
+        # cumul de pluie décroissant, puis températures et humidités moyennes
+        stations, starts = self._members(regions)
+        _, values = self.store.read_many(stations, self.end - (RANKING_DAYS - 1), self.end, columns=VARIABLES)
+        values = {name: column.astype(np.float64) for name, column in values.items()}
+        with np.errstate(invalid='ignore'):
+            frame = pd.DataFrame({
+                'region': np.repeat([self.regions[index] for index in regions], self.sizes[regions]),
+                'station': stations,
+                'rain': np.nansum(values['rain'], axis=1),
+                'tmax': np.nanmean(values['tmax'], axis=1),
+                'tmin': np.nanmean(values['tmin'], axis=1),
+                'rhmax': np.nanmean(values['rhmax'], axis=1),
+            })
+        frame['rank'] = frame.groupby('region', sort=False)['rain'].rank(ascending=False, method='min').astype(np.int32)
+        for region, ranking in frame.sort_values(['region', 'rank'], kind='stable').groupby('region', sort=False):
+            self.rankings[region] = ranking.drop(columns='region').reset_index(drop=True)
+
+    # -- Lecture -------------------------------------------------------------
+
+    def series(self, region, variable, days=None):
+        """Dates et statistiques {nom: tableau} de `variable` sur les `days` derniers jours."""
+        days = days or self.days
+        with self._lock:
+            statistics = self.values[variable][self._index[region], :, -days:].copy()
+            dates = self.dates()[-days:]
+        return dates, dict(zip(STATISTICS, statistics))
+
+    def ranking(self, region):
+        with self._lock:
+            return self.rankings.get(region)
+
+
+_rollups = None
+_rollups_lock = threading.Lock()
+
+
+def get_rollups(store):
+    """Agrégats partagés par toutes les sessions du processus."""
+    global _rollups
+    with _rollups_lock:
+        if _rollups is None or _rollups.store is not store:
+            _rollups = RegionRollups(store)
+        return _rollups
@@ -0,0 +1,72 @@
+"""Schéma typé des tableaux d'observations et libellés d'affichage.
+
+Les tableaux manipulés par l'application utilisent des noms de colonnes
+courts, des dates ``datetime64``, des catégories pour les stations, régions
+et directions du vent, et des mesures en ``float32``. Les libellés français
+ne sont appliqués qu'au moment de l'affichage, par ``to_display``.
+"""
+import numpy as np
+import pandas as pd
+
+from agromet.synthetic import WIND_DIRECTIONS
+
+MEASURE_COLUMNS = ('tmin', 'tmax', 'rhmin', 'rhmax', 'rain', 'wind', 'sun')
+WIND_DIRECTION_DTYPE = pd.CategoricalDtype(WIND_DIRECTIONS)
+
+OBSERVATION_COLUMNS = ('date', 'region', 'station') + MEASURE_COLUMNS[:6] + ('wind_dir', 'sun')
+
+# Libellés d'affichage des colonnes, dans l'ordre des tableaux à l'écran
+DISPLAY_LABELS = {
+    'date': 'Date',
+    'region': 'Région',
+    'station': 'Station',
+    'tmin': 'Température Min (°C)',
+    'tmax': 'Température Max (°C)',
+    'rhmin': 'Humidité Min (%)',
+    'rhmax': 'Humidité Max (%)',
+    'rain': 'Précipitations (mm)',
+    'wind': 'Vitesse Vent (m/s)',
+    'wind_dir': 'Direction Vent',
+    'sun': 'Insolation (h)',
+    'period': 'Période',
+    'rain_obs': 'Pluie observée (mm)',
+    'rain_normal': 'Moyenne 30 ans (mm)',
+    'rain_dev': 'Écart (mm)',
+    'rain_dev_pct': 'Écart (%)',
+    'rain_prev': 'Année précédente (mm)',
+}
+
+
+def observation_frame(region, stations, dates, values):
+    """Assemble le tableau long (station × jour) à partir de tableaux (N, D).
+
+    Les lignes sont ordonnées station par station ; aucune chaîne Python
+    n'est créée par ligne : stations, région et direction du vent sont des
+    catégories construites à partir de leurs codes.
+    """
+    n_stations, n_days = len(stations), len(dates)
+    frame = {
+        'date': pd.to_datetime(np.tile(np.asarray(dates, dtype='datetime64[D]'), n_stations)),
+        'region': pd.Categorical.from_codes(np.zeros(n_stations * n_days, dtype=np.int8), categories=[region]),
+        'station': pd.Categorical.from_codes(np.repeat(np.arange(n_stations, dtype=np.int16), n_days), categories=list(stations)),
+    }
+    for column in MEASURE_COLUMNS:
+        if column in values:
+            frame[column] = np.asarray(values[column], dtype=np.float32).ravel()
+    if 'wind_dir' in values:
+        # Sentinelle 255 (jour manquant) -> code -1 (valeur manquante)
+        codes = np.asarray(values['wind_dir']).ravel().astype(np.int8)
+        frame['wind_dir'] = pd.Categorical.from_codes(codes, dtype=WIND_DIRECTION_DTYPE)
+    return pd.DataFrame(frame, columns=[c for c in OBSERVATION_COLUMNS if c in frame])
+
+
+def to_display(frame, columns=None, date_format='%Y-%m-%d'):
+    """Copie d'affichage : libellés français, dates formatées, mesures au dixième."""
+    columns = list(columns or frame.columns)
+    display = frame[columns].copy()
+    for column in columns:
+        if pd.api.types.is_datetime64_any_dtype(display[column]):
+            display[column] = display[column].dt.strftime(date_format)
+        elif pd.api.types.is_float_dtype(display[column]):
+            display[column] = display[column].astype(np.float64).round(1)
+    return display.rename(columns=DISPLAY_LABELS)
@@ -0,0 +1,221 @@
+"""Bilan hydrique du sol (modèle « réservoir » FAO-56) sur toutes les stations.
+
+Chaque jour, la réserve reçoit la pluie et perd l'évapotranspiration de la
+culture (ET0 × Kc), bornée entre 0 et la capacité au champ :
+
+    S[t] = min(CC, max(0, S[t-1] + P[t] - Kc × ET0[t]))
+
+Chaque pas est une fonction « décalage puis bornage », et la composée de
+deux telles fonctions en est encore une. La série complète se calcule donc
+par un balayage préfixe (doublements successifs, log2(jours) passes)
+vectorisé sur stations × jours, sans boucle Python par station ni par jour.
+"""
+import os
+import threading
+
+import numpy as np
+
+from agromet.normals import day_of_year
+from agromet.stations import all_stations, station_coordinates
+
+FIELD_CAPACITY_MM = 100.0
+# Seuils de la réserve, en fraction de la capacité au champ
+CRITICAL_FRACTION = 0.3
+OPTIMAL_FRACTION = 0.8
+# Coefficient cultural par défaut (culture de référence)
+DEFAULT_KC = 1.0
+# Jours conservés dans l'état enregistré (et durée de mise en route du modèle)
+KEPT_DAYS = 400
+INITIAL_FRACTION = 0.5
+
+SOLAR_CONSTANT = 0.0820  # MJ m-2 min-1
+
+
+def extraterrestrial_radiation(latitude, days):
+    """Rayonnement extraterrestre Ra (MJ m-2 j-1), FAO-56 éq. 21.
+
+    `latitude` en degrés, de forme (N, 1) ou (N,) ; `days` indices du jour
+    de l'année (0 à 365).
+    """
+    phi = np.radians(latitude)
+    angle = 2 * np.pi * (np.asarray(days) + 1) / 365
+    inverse_distance = 1 + 0.033 * np.cos(angle)
+    declination = 0.409 * np.sin(angle - 1.39)
+    sunset_angle = np.arccos(np.clip(-np.tan(phi) * np.tan(declination), -1, 1))
+    return (24 * 60 / np.pi) * SOLAR_CONSTANT * inverse_distance * (
+        sunset_angle * np.sin(phi) * np.sin(declination)
+        + np.cos(phi) * np.cos(declination) * np.sin(sunset_angle)
+    )
+
+
+def reference_et(tmin, tmax, latitude, days):
+    """ET0 de Hargreaves (mm/j), FAO-56 éq. 52, pour des tableaux (N, D)."""
+    tmin = np.asarray(tmin, dtype=np.float64)
+    tmax = np.asarray(tmax, dtype=np.float64)
+    radiation = extraterrestrial_radiation(np.asarray(latitude, dtype=np.float64).reshape(-1, 1), days)
+    amplitude = np.sqrt(np.maximum(tmax - tmin, 0))
+    return 0.0023 * ((tmin + tmax) / 2 + 17.8) * amplitude * 0.408 * radiation
+
+
+def run_bucket(water_in, water_out, initial, capacity=FIELD_CAPACITY_MM):
+    """Réserve (N, D) à partir des apports et pertes journaliers (N, D).
+
+    `initial` est la réserve (N,) de la veille du premier jour ; les valeurs
+    manquantes des apports et pertes comptent pour zéro.
+    """
+    shift_by = np.nan_to_num(np.asarray(water_in, dtype=np.float64)) - np.nan_to_num(np.asarray(water_out, dtype=np.float64))
+    n_stations, n_days = shift_by.shape
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=np.float64).reshape(-1, 1), (n_stations, 1))
+    low = np.zeros_like(shift_by)
+    high = np.broadcast_to(capacity, shift_by.shape).copy()
+
+    # Balayage de Hillis-Steele : après la passe k, chaque jour porte la
+    # composée des 2^k pas qui le précèdent (lui compris).
+    step = 1
+    while step < n_days:
+        later_low, later_high = low[:, step:], high[:, step:]
+        later_shift = shift_by[:, step:]
+        new_low = np.clip(low[:, :-step] + later_shift, later_low, later_high)
+        new_high = np.clip(high[:, :-step] + later_shift, later_low, later_high)
+        new_shift = shift_by[:, :-step] + later_shift
+        low[:, step:], high[:, step:], shift_by[:, step:] = new_low, new_high, new_shift
+        step *= 2
+
+    initial = np.asarray(initial, dtype=np.float64).reshape(-1, 1)
+    return np.clip(initial + shift_by, low, high)
+
+
+class SoilWaterBalance:
+    """Réserve en eau de toutes les stations, avancée jour après jour.
+
+    L'état (réserve des ``KEPT_DAYS`` derniers jours de chaque station) est
+    enregistré sur disque ; l'arrivée d'un nouveau jour ne calcule que les
+    jours postérieurs au dernier état. Les stations dont des jours déjà
+    calculés ont été modifiés (observations en retard ou corrigées) sont
+    recalculées depuis le premier jour modifié ; une modification antérieure
+    à la fenêtre conservée est reportée à partir de son deuxième jour.
+    """
+
+    def __init__(self, store, kc=DEFAULT_KC, capacity=FIELD_CAPACITY_MM):
+        self.store = store
+        self.kc = kc
+        self.capacity = capacity
+        # Un état par stockage : bilans des séries brutes et contrôlées distincts
+        self.path = os.path.join(store.data_root, 'soil', f'balance_{store.name}.npz')
+        self._lock = threading.RLock()
+        self.stations = all_stations()
+        self.latitudes = np.array([station_coordinates(station)['lat'] for station in self.stations])
+        self.start = None
+        self.reserve = None
+        # Version des données de chaque station prise en compte dans la réserve
+        self.versions = None
+
+    def _load(self):
+        if self.reserve is not None or not os.path.exists(self.path):
+            return
+        with np.load(self.path) as archive:
+            if archive['stations'].tolist() != self.stations:
+                return
+            self.start = archive['start'][()]
+            self.reserve = archive['reserve']
+            self.versions = archive['versions'] if 'versions' in archive.files else np.zeros(len(self.stations), dtype=np.int64)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Fichier temporaire propre à l'écrivain (processus et fil)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp, stations=np.array(self.stations), start=self.start, reserve=self.reserve, versions=self.versions)
+        os.replace(tmp, self.path)
+
+    def _store_versions(self):
+        return np.array([self.store.version(station) for station in self.stations], dtype=np.int64)
+
+    def _apply_changes(self, versions):
+        # Recalcule, dans la fenêtre conservée, les stations modifiées depuis le dernier calcul
+        end = self.start + self.reserve.shape[1] - 1
+        rows, firsts = [], []
+        for row in np.flatnonzero(versions != self.versions):
+            changed = self.store.changes_since(self.stations[row], int(self.versions[row]))
+            # Jours postérieurs à la fenêtre : calculés par l'avance normale du bilan
+            if changed is None or changed[0] > end:
+                continue
+            rows.append(row)
+            firsts.append(max(changed[0], self.start + 1))
+        self.versions = versions
+        if not rows:
+            return False
+
+        first = min(firsts)
+        offset = int((first - self.start).astype(int))
+        dates, values = self.store.read_many([self.stations[row] for row in rows], first, end, columns=('tmin', 'tmax', 'rain'))
+        losses = self.kc * reference_et(values['tmin'], values['tmax'], self.latitudes[rows], day_of_year(dates))
+        initial = self.reserve[rows, offset - 1]
+        self.reserve[rows, offset:] = run_bucket(values['rain'], losses, initial, self.capacity)
+        return True
+
+    def crop_et(self, dates, tmin, tmax):
+        return self.kc * reference_et(tmin, tmax, self.latitudes, day_of_year(dates))
+
+    def update(self, until):
+        """Avance le bilan de toutes les stations jusqu'à `until` inclus."""
+        until = np.datetime64(until, 'D')
+        with self._lock:
+            self._load()
+            # Versions relevées avant la lecture : une écriture concurrente sera vue au prochain appel
+            versions = self._store_versions()
+            if self.reserve is None:
+                first = until - (KEPT_DAYS - 1)
+                initial = np.full(len(self.stations), INITIAL_FRACTION * self.capacity)
+                history = np.empty((len(self.stations), 0), dtype=np.float32)
+                changed = False
+            else:
+                changed = self._apply_changes(versions)
+                first = self.start + self.reserve.shape[1]
+                initial = self.reserve[:, -1]
+                history = self.reserve
+            self.versions = versions
+            if first > until:
+                if changed:
+                    self._save()
+                return
+
+            dates, values = self.store.read_many(self.stations, first, until, columns=('tmin', 'tmax', 'rain'))
+            losses = self.crop_et(dates, values['tmin'], values['tmax'])
+            reserve = run_bucket(values['rain'], losses, initial, self.capacity).astype(np.float32)
+
+            reserve = np.concatenate([history, reserve], axis=1)[:, -KEPT_DAYS:]
+            self.start = until - (reserve.shape[1] - 1)
+            self.reserve = reserve
+            self._save()
+
+    def series(self, stations, start, end):
+        """Dates et réserve (mm) des stations demandées sur [start, end]."""
+        start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        with self._lock:
+            first = int((max(start, self.start) - self.start).astype(int))
+            last = int((end - self.start).astype(int))
+            rows = [self.stations.index(station) for station in stations]
+            reserve = self.reserve[rows, first:last + 1]
+        dates = np.arange(self.start + first, self.start + first + reserve.shape[1], dtype='datetime64[D]')
+        return dates, reserve
+
+    def project(self, stations, dates, rain, tmin, tmax):
+        """Projette la réserve des stations sur les jours à venir (tableaux (N, D))."""
+        rows = [self.stations.index(station) for station in stations]
+        with self._lock:
+            initial = self.reserve[rows, -1]
+        losses = self.kc * reference_et(tmin, tmax, self.latitudes[rows], day_of_year(dates))
+        return run_bucket(rain, losses, initial, self.capacity)
+
+
+_balance = None
+_balance_lock = threading.Lock()
+
+
+def get_soil_balance(store):
+    """Bilan partagé par toutes les sessions du processus."""
+    global _balance
+    with _balance_lock:
+        if _balance is None or _balance.store is not store:
+            _balance = SoilWaterBalance(store)
+        return _balance
@@ -0,0 +1,214 @@
+"""Index spatial des stations et interpolation sur grille régulière.
+
+Les coordonnées sont projetées en kilomètres (projection équirectangulaire
+centrée sur la Côte d'Ivoire) et rangées dans des cases carrées : la
+recherche des k stations les plus proches d'un point n'examine que les
+cases voisines, par anneaux successifs, quel que soit le nombre de stations.
+
+Les grilles interpolées (pondération par l'inverse de la distance, sur les
+k plus proches voisins) sont gardées dans le cache partagé, par variable et
+par jour.
+"""
+import threading
+
+import numpy as np
+
+from agromet.cache import get_cache
+from agromet.stations import STATIONS_DATA
+
+EARTH_RADIUS_KM = 6371.0
+REFERENCE_LATITUDE = 7.5
+# Emprise de la Côte d'Ivoire (degrés) et pas de la grille d'interpolation
+GRID_BOUNDS = {'lat': (4.3, 10.8), 'lon': (-8.7, -2.4)}
+GRID_STEP = 0.1
+CELL_KM = 25.0
+
+IDW_NEIGHBOURS = 8
+IDW_POWER = 2
+# Nombre de points de grille traités par bloc lors des recherches groupées
+QUERY_CHUNK = 512
+# En deçà de ce nombre de stations, les recherches groupées comparent à toutes
+BRUTE_FORCE_STATIONS = 256
+
+
+def project(lat, lon):
+    """Coordonnées planes (x, y) en km."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return EARTH_RADIUS_KM * lon * np.cos(np.radians(REFERENCE_LATITUDE)), EARTH_RADIUS_KM * lat
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex:
+    """Index par cases des stations (ou pluviomètres) du réseau."""
+
+    def __init__(self, names, lats, lons, cell_km=CELL_KM):
+        self.names = list(names)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.x, self.y = project(self.lats, self.lons)
+        self.cell_km = cell_km
+
+        cells_x = np.floor(self.x / cell_km).astype(np.int64)
+        cells_y = np.floor(self.y / cell_km).astype(np.int64)
+        order = np.lexsort((cells_y, cells_x))
+        keys = np.stack([cells_x[order], cells_y[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        self._buckets = {
+            (int(keys[start, 0]), int(keys[start, 1])): order[start:end]
+            for start, end in zip(starts, np.r_[starts[1:], len(order)])
+        }
+
+    @classmethod
+    def from_stations(cls, stations_data=STATIONS_DATA):
+        names, lats, lons = [], [], []
+        for stations in stations_data.values():
+            for name, coordinates in stations.items():
+                names.append(name)
+                lats.append(coordinates['lat'])
+                lons.append(coordinates['lon'])
+        return cls(names, lats, lons)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _ring(self, center_x, center_y, radius):
+        if radius == 0:
+            cells = [(center_x, center_y)]
+        else:
+            span = range(-radius, radius + 1)
+            cells = [(center_x + d, center_y - radius) for d in span] + [(center_x + d, center_y + radius) for d in span]
+            cells += [(center_x - radius, center_y + d) for d in span[1:-1]] + [(center_x + radius, center_y + d) for d in span[1:-1]]
+        found = [self._buckets[cell] for cell in cells if cell in self._buckets]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def nearest(self, lat, lon, k=3):
+        """Les k stations les plus proches d'un point : [(nom, distance en km)]."""
+        k = min(k, len(self))
+        x, y = project(lat, lon)
+        center_x, center_y = int(np.floor(x / self.cell_km)), int(np.floor(y / self.cell_km))
+
+        candidates = np.empty(0, dtype=np.int64)
+        radius = 0
+        while True:
+            candidates = np.concatenate([candidates, self._ring(center_x, center_y, radius)])
+            if len(candidates) >= k:
+                distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+                kth = np.partition(distances, k - 1)[k - 1]
+                # Les cases non explorées sont au moins à radius × case du point
+                if kth <= radius * self.cell_km or len(candidates) == len(self):
+                    break
+            radius += 1
+
+        best = candidates[np.argsort(np.hypot(self.x[candidates] - x, self.y[candidates] - y))[:k]]
+        distances = haversine_km(lat, lon, self.lats[best], self.lons[best])
+        return [(self.names[i], float(d)) for i, d in zip(best, distances)]
+
+    def nearest_many(self, lats, lons, k):
+        """Indices (M, k) et distances en km (M, k) des k voisins de M points.
+
+        Les points sont traités case par case : chaque case n'est comparée
+        qu'aux stations des anneaux de cases voisines. Pour un petit réseau,
+        la comparaison directe à toutes les stations est plus rapide.
+        """
+        k = min(k, len(self))
+        x, y = project(lats, lons)
+        x, y = np.ravel(x), np.ravel(y)
+        indices = np.empty((x.size, k), dtype=np.int64)
+        distances = np.empty((x.size, k))
+
+        if len(self) <= BRUTE_FORCE_STATIONS:
+            everyone = np.arange(len(self))
+            for start in range(0, x.size, QUERY_CHUNK):
+                rows = np.arange(start, min(start + QUERY_CHUNK, x.size))
+                self._select(x, y, rows, everyone, k, indices, distances)
+            return indices, distances
+
+        cells_x = np.floor(x / self.cell_km).astype(np.int64)
+        cells_y = np.floor(y / self.cell_km).astype(np.int64)
+        order = np.lexsort((cells_y, cells_x))
+        starts = np.flatnonzero(np.r_[True, (np.diff(cells_x[order]) != 0) | (np.diff(cells_y[order]) != 0)])
+        for start, end in zip(starts, np.r_[starts[1:], x.size]):
+            rows = order[start:end]
+            center_x, center_y = int(cells_x[rows[0]]), int(cells_y[rows[0]])
+            candidates = np.empty(0, dtype=np.int64)
+            radius = 0
+            while True:
+                candidates = np.concatenate([candidates, self._ring(center_x, center_y, radius)])
+                if len(candidates) >= k:
+                    kth = self._select(x, y, rows, candidates, k, indices, distances)
+                    if kth.max() <= radius * self.cell_km or len(candidates) == len(self):
+                        break
+                radius += 1
+        return indices, distances
+
+    def _select(self, x, y, rows, candidates, k, indices, distances):
+        # k plus proches candidats de chaque point de `rows`, triés par distance
+        chunk = np.hypot(x[rows, None] - self.x[None, candidates], y[rows, None] - self.y[None, candidates])
+        if k < len(candidates):
+            nearest = np.argpartition(chunk, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.tile(np.arange(k), (len(rows), 1))
+        nearest_distances = np.take_along_axis(chunk, nearest, axis=1)
+        ranking = np.argsort(nearest_distances, axis=1)
+        indices[rows] = candidates[np.take_along_axis(nearest, ranking, axis=1)]
+        distances[rows] = np.take_along_axis(nearest_distances, ranking, axis=1)
+        return distances[rows, -1]
+
+    def subset(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return SpatialIndex([n for n, keep in zip(self.names, mask) if keep], self.lats[mask], self.lons[mask], self.cell_km)
+
+
+def grid_axes(bounds=GRID_BOUNDS, step=GRID_STEP):
+    lat_axis = np.arange(bounds['lat'][0], bounds['lat'][1] + step / 2, step)
+    lon_axis = np.arange(bounds['lon'][0], bounds['lon'][1] + step / 2, step)
+    return lat_axis, lon_axis
+
+
+def idw_grid(index, values, k=IDW_NEIGHBOURS, power=IDW_POWER, bounds=GRID_BOUNDS, step=GRID_STEP):
+    """Interpole les valeurs des stations (N,) sur la grille régulière.
+
+    Les stations sans valeur (NaN) sont écartées. Retourne les axes des
+    latitudes et longitudes et la grille (latitudes × longitudes).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    lat_axis, lon_axis = grid_axes(bounds, step)
+    if not valid.any():
+        return lat_axis, lon_axis, np.full((lat_axis.size, lon_axis.size), np.nan)
+    if not valid.all():
+        index, values = index.subset(valid), values[valid]
+
+    grid_lats, grid_lons = np.meshgrid(lat_axis, lon_axis, indexing='ij')
+    neighbours, distances = index.nearest_many(grid_lats, grid_lons, k)
+    weights = 1.0 / np.maximum(distances, 1e-6) ** power
+    grid = (weights * values[neighbours]).sum(axis=1) / weights.sum(axis=1)
+    return lat_axis, lon_axis, grid.reshape(grid_lats.shape)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_station_index():
+    """Index des stations de ``STATIONS_DATA``, partagé par toutes les sessions."""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = SpatialIndex.from_stations()
+        return _index
+
+
+def get_daily_grid(variable, day, values, version):
+    """Grille IDW de `variable` pour `day`, mise en cache par (variable, jour).
+
+    `version` identifie l'état des données sources : une nouvelle version
+    remplace la grille en cache.
+    """
+    return get_cache().get('idw_grid', variable, str(day), version, lambda: idw_grid(get_station_index(), values))
@@ -0,0 +1,28 @@
+"""Réseau des stations agrométéorologiques, par région."""
+
+# Données de stations par région
+STATIONS_DATA = {
+    "N'ZI": {
+        "Dimbokro": {"lat": 6.65, "lon": -4.7},
+        "Bocanda": {"lat": 7.066667, "lon": -4.516667},
+        "Bongouanou": {"lat": 6.65, "lon": -4.2}
+    },
+    "GOH": {
+        "Gagnoa": {"lat": 6.133333, "lon": -5.95},
+        "Ouragahio": {"lat": 6.316667, "lon": -5.933333},
+        "Oumé": {"lat": 6.366667, "lon": -5.416667}
+    }
+}
+
+
+def all_stations():
+    """Liste de toutes les stations du réseau, région par région."""
+    return [station for stations in STATIONS_DATA.values() for station in stations]
+
+
+def station_coordinates(station):
+    """Coordonnées {"lat", "lon"} d'une station, quelle que soit sa région."""
+    for stations in STATIONS_DATA.values():
+        if station in stations:
+            return stations[station]
+    raise KeyError(station)
@@ -0,0 +1,338 @@
+"""Stockage colonnaire des observations journalières des stations.
+
+Les données sont partitionnées par station puis par année, avec un fichier
+NumPy par colonne (``<racine>/<station>/<année>/<colonne>.npy``). Chaque
+partition compte 366 lignes indexées par le jour de l'année, ce qui permet
+de lire une fenêtre de dates par simple découpage des seules partitions
+concernées, sans charger l'historique complet. Ces petits fichiers (1,5 ko)
+sont lus entiers et gardés en mémoire, sans projection ``mmap`` : aucun
+fichier ne reste ouvert, et un fichier remplacé n'est pas retenu sur disque.
+
+Chaque écriture incrémente la version de la station et note dans son
+manifeste la plage de dates modifiées. Les traitements qui tiennent un
+état dérivé (cumuls décadaires, bilan hydrique) comparent la version vue
+lors de leur dernier calcul à la version courante et ne recalculent que
+les jours modifiés depuis (``changes_since``), y compris lorsque des
+observations en retard ou corrigées remplacent des jours anciens.
+"""
+import json
+import os
+import threading
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from agromet import synthetic
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : verrou entre fils seulement
+    fcntl = None
+
+# Colonnes stockées et valeur sentinelle des jours manquants
+COLUMNS = ('tmin', 'tmax', 'rhmin', 'rhmax', 'rain', 'wind', 'wind_dir', 'sun')
+COLUMN_DTYPES = {name: np.float32 for name in COLUMNS}
+COLUMN_DTYPES['wind_dir'] = np.uint8
+MISSING = {name: np.nan for name in COLUMNS}
+MISSING['wind_dir'] = 255
+# Indicateurs du contrôle qualité (``agromet.quality``) : un octet par
+# valeur, 0 pour un jour absent du stockage
+FLAG_COLUMNS = tuple(f"{name}_qc" for name in COLUMNS if name != 'wind_dir')
+COLUMN_DTYPES.update(dict.fromkeys(FLAG_COLUMNS, np.uint8))
+MISSING.update(dict.fromkeys(FLAG_COLUMNS, 0))
+
+DAYS_PER_PARTITION = 366
+# Profondeur de l'historique amorcé pour une station inconnue du stockage
+HISTORY_YEARS = 31
+# Écritures gardées dans le journal des modifications de chaque station
+MAX_CHANGES = 256
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+@lru_cache(maxsize=65536)
+def station_slug(station):
+    # "Oumé" -> "oume" : noms de répertoires sans accents ni espaces
+    ascii_name = unicodedata.normalize('NFKD', station).encode('ascii', 'ignore').decode('ascii')
+    return ''.join(c if c.isalnum() else '_' for c in ascii_name.lower())
+
+
+def _year_start(year):
+    return np.datetime64(f"{year:04d}-01-01", 'D')
+
+
+def _year_of(day):
+    return int(str(np.datetime64(day, 'Y')))
+
+
+@lru_cache(maxsize=8192)
+def _load_column(path, version):
+    # `version` ne sert qu'à la clé du cache : une écriture incrémente la
+    # version de la station et rend caduques les lectures précédentes.
+    # Tableau partagé entre les lectures : en lecture seule
+    column = np.load(path)
+    column.setflags(write=False)
+    return column
+
+
+def synthetic_until(manifest):
+    """Dernier jour simulé d'une station ; veille de son premier jour si elle n'a jamais été simulée."""
+    if 'synthetic_until' in manifest:
+        return np.datetime64(manifest['synthetic_until'], 'D')
+    return np.datetime64(manifest['first_date'], 'D') - 1
+
+
+class StationStore:
+    """Accès en lecture/écriture aux partitions station × année."""
+
+    def __init__(self, root, name='stations'):
+        self.data_root = root
+        self.name = name
+        self.root = os.path.join(root, name)
+        self._lock = threading.RLock()
+        self._manifests = {}
+
+    # -- Métadonnées ---------------------------------------------------------
+
+    def _station_dir(self, station):
+        return os.path.join(self.root, station_slug(station))
+
+    def _manifest_path(self, station):
+        return os.path.join(self._station_dir(station), 'manifest.json')
+
+    def manifest(self, station):
+        path = self._manifest_path(station)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._manifests.get(station)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self._manifests[station] = (mtime, manifest)
+        return manifest
+
+    def version(self, station):
+        manifest = self.manifest(station)
+        return manifest['version'] if manifest else 0
+
+    def _write_manifest(self, station, manifest):
+        path = self._manifest_path(station)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._manifests[station] = (os.stat(path).st_mtime_ns, manifest)
+
+    # -- Lecture -------------------------------------------------------------
+
+    def _column_path(self, station, year, column):
+        return os.path.join(self._station_dir(station), str(year), f"{column}.npy")
+
+    def _partition_column(self, station, year, column, version):
+        path = self._column_path(station, year, column)
+        if not os.path.exists(path):
+            return None
+        return _load_column(path, version)
+
+    def read(self, station, start, end, columns=None):
+        """Lit la fenêtre [start, end] (dates incluses) pour les colonnes demandées.
+
+        Retourne le tableau des dates (``datetime64[D]``) et un dictionnaire
+        colonne -> tableau ; les jours absents du stockage valent la
+        sentinelle de ``MISSING``.
+        """
+        columns = tuple(columns or COLUMNS)
+        start = np.datetime64(start, 'D')
+        end = np.datetime64(end, 'D')
+        dates = np.arange(start, end + 1, dtype='datetime64[D]')
+        version = self.version(station)
+
+        chunks = {name: [] for name in columns}
+        for year in range(_year_of(start), _year_of(end) + 1):
+            year_start = _year_start(year)
+            first = int((max(start, year_start) - year_start).astype(int))
+            last = int((min(end, _year_start(year + 1) - 1) - year_start).astype(int))
+            for name in columns:
+                partition = self._partition_column(station, year, name, version)
+                if partition is None:
+                    chunk = np.full(last - first + 1, MISSING[name], dtype=COLUMN_DTYPES[name])
+                else:
+                    chunk = np.asarray(partition[first:last + 1])
+                chunks[name].append(chunk)
+
+        return dates, {name: np.concatenate(parts) for name, parts in chunks.items()}
+
+    def read_many(self, stations, start, end, columns=None):
+        """Lit la même fenêtre pour plusieurs stations.
+
+        Retourne les dates et un dictionnaire colonne -> tableau (N, D), une
+        ligne par station dans l'ordre de `stations`.
+        """
+        columns = tuple(columns or COLUMNS)
+        dates = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1, dtype='datetime64[D]')
+        values = {name: np.empty((len(stations), dates.size), dtype=COLUMN_DTYPES[name]) for name in columns}
+        for row, station in enumerate(stations):
+            _, station_values = self.read(station, start, end, columns)
+            for name in columns:
+                values[name][row] = station_values[name]
+        return dates, values
+
+    # -- Écriture ------------------------------------------------------------
+
+    @contextmanager
+    def _locked(self, station):
+        # Verrou d'écriture de la station, partagé entre les fils et entre les
+        # processus (application et service d'acquisition des observations)
+        with self._lock:
+            directory = self._station_dir(station)
+            os.makedirs(directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(directory, '.lock'), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def write(self, station, dates, values, metadata=None, keep_stored=False):
+        """Écrit (ou remplace) des observations journalières d'une station.
+
+        `metadata` est ajouté au manifeste de la station (p. ex. la version
+        des données sources d'une série dérivée). Avec `keep_stored`, les
+        variables manquantes (NaN ou sentinelle) des jours déjà observés
+        gardent leur valeur stockée ; la lecture, la fusion et l'écriture se
+        font sous le verrou de la station, sans perdre une écriture
+        concurrente. Les jours simulés ne sont pas repris : une variable
+        manquante y reste manquante.
+        """
+        with self._locked(station):
+            if keep_stored:
+                values = self._keep_stored(station, dates, values)
+            self._write(station, dates, values, metadata)
+
+    def _keep_stored(self, station, dates, values):
+        manifest = self.manifest(station)
+        if manifest is None:
+            return values
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        stored_days = (dates <= np.datetime64(manifest['last_date'], 'D')) & (dates > synthetic_until(manifest))
+        if not stored_days.any():
+            return values
+        stored_dates, stored = self.read(station, dates[stored_days].min(), dates[stored_days].max(), columns=values)
+        index = np.clip((dates - stored_dates[0]).astype(int), 0, stored_dates.size - 1)
+        merged = {}
+        for name, column in values.items():
+            column = np.array(column, dtype=COLUMN_DTYPES[name])
+            missing = np.isnan(column) if np.issubdtype(column.dtype, np.floating) else column == MISSING[name]
+            missing &= stored_days
+            column[missing] = stored[name][index[missing]]
+            merged[name] = column
+        return merged
+
+    def _write(self, station, dates, values, metadata=None):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if dates.size == 0:
+            return
+        years = dates.astype('datetime64[Y]').astype(int) + 1970
+        manifest = dict(self.manifest(station) or {'station': station, 'version': 0})
+        version = manifest['version']
+        for year in np.unique(years):
+            year = int(year)
+            mask = years == year
+            index = (dates[mask] - _year_start(year)).astype(int)
+            year_dir = os.path.join(self._station_dir(station), str(year))
+            os.makedirs(year_dir, exist_ok=True)
+            # Année entière réécrite : inutile de relire la partition
+            whole = index.size == int((_year_start(year + 1) - _year_start(year)).astype(int))
+            for name, column in values.items():
+                current = None if whole else self._partition_column(station, year, name, version)
+                if current is None:
+                    data = np.full(DAYS_PER_PARTITION, MISSING[name], dtype=COLUMN_DTYPES[name])
+                else:
+                    data = np.array(current)
+                data[index] = np.asarray(column)[mask]
+                path = self._column_path(station, year, name)
+                tmp = f"{path}.tmp.npy"
+                np.save(tmp, data)
+                os.replace(tmp, path)
+
+        first, last = str(dates.min()), str(dates.max())
+        manifest['first_date'] = min(manifest.get('first_date', first), first)
+        manifest['last_date'] = max(manifest.get('last_date', last), last)
+        manifest['version'] = version + 1
+        # Journal des modifications : [version, premier jour, dernier jour]
+        changes = manifest.get('changes', []) + [[version + 1, first, last]]
+        manifest['changes'] = changes[-MAX_CHANGES:]
+        manifest.update(metadata or {})
+        self._write_manifest(station, manifest)
+
+    def changes_since(self, station, version):
+        """Plage [premier, dernier] des jours modifiés depuis `version`.
+
+        Retourne None si rien n'a changé, et la plage complète de la
+        station si le journal ne remonte pas jusqu'à `version`.
+        """
+        manifest = self.manifest(station)
+        if manifest is None or manifest['version'] <= version:
+            return None
+        changes = [change for change in manifest.get('changes', []) if change[0] > version]
+        if not changes or changes[0][0] != version + 1:
+            first, last = manifest['first_date'], manifest['last_date']
+        else:
+            first = min(change[1] for change in changes)
+            last = max(change[2] for change in changes)
+        return np.datetime64(first, 'D'), np.datetime64(last, 'D')
+
+    def ensure_history(self, station, until):
+        """Garantit la présence des données de la station jusqu'à `until`.
+
+        Une station absente du stockage est amorcée une fois avec
+        ``HISTORY_YEARS`` années de données simulées. Une station simulée
+        est complétée des jours manquants depuis sa dernière date, mais
+        plus aucun jour n'est simulé pour une station alimentée par le
+        service d'acquisition (``observed`` dans son manifeste) : ses jours
+        sans observation restent manquants.
+        """
+        until = np.datetime64(until, 'D')
+        # Cas courant (station observée ou déjà à jour) vérifié sans prendre le verrou
+        manifest = self.manifest(station)
+        if manifest is not None and (manifest.get('observed') or np.datetime64(manifest['last_date'], 'D') >= until):
+            return
+        with self._locked(station):
+            manifest = self.manifest(station)
+            if manifest is None:
+                start = _year_start(_year_of(until) - HISTORY_YEARS + 1)
+            elif manifest.get('observed'):
+                return
+            else:
+                start = np.datetime64(manifest['last_date'], 'D') + 1
+            if start > until:
+                return
+
+            dates = np.arange(start, until + 1, dtype='datetime64[D]')
+            drawn = synthetic.synthesize_weather([station], dates)
+            values = {name: drawn[name][0] for name in COLUMNS}
+            # Dernier jour simulé : une observation de ces jours les remplace
+            # sans reprendre les valeurs simulées
+            self._write(station, dates, values, {'synthetic_until': str(until)})
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Instance partagée par toutes les sessions du processus."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StationStore(os.environ.get('AGROMET_DATA_DIR', DEFAULT_ROOT))
+        return _store
@@ -0,0 +1,69 @@
+"""Source de données simulées utilisée pour amorcer le stockage des stations.
+
+Chaque valeur est dérivée d'un hachage de (station, jour, variable) : le
+tirage d'une station pour un jour donné est toujours le même, qu'elle soit
+générée seule ou dans un lot de milliers de stations, et tout le lot est
+produit par opérations sur tableaux, sans boucle Python par ligne.
+"""
+import zlib
+
+import numpy as np
+
+WIND_DIRECTIONS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+# Bornes (min, max) des tirages uniformes par variable
+VARIABLE_RANGES = {
+    'tmin': (20, 25),
+    'tmax': (28, 35),
+    'rhmin': (45, 60),
+    'rhmax': (75, 95),
+    'rain': (0, 25),
+    'wind': (1, 8),
+    'sun': (4, 12),
+}
+
+# Un hachage 32 bits fournit deux tirages 16 bits : variables groupées par paire
+_HASH_PAIRS = (('tmin', 'tmax'), ('rhmin', 'rhmax'), ('rain', 'wind'), ('sun', 'wind_dir'))
+_SALTS = (0x9E3779B9, 0x3C6EF372, 0xDAA66D2B, 0x78DDE6E4)
+
+
+def station_keys(stations):
+    return np.array([zlib.crc32(station.encode('utf-8')) for station in stations], dtype=np.uint32)
+
+
+def _mix32(x):
+    # Finaliseur 32 bits (variante de murmur3), appliqué en place
+    x ^= x >> np.uint32(16)
+    x *= np.uint32(0x7FEB352D)
+    x ^= x >> np.uint32(15)
+    x *= np.uint32(0x846CA68B)
+    x ^= x >> np.uint32(16)
+    return x
+
+
+def _scale(bits, low, high):
+    # 16 bits -> [low, high) arrondi au dixième, en float32
+    values = bits.astype(np.float32)
+    values *= np.float32((high - low) / 65536.0)
+    values += np.float32(low)
+    return np.round(values, 1, out=values)
+
+
+def synthesize_weather(stations, dates):
+    """Tire les observations simulées de N stations × D jours en une passe.
+
+    Retourne un dictionnaire colonne -> tableau de forme (N, D).
+    """
+    keys = station_keys(stations) * np.uint32(0x85EBCA6B)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64).astype(np.uint32) * np.uint32(0xC2B2AE35)
+    base = keys[:, None] ^ days[None, :]
+
+    columns = {}
+    for (first, second), salt in zip(_HASH_PAIRS, _SALTS):
+        hashed = _mix32(base + np.uint32(salt))
+        columns[first] = _scale(hashed & np.uint32(0xFFFF), *VARIABLE_RANGES[first])
+        if second == 'wind_dir':
+            columns[second] = (hashed >> np.uint32(29)).astype(np.uint8)
+        else:
+            columns[second] = _scale(hashed >> np.uint32(16), *VARIABLE_RANGES[second])
+    return columns
@@ -0,0 +1,125 @@
+"""Probabilités par terciles des prévisions saisonnières d'ensemble.
+
+Pour chaque station et chaque mois prévu, les cumuls de pluie observés sur
+la période de référence (30 ans) donnent deux bornes, les terciles : un
+tiers des années est en dessous de la première (saison « sèche »), un tiers
+au-dessus de la seconde (saison « humide »). La probabilité de chaque
+catégorie est la part des membres de l'ensemble qui y tombent.
+
+Tout l'ensemble (membres × stations × mois) est traité en une passe
+d'opérations sur tableaux : les terciles sont lus dans la climatologie
+triée (sans boucle par station, contrairement à ``np.nanpercentile`` en
+présence de NaN), puis les membres sont comparés aux bornes par
+diffusion. Un ensemble national (plusieurs centaines de membres, des
+milliers de stations) est traité en une fraction de seconde.
+
+Les climatologies mensuelles sont tirées des cumuls décadaires tenus à
+jour par ``agromet.dekads``.
+"""
+import numpy as np
+
+# Catégories, de la plus sèche à la plus humide
+CATEGORIES = ('below', 'normal', 'above')
+TERCILES = (1 / 3, 2 / 3)
+
+
+def monthly_climatology(aggregator, stations, start_year, end_year):
+    """Cumuls mensuels observés (N, années, 12) ; NaN pour les mois incomplets."""
+    n_years = end_year - start_year + 1
+    totals = np.full((len(stations), n_years, 12), np.nan)
+    for row, station in enumerate(stations):
+        dekads = aggregator.station(station)
+        if dekads is None:
+            continue
+        years = dekads.years(start_year, end_year + 1)
+        offset = max(dekads.first_year - start_year, 0)
+        totals[row, offset:offset + len(years)] = years.reshape(-1, 12, 3).sum(axis=2)
+    return totals
+
+
+def _quantiles(values, quantiles):
+    # Quantiles (interpolation linéaire, comme np.percentile) sur l'axe 1 en
+    # ignorant les NaN : le tri range les NaN en fin d'axe, il suffit de
+    # compter les valeurs valides de chaque série
+    ordered = np.sort(values, axis=1)
+    n_valid = np.count_nonzero(~np.isnan(values), axis=1)
+    last = np.maximum(n_valid - 1, 0)
+    results = []
+    for quantile in quantiles:
+        position = quantile * last
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, last)
+        low_values = np.take_along_axis(ordered, low[:, None], axis=1)[:, 0]
+        high_values = np.take_along_axis(ordered, high[:, None], axis=1)[:, 0]
+        value = low_values + (high_values - low_values) * (position - low)
+        results.append(np.where(n_valid > 0, value, np.nan))
+    return results
+
+
+def _mean(values, axis):
+    valid = ~np.isnan(values)
+    count = np.count_nonzero(valid, axis=axis)
+    total = np.where(valid, values, 0).sum(axis=axis, dtype=np.float64)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan), count
+
+
+def tercile_outlook(ensemble, climatology, calendar_months):
+    """Probabilités par terciles, anomalies et confiance d'un ensemble saisonnier.
+
+    `ensemble` contient les cumuls prévus (membres, stations, mois),
+    `climatology` les cumuls observés (stations, années, 12) et
+    `calendar_months` le mois calendaire (0 à 11) de chaque mois prévu.
+    Retourne un dictionnaire de tableaux (stations, mois + 1) dont la
+    dernière colonne porte la saison entière (cumul des mois prévus) :
+
+    - ``below``, ``normal``, ``above`` : probabilités des trois catégories
+      (1/3 chacune, probabilités climatologiques, sans membre ou sans
+      climatologie) ;
+    - ``lower``, ``upper`` : bornes des terciles ;
+    - ``mean``, ``climate_mean`` : moyennes de l'ensemble et de la
+      climatologie ; ``anomaly`` (mm) et ``anomaly_pct`` (%) leur écart ;
+    - ``confidence`` : écart de la catégorie la plus probable à 1/3,
+      ramené entre 0 (aucun signal) et 1 (tous les membres d'accord).
+    """
+    ensemble = np.asarray(ensemble, dtype=np.float32)
+    reference = np.asarray(climatology, dtype=np.float64)[:, :, calendar_months]
+    # Saison entière : cumul des mois (NaN si un mois manque)
+    ensemble = np.concatenate([ensemble, ensemble.sum(axis=2, keepdims=True)], axis=2)
+    reference = np.concatenate([reference, reference.sum(axis=2, keepdims=True)], axis=2)
+
+    lower, upper = _quantiles(reference, TERCILES)
+    n_members = np.count_nonzero(~np.isnan(ensemble), axis=0)
+    below = np.count_nonzero(ensemble < lower, axis=0)
+    above = np.count_nonzero(ensemble > upper, axis=0)
+    known = (n_members > 0) & ~np.isnan(lower)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        below = np.where(known, below / np.maximum(n_members, 1), 1 / 3)
+        above = np.where(known, above / np.maximum(n_members, 1), 1 / 3)
+    outlook = {'below': below, 'normal': 1 - below - above, 'above': above, 'lower': lower, 'upper': upper}
+    outlook['mean'], _ = _mean(ensemble, axis=0)
+    outlook['climate_mean'], _ = _mean(reference, axis=1)
+    return _finish(outlook)
+
+
+def _finish(outlook):
+    # Grandeurs déduites des probabilités et des moyennes
+    outlook['anomaly'] = outlook['mean'] - outlook['climate_mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        outlook['anomaly_pct'] = outlook['anomaly'] / outlook['climate_mean'] * 100
+    probabilities = np.stack([outlook[category] for category in CATEGORIES])
+    outlook['confidence'] = (probabilities.max(axis=0) - 1 / 3) * 1.5
+    return outlook
+
+
+def combine(outlook, rows=None):
+    """Perspective d'un groupe de stations (toutes par défaut) : moyennes par colonne."""
+    rows = slice(None) if rows is None else rows
+    combined = {}
+    for name in ('below', 'normal', 'above', 'lower', 'upper', 'mean', 'climate_mean'):
+        combined[name], _ = _mean(outlook[name][rows], axis=0)
+    return _finish(combined)
+
+
+def most_likely(outlook):
+    """Indice (dans CATEGORIES) de la catégorie la plus probable, par colonne."""
+    return np.stack([outlook[category] for category in CATEGORIES]).argmax(axis=0)
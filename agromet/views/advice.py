@@ -0,0 +1,155 @@
+"""Page « Avis et Conseils » et génération des bulletins."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agromet.advisories import get_network_advisories
+from agromet.bulletins import bulletin_name, get_bulletin_queue
+from agromet.jobs import STATUS_DONE, STATUS_FAILED
+from agromet.metrics import timed
+from agromet.normals import get_normals
+from agromet.stations import STATIONS_DATA
+from agromet.store import get_store
+from agromet.views.common import available_normals, checked_store, dataframe, region_stations, show_normals_progress
+from agromet.views.export import read_export
+
+# Avis de la région, extraits des avis du réseau (calculés une fois par jour
+# sur les séries contrôlées)
+@timed('data.load_region_advice')
+def load_region_advice(region):
+    store = checked_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    return get_network_advisories(store, get_normals(store), today).region(region)
+
+# Affichage d'une liste d'avis (niveau, message, stations concernées)
+def show_advice(items):
+    if not items:
+        st.info("ℹ️ Pas de recommandation particulière")
+    for level, message, stations in items:
+        getattr(st, level)(f"{message} ({', '.join(stations)})")
+
+@timed('page.advice')
+def show_advice_and_recommendations(region):
+    st.header(f"💡 Avis et Conseils Agrométéorologiques - Région {region}")
+    if available_normals() is None:
+        show_normals_progress()
+        return
+    
+    # Conseils basés sur les conditions actuelles
+    current_date = datetime.now().strftime("%d/%m/%Y")
+    
+    st.markdown(f"### 📅 Bulletin du {current_date}")
+    
+    # Conseils par type de culture, issus des règles évaluées sur tout le réseau
+    advice = load_region_advice(region)
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("#### 🌾 **Riziculture**")
+        show_advice(advice['Riziculture'])
+    
+    with col2:
+        st.markdown("#### 🌽 **Cultures Vivrières**")
+        show_advice(advice['Cultures Vivrières'])
+    
+    # Alertes météorologiques
+    st.markdown("### 🚨 Alertes et Recommandations Urgentes")
+    
+    if advice['Alertes']:
+        show_advice(advice['Alertes'])
+    else:
+        st.success("✅ Aucune alerte en cours pour la région")
+    
+    # Calendrier agricole
+    st.markdown("### 📅 Calendrier Agricole - Prochaines Semaines")
+    
+    calendar_activities = pd.DataFrame({
+        'Semaine': ['Semaine 1', 'Semaine 2', 'Semaine 3', 'Semaine 4'],
+        'Activités Principales': [
+            'Préparation des pépinières de riz',
+            'Semis des légumineuses de saison',
+            'Repiquage du riz (variétés précoces)',
+            'Premier sarclage des cultures installées'
+        ],
+        'Conditions Météo': [
+            'Pluviosité modérée attendue',
+            'Conditions sèches favorables',
+            'Retour des pluies régulières',
+            'Alternance soleil-pluie'
+        ],
+        'Priorité': ['Haute', 'Moyenne', 'Haute', 'Moyenne']
+    })
+    
+    dataframe(calendar_activities, use_container_width=True)
+    
+    # Téléchargement des recommandations
+    st.markdown("### 📥 Télécharger les Recommandations")
+    bulletin_panel(region)
+
+# Demande des bulletins (fragment : les boutons ne réexécutent que ce panneau)
+@st.fragment
+@timed('panel.bulletin_panel')
+def bulletin_panel(region):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("📄 Générer le bulletin PDF", type="primary"):
+            st.session_state.bulletin_jobs = [submit_bulletins([region])[0]]
+    
+    with col2:
+        if st.button("🗺️ Générer les bulletins de toutes les régions"):
+            st.session_state.bulletin_jobs = submit_bulletins(list(STATIONS_DATA))
+    
+    jobs = st.session_state.get('bulletin_jobs')
+    if jobs:
+        # Scrutation seulement tant qu'un rendu est en attente ou en cours
+        if pending_bulletins(jobs):
+            show_bulletin_progress()
+        else:
+            show_bulletin_downloads(jobs)
+
+# Prépare les données partagées puis confie le rendu des bulletins au groupe de processus
+def submit_bulletins(regions):
+    store = checked_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    for region in regions:
+        region_stations(region)
+    # Normales déjà chargées par la page ; le bilan hydrique est avancé par la file elle-même
+    queue = get_bulletin_queue(store)
+    return [queue.submit(store, region, today) for region in regions]
+
+# Nombre de bulletins demandés dont le rendu n'est pas terminé
+def pending_bulletins(jobs):
+    queue = get_bulletin_queue(get_store())
+    return sum(queue.status(key) not in (STATUS_DONE, STATUS_FAILED) for key in jobs)
+
+# Avancement des rendus, rafraîchi toutes les 2 secondes ; une fois tous
+# terminés, la page est réexécutée et ce fragment n'est plus affiché
+@st.fragment(run_every=2)
+@timed('panel.show_bulletin_progress')
+def show_bulletin_progress():
+    jobs = st.session_state.bulletin_jobs
+    pending = pending_bulletins(jobs)
+    if not pending:
+        st.rerun()
+    st.progress((len(jobs) - pending) / len(jobs), text=f"⏳ Bulletins générés : {len(jobs) - pending}/{len(jobs)}")
+
+# Boutons de téléchargement : les fichiers ne sont lus qu'au clic
+def show_bulletin_downloads(jobs):
+    queue = get_bulletin_queue(get_store())
+    for key in jobs:
+        region, day, _ = key
+        if queue.status(key) == STATUS_FAILED:
+            st.error(f"❌ Bulletin {region} : échec de la génération ({queue.error(key)})")
+            continue
+        paths = queue.paths(key)
+        name = bulletin_name(region, day)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(f"📄 Bulletin {region} (PDF)", lambda path=paths['pdf']: read_export(path), file_name=f"{name}.pdf",
+                               mime="application/pdf", on_click='ignore', key=f"pdf_{region}_{day}")
+        with col2:
+            st.download_button(f"📊 Bulletin {region} (Excel)", lambda path=paths['xlsx']: read_export(path), file_name=f"{name}.xlsx",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", on_click='ignore', key=f"xlsx_{region}_{day}")
@@ -0,0 +1,71 @@
+"""Fonctions partagées par les pages de l'application."""
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+
+from agromet.metrics import span
+from agromet.normals import get_normals, get_normals_queue
+from agromet.quality import PAGE_DAYS, get_quality, get_quality_queue
+from agromet.stations import STATIONS_DATA
+from agromet.store import get_store
+
+# Stations d'une région, complétées dans le stockage jusqu'à aujourd'hui
+def region_stations(region):
+    stations = list(STATIONS_DATA[region])
+    store = get_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    for station in stations:
+        store.ensure_history(station, today)
+    return stations
+
+# Séries contrôlées et bouchées de tout le réseau (les voisines d'une station
+# peuvent être dans une autre région). La page ne retraite que les petites
+# plages modifiées ; le reste part en arrière-plan, et tant que l'historique
+# n'est pas entièrement contrôlé les données brutes sont servies
+def checked_store():
+    for region in STATIONS_DATA:
+        region_stations(region)
+    store = get_store()
+    quality = get_quality(store)
+    today = np.datetime64(datetime.now().date(), 'D')
+    with span('data.quality_update'):
+        quality.update(today, max_days=PAGE_DAYS)
+    if quality.backlog:
+        get_quality_queue(store).submit(store, today, quality.backlog)
+    return quality.store if quality.ready() else store
+
+# Avertissement affiché tant que le contrôle qualité de l'historique n'est pas terminé
+def quality_notice():
+    if not get_quality(get_store()).ready():
+        st.info("🔎 Contrôle qualité de l'historique en cours : les données brutes sont affichées en attendant")
+
+# Normales sur 30 ans, ou None tant que l'index n'est pas construit : sa
+# construction est alors confiée à la file de travaux
+def available_normals():
+    store = get_store()
+    normals = get_normals(store)
+    if normals is None:
+        get_normals_queue(store).submit()
+    return normals
+
+# Avertissement rafraîchi toutes les 5 secondes pendant la construction des
+# normales ; une fois prêtes, la page est réexécutée
+@st.fragment(run_every=5)
+def show_normals_progress():
+    if get_normals(get_store()) is not None:
+        st.rerun()
+    st.info("📚 Normales climatologiques pas encore disponibles : calcul en cours, la page s'affichera dès qu'elles seront prêtes")
+
+# Version des données d'un ensemble de stations (clé des caches de figures)
+def data_version(stations, store):
+    return (store.name,) + tuple(store.version(station) for station in stations)
+
+# Affichage chronométré d'un graphique ou d'un tableau (sérialisation et envoi au navigateur compris)
+def plotly_chart(fig, **kwargs):
+    with span('render.plotly_chart'):
+        return st.plotly_chart(fig, **kwargs)
+
+def dataframe(data, **kwargs):
+    with span('render.dataframe'):
+        return st.dataframe(data, **kwargs)
@@ -0,0 +1,90 @@
+"""Page « Satisfaction en Eau des Cultures »."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from agromet.metrics import timed
+from agromet.normals import get_normals
+from agromet.views.common import available_normals, checked_store, plotly_chart, region_stations, show_normals_progress
+from agromet.wrsi import CROPS, get_season_wrsi
+
+# WRSI de la campagne en cours pour la région, sur les séries contrôlées (mis en cache par région et campagne)
+@timed('data.load_season_wrsi')
+def load_season_wrsi(region):
+    region_stations(region)
+    store = checked_store()
+    today = datetime.now().date()
+    return get_season_wrsi(store, get_normals(store), region, today.year, today)
+
+MONTH_NAMES = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin', 'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+
+def format_day(date):
+    date = pd.Timestamp(date)
+    return f"{date.day} {MONTH_NAMES[date.month - 1]}"
+
+@timed('page.crop_water')
+def show_crop_water_satisfaction(region):
+    st.header(f"💧 Niveau de Satisfaction en Eau des Cultures - Région {region}")
+    if available_normals() is None:
+        show_normals_progress()
+        return
+    crop_panel(region)
+
+# Satisfaction de la culture choisie (fragment : changer de culture ne réexécute que ce panneau)
+@st.fragment
+@timed('panel.crop_panel')
+def crop_panel(region):
+    # WRSI de la campagne en cours pour toutes les stations, dates de semis et cultures
+    crop = st.selectbox("Culture:", options=list(CROPS), index=0)
+    season_wrsi = load_season_wrsi(region)
+    stages = CROPS[crop].stage_labels
+    # Un stade sans observations ni normales exploitables n'a pas de niveau (None)
+    satisfaction_levels = [None if np.isnan(level) else int(round(level)) for level in season_wrsi.stage_satisfaction(crop)]
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        # Graphique en barres des niveaux de satisfaction
+        fig = go.Figure(data=[
+            go.Bar(
+                x=stages,
+                y=satisfaction_levels,
+                marker_color=['lightgray' if x is None else 'green' if x >= 80 else 'orange' if x >= 60 else 'red' for x in satisfaction_levels],
+                text=['n.d.' if x is None else f"{x}%" for x in satisfaction_levels],
+                textposition='auto'
+            )
+        ])
+        
+        fig.update_layout(
+            title="📊 Satisfaction en Eau par Stade",
+            xaxis_title="Stades de Développement",
+            yaxis_title="Niveau de Satisfaction (%)",
+            yaxis=dict(range=[0, 100])
+        )
+        
+        plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.markdown("### 🌾 État des Cultures")
+        
+        for i, (stage, level) in enumerate(zip(stages, satisfaction_levels)):
+            if level is None:
+                st.info(f"ℹ️ **{stage.split('(')[0]}**: Données insuffisantes")
+            elif level >= 80:
+                st.success(f"✅ **{stage.split('(')[0]}**: {level}% - Excellent")
+            elif level >= 60:
+                st.warning(f"⚠️ **{stage.split('(')[0]}**: {level}% - Correct")
+            else:
+                st.error(f"❌ **{stage.split('(')[0]}**: {level}% - Insuffisant")
+        
+        st.markdown("### 📅 Dates de Semis Recommandées")
+        best_date = pd.Timestamp(season_wrsi.sowing_dates[season_wrsi.best_sowing(crop)])
+        for label, first, last, level in season_wrsi.sowing_windows(crop):
+            period = f"{format_day(first)} - {format_day(last)} {season_wrsi.season}"
+            if first <= best_date <= last:
+                st.success(f"🌱 **{label}**: {period} (WRSI {level:.0f}%) - Recommandé, optimum le {format_day(best_date)}")
+            else:
+                st.info(f"🌱 **{label}**: {period} (WRSI {level:.0f}%)")
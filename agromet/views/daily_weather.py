@@ -0,0 +1,342 @@
+"""Page « Paramètres Météo Journaliers »."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from agromet.cache import get_cache
+from agromet.charts import lttb, minmax_downsample
+from agromet.metrics import timed
+from agromet.quality import VARIABLES, describe
+from agromet.rollups import RANKING_DAYS, get_rollups
+from agromet.schema import DISPLAY_LABELS, observation_frame, to_display
+from agromet.soil import get_soil_balance
+from agromet.spatial import get_daily_grid, get_station_index
+from agromet.stations import STATIONS_DATA, all_stations
+from agromet.store import COLUMNS, FLAG_COLUMNS
+from agromet.views.common import available_normals, checked_store, data_version, dataframe, plotly_chart, quality_notice
+from agromet.views.export import export_panel
+
+# Lecture des données météo contrôlées de toutes les stations d'une région en une passe (cache partagé),
+# avec les indicateurs du contrôle qualité (colonnes <variable>_qc)
+@timed('data.load_weather_data')
+def load_weather_data(region, days=7):
+    store = checked_store()
+    stations = list(STATIONS_DATA[region])
+    end = np.datetime64(datetime.now().date(), 'D')
+    start = end - (days - 1)
+    
+    def build():
+        dates, values = store.read_many(stations, start, end, columns=COLUMNS + FLAG_COLUMNS)
+        frame = observation_frame(region, stations, dates, values)
+        for column in FLAG_COLUMNS:
+            frame[column] = values[column].ravel()
+        return frame
+    
+    return get_cache().get('observations_checked', region, (start, end), data_version(stations, store), build)
+
+# Agrégats régionaux des séries contrôlées, mis à jour des seuls jours modifiés depuis le dernier appel
+@timed('data.load_region_rollups')
+def load_region_rollups():
+    rollups = get_rollups(checked_store())
+    rollups.update(np.datetime64(datetime.now().date(), 'D'))
+    return rollups
+
+# Jours affichés dans la synthèse régionale
+REGION_DAYS = 30
+
+# Libellés du classement des stations
+RANKING_LABELS = {
+    'rank': 'Rang',
+    'station': 'Station',
+    'rain': f'Pluie {RANKING_DAYS} j (mm)',
+    'tmax': 'Temp. Max moy. (°C)',
+    'tmin': 'Temp. Min moy. (°C)',
+    'rhmax': 'Humidité Max moy. (%)'
+}
+
+# Graphiques de la synthèse régionale : moyenne, bande des centiles 10-90 et extrêmes des stations
+@timed('data.build_region_figures')
+def build_region_figures(rollups, region):
+    dates, tmax = rollups.series(region, 'tmax', REGION_DAYS)
+    _, tmin = rollups.series(region, 'tmin', REGION_DAYS)
+    _, rain = rollups.series(region, 'rain', REGION_DAYS)
+    dates = pd.to_datetime(dates)
+    
+    fig_temp = go.Figure()
+    for name, stats, color in (('Temp Max', tmax, 'red'), ('Temp Min', tmin, 'blue')):
+        fig_temp.add_trace(go.Scatter(x=dates, y=stats['p90'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig_temp.add_trace(go.Scatter(x=dates, y=stats['p10'], mode='lines', line=dict(width=0), fill='tonexty',
+                                      fillcolor='rgba(128, 128, 128, 0.2)', name=f'{name} (centiles 10-90)'))
+        fig_temp.add_trace(go.Scatter(x=dates, y=stats['mean'], mode='lines', name=f'{name} (moyenne)', line=dict(color=color)))
+        fig_temp.add_trace(go.Scatter(x=dates, y=stats['max'] if name == 'Temp Max' else stats['min'], mode='lines',
+                                      name=f'{name} (extrême)', line=dict(color=color, dash='dot', width=1)))
+    fig_temp.update_layout(title="📈 Températures de la Région", xaxis_title="Date", yaxis_title="Température (°C)")
+    
+    fig_rain = go.Figure()
+    fig_rain.add_trace(go.Bar(x=dates, y=rain['mean'], name='Moyenne', marker_color='lightblue'))
+    fig_rain.add_trace(go.Scatter(x=dates, y=rain['max'], mode='markers', name='Station la plus arrosée', marker=dict(color='darkblue')))
+    fig_rain.update_layout(title="🌧️ Précipitations de la Région", xaxis_title="Date", yaxis_title="Précipitations (mm)")
+    return fig_temp, fig_rain
+
+# Périodes proposées pour les graphiques de séries journalières
+HISTORY_PERIODS = {
+    '7 jours': 7,
+    '30 jours': 30,
+    '1 an': 365,
+    '10 ans': 3653,
+    '30 ans': 10958
+}
+
+# Graphique des températures d'une station sur [start, end], courbes réduites par LTTB
+@timed('data.build_temperature_figure')
+def build_temperature_figure(store, station, start, end):
+    dates, values = store.read(station, start, end, columns=('tmin', 'tmax'))
+    mode = 'lines+markers' if len(dates) <= 31 else 'lines'
+    dates_max, tmax = lttb(dates, values['tmax'])
+    dates_min, tmin = lttb(dates, values['tmin'])
+    
+    fig_temp = go.Figure()
+    fig_temp.add_trace(go.Scatter(
+        x=dates_max,
+        y=tmax,
+        mode=mode,
+        name='Temp Max',
+        line=dict(color='red')
+    ))
+    fig_temp.add_trace(go.Scatter(
+        x=dates_min,
+        y=tmin,
+        mode=mode,
+        name='Temp Min',
+        line=dict(color='blue')
+    ))
+    fig_temp.update_layout(title="📈 Évolution des Températures", xaxis_title="Date", yaxis_title="Température (°C)")
+    return fig_temp
+
+# Graphique des pluies d'une station sur [start, end], réduites par minimum/maximum
+@timed('data.build_rain_figure')
+def build_rain_figure(store, station, start, end):
+    dates, values = store.read(station, start, end, columns=('rain',))
+    dates, rain = minmax_downsample(dates, values['rain'])
+    fig_rain = go.Figure(data=[
+        go.Bar(x=dates, y=rain, marker_color='lightblue')
+    ])
+    fig_rain.update_layout(title="🌧️ Précipitations Journalières", xaxis_title="Date", yaxis_title="Précipitations (mm)")
+    return fig_rain
+
+# Variables disponibles pour la carte interpolée
+GRID_VARIABLES = {
+    'Précipitations (mm)': 'rain',
+    'Température Max (°C)': 'tmax',
+    'Réserve en eau (%)': 'soil'
+}
+
+# Grille IDW d'une variable pour le dernier jour (mise en cache par variable et par jour)
+@timed('data.load_daily_grid')
+def load_daily_grid(variable):
+    stations = all_stations()
+    store = checked_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    if variable == 'soil':
+        balance = get_soil_balance(store)
+        balance.update(today)
+        _, reserve = balance.series(stations, today, today)
+        values = reserve[:, -1] / balance.capacity * 100
+    else:
+        _, values = store.read_many(stations, today, today, columns=(variable,))
+        values = values[variable][:, -1]
+    return get_daily_grid(variable, today, values, data_version(stations, store))
+
+@timed('page.daily_weather')
+def show_daily_weather(region):
+    # Chaque panneau est un fragment : changer de station, de période ou de
+    # variable de carte ne réexécute que le panneau concerné
+    quality_notice()
+    region_panel(region)
+    station_panel(region)
+    map_panel()
+    
+    with st.expander("📥 Exporter les observations journalières"):
+        export_panel(region, 'observations')
+
+# Synthèse de toutes les stations de la région, lue dans les agrégats régionaux
+@st.fragment
+@timed('panel.region_panel')
+def region_panel(region):
+    st.header(f"🗺️ Synthèse Régionale - {region}")
+    rollups = load_region_rollups()
+    latest = {variable: rollups.series(region, variable, 2)[1] for variable in ('tmax', 'rhmax', 'rain')}
+    
+    def change(variable):
+        return latest[variable]['mean'][-1] - latest[variable]['mean'][-2]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("🌡️ Température Max moyenne", f"{latest['tmax']['mean'][-1]:.1f}°C", f"{change('tmax'):+.1f}°C")
+    
+    with col2:
+        st.metric("💧 Humidité Max moyenne", f"{latest['rhmax']['mean'][-1]:.1f}%", f"{change('rhmax'):+.1f}%")
+    
+    with col3:
+        st.metric("🌧️ Précipitations moyennes", f"{latest['rain']['mean'][-1]:.1f} mm", f"{change('rain'):+.1f} mm")
+    
+    with col4:
+        st.metric("📡 Stations observées", f"{latest['rain']['count'][-1]:.0f}/{len(STATIONS_DATA[region])}")
+    
+    # Dispersion spatiale du dernier jour
+    tmax, rain = latest['tmax'], latest['rain']
+    st.caption(f"Dispersion entre stations : température max de {tmax['min'][-1]:.1f} à {tmax['max'][-1]:.1f}°C "
+               f"(écart-type {tmax['std'][-1]:.1f}°C), pluie de {rain['min'][-1]:.1f} à {rain['max'][-1]:.1f} mm "
+               f"(médiane {rain['p50'][-1]:.1f} mm)")
+    
+    fig_temp, fig_rain = get_cache().get('region_figures', region, REGION_DAYS, (rollups.end, rollups.version(region)),
+                                         lambda: build_region_figures(rollups, region))
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        plotly_chart(fig_temp, use_container_width=True)
+    
+    with col2:
+        plotly_chart(fig_rain, use_container_width=True)
+    
+    st.subheader(f"🏆 Classement des stations ({RANKING_DAYS} derniers jours)")
+    ranking = rollups.ranking(region)
+    dataframe(ranking[list(RANKING_LABELS)].rename(columns=RANKING_LABELS).round(1), use_container_width=True, hide_index=True)
+
+# Valeurs signalées par le contrôle qualité dans un tableau d'observations, la plus récente d'abord
+def quality_notes(weather_data, limit=5):
+    notes = []
+    for _, row in weather_data.iloc[::-1].iterrows():
+        for variable in VARIABLES:
+            flag = row[f"{variable}_qc"]
+            if flag:
+                notes.append(f"{DISPLAY_LABELS[variable]} du {row['date']:%d/%m} : {describe(flag)}")
+    return notes[:limit] + ([f"{len(notes) - limit} autres valeurs"] if len(notes) > limit else [])
+
+# Métriques et tableau de la station choisie
+@st.fragment
+@timed('panel.station_panel')
+def station_panel(region):
+    station = st.selectbox("📍 Station:", options=list(STATIONS_DATA[region]), index=0)
+    st.header(f"📊 Paramètres Météorologiques Journaliers - {station}")
+    
+    # Lecture des données météo de toutes les stations de la région en une passe
+    region_data = load_weather_data(region)
+    weather_data = region_data[region_data['station'] == station].reset_index(drop=True)
+    
+    # Métriques principales, comparées aux normales du jour (sans écart tant
+    # que les normales ne sont pas construites)
+    latest_data = weather_data.iloc[-1]
+    normals = available_normals()
+    
+    def deviation(variable, unit):
+        if normals is None:
+            return None
+        return f"{latest_data[variable] - normals.station_daily(station, variable, latest_data['date']):+.1f}{unit}"
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            label="🌡️ Température Max",
+            value=f"{latest_data['tmax']:.1f}°C",
+            delta=deviation('tmax', '°C')
+        )
+    
+    with col2:
+        st.metric(
+            label="💧 Humidité Max",
+            value=f"{latest_data['rhmax']:.1f}%",
+            delta=deviation('rhmax', '%')
+        )
+    
+    with col3:
+        st.metric(
+            label="🌧️ Précipitations",
+            value=f"{latest_data['rain']:.1f} mm",
+            delta=deviation('rain', ' mm')
+        )
+    
+    with col4:
+        st.metric(
+            label="💨 Vitesse Vent",
+            value=f"{latest_data['wind']:.1f} m/s",
+            delta=deviation('wind', ' m/s')
+        )
+    
+    # Tableau des données
+    st.subheader("📋 Données des 7 derniers jours")
+    dataframe(to_display(weather_data, columns=['date', 'station', 'tmin', 'tmax', 'rhmin', 'rhmax', 'rain', 'wind', 'wind_dir', 'sun']), use_container_width=True)
+    
+    # Valeurs rejetées ou bouchées par le contrôle qualité
+    notes = quality_notes(weather_data)
+    if notes:
+        st.caption("🔎 Contrôle qualité : " + " ; ".join(notes))
+    
+    history_panel(region, station)
+
+# Figures d'une station, tirées des séries contrôlées et prises dans le cache partagé (construites si besoin)
+def temperature_figure(store, station, start, end):
+    return get_cache().get('temperature_figure', station, (start, end), data_version([station], store), lambda: build_temperature_figure(store, station, start, end))
+
+def rain_figure(store, station, start, end):
+    return get_cache().get('rain_figure', station, (start, end), data_version([station], store), lambda: build_rain_figure(store, station, start, end))
+
+# Calcul d'avance des graphiques des autres stations de la région, pour un changement de station immédiat
+def prefetch_neighbours(store, region, station, start, end):
+    cache = get_cache()
+    for neighbour in STATIONS_DATA[region]:
+        if neighbour == station:
+            continue
+        version = data_version([neighbour], store)
+        cache.prefetch('temperature_figure', neighbour, (start, end), version, lambda s=neighbour: build_temperature_figure(store, s, start, end))
+        cache.prefetch('rain_figure', neighbour, (start, end), version, lambda s=neighbour: build_rain_figure(store, s, start, end))
+
+# Graphiques sur une période au choix, réduits à la résolution de l'écran
+@st.fragment
+@timed('panel.history_panel')
+def history_panel(region, station):
+    period_label = st.radio("Période des graphiques:", options=list(HISTORY_PERIODS), index=0, horizontal=True)
+    end = datetime.now().date()
+    start = end - timedelta(days=HISTORY_PERIODS[period_label] - 1)
+    if HISTORY_PERIODS[period_label] > 31:
+        # Zoom : la fenêtre choisie est relue et réduite à nouveau, donc plus détaillée
+        start, end = st.slider("🔍 Zoom", min_value=start, max_value=end, value=(start, end), format="DD/MM/YYYY")
+    
+    store = checked_store()
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Graphique des températures
+        plotly_chart(temperature_figure(store, station, start, end), use_container_width=True)
+    
+    with col2:
+        # Graphique des précipitations
+        plotly_chart(rain_figure(store, station, start, end), use_container_width=True)
+    
+    prefetch_neighbours(store, region, station, start, end)
+
+# Carte interpolée du réseau pour le dernier jour
+@st.fragment
+@timed('panel.map_panel')
+def map_panel():
+    st.subheader("🗺️ Carte du jour - Côte d'Ivoire")
+    grid_label = st.selectbox("Variable:", options=list(GRID_VARIABLES), index=0)
+    variable = GRID_VARIABLES[grid_label]
+    today = datetime.now().date()
+    
+    def build_map():
+        lat_axis, lon_axis, grid = load_daily_grid(variable)
+        index = get_station_index()
+        fig_map = go.Figure()
+        fig_map.add_trace(go.Heatmap(x=lon_axis, y=lat_axis, z=grid, colorscale='Blues' if variable != 'tmax' else 'YlOrRd', colorbar=dict(title=grid_label)))
+        fig_map.add_trace(go.Scatter(x=index.lons, y=index.lats, mode='markers+text', text=index.names, textposition='top center', marker=dict(color='black', size=8), name='Stations'))
+        fig_map.update_layout(xaxis_title="Longitude", yaxis_title="Latitude", yaxis=dict(scaleanchor='x'), height=600)
+        return fig_map
+    
+    fig_map = get_cache().get('map_figure', variable, today, data_version(all_stations(), checked_store()), build_map)
+    plotly_chart(fig_map, use_container_width=True)
@@ -0,0 +1,91 @@
+"""Panneau d'export des données, commun aux pages qui affichent des tableaux."""
+import os
+from datetime import date, datetime, timedelta
+
+import streamlit as st
+
+from agromet.exports import EXPORT_DATASETS, EXPORT_FORMATS, NETWORK, get_export_queue, scope_stations
+from agromet.jobs import STATUS_DONE, STATUS_FAILED
+from agromet.metrics import timed
+from agromet.store import HISTORY_YEARS, get_store, station_slug
+from agromet.views.common import region_stations
+
+FORMAT_LABELS = {'csv': 'CSV', 'xlsx': 'Excel', 'parquet': 'Parquet'}
+
+# Choix de l'export (fragment : les réglages ne réexécutent que ce panneau)
+@st.fragment
+@timed('panel.export_panel')
+def export_panel(region, dataset):
+    today = datetime.now().date()
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        scope = st.radio("Étendue:", options=[region, NETWORK], key=f"export_scope_{dataset}",
+                         format_func=lambda s: "Tout le réseau" if s == NETWORK else f"Région {s}")
+    
+    with col2:
+        # Tout l'historique du stockage peut être exporté
+        period = st.date_input("Période:", value=(today - timedelta(days=364), today), key=f"export_period_{dataset}",
+                               min_value=date(today.year - HISTORY_YEARS + 1, 1, 1), max_value=today, format="DD/MM/YYYY")
+    
+    with col3:
+        fmt = st.selectbox("Format:", options=list(EXPORT_FORMATS), format_func=FORMAT_LABELS.get, key=f"export_format_{dataset}")
+    
+    if len(period) != 2:
+        st.info("ℹ️ Choisissez la date de fin de la période")
+        return
+    
+    if st.button("📥 Préparer l'export", key=f"export_submit_{dataset}"):
+        st.session_state[f"export_job_{dataset}"] = submit_export(dataset, scope, *period, fmt)
+    
+    key = st.session_state.get(f"export_job_{dataset}")
+    if key:
+        # Scrutation seulement tant que l'export est en attente ou en cours
+        if export_pending(key):
+            show_export_progress(dataset)
+        else:
+            show_export_result(dataset, key)
+
+# Complète le stockage, puis confie l'écriture de l'export au groupe de processus
+def submit_export(dataset, scope, start, end, fmt):
+    store = get_store()
+    for region, _ in scope_stations(scope):
+        region_stations(region)
+    return get_export_queue(store).submit(dataset, scope, start, end, fmt)
+
+# Lecture du fichier terminé, seulement au clic sur le bouton de téléchargement
+def read_export(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+# Export demandé dont l'écriture n'est pas terminée
+def export_pending(key):
+    return get_export_queue(get_store()).status(key) not in (STATUS_DONE, STATUS_FAILED)
+
+# Avancement de l'export demandé, rafraîchi toutes les 2 secondes ; une fois
+# terminé, la page est réexécutée et ce fragment n'est plus affiché
+@st.fragment(run_every=2)
+def show_export_progress(dataset):
+    key = st.session_state[f"export_job_{dataset}"]
+    status = get_export_queue(get_store()).status(key)
+    if not export_pending(key):
+        st.rerun()
+    st.progress(0.5 if status else 0.0, text=f"⏳ Préparation de l'export : {status or 'en attente'}")
+
+# Bouton de téléchargement de l'export terminé (ou motif de l'échec)
+def show_export_result(dataset, key):
+    queue = get_export_queue(get_store())
+    _, scope, start, end, fmt, _ = key
+    if queue.status(key) == STATUS_FAILED:
+        st.error(f"❌ Échec de l'export ({queue.error(key)})")
+        return
+    path = queue.path(key)
+    if not os.path.exists(path):
+        # Remplacé depuis par une version plus récente, ou expiré
+        st.info("ℹ️ Cet export n'est plus disponible : préparez-le à nouveau")
+        return
+    file_name = f"{dataset}_{station_slug(scope)}_{start}_{end}.{fmt}"
+    size = os.path.getsize(path) / (1024 * 1024)
+    st.download_button(f"💾 {EXPORT_DATASETS[dataset]} - {FORMAT_LABELS[fmt]} ({size:.1f} Mo)",
+                       lambda: read_export(path), file_name=file_name, mime=EXPORT_FORMATS[fmt],
+                       on_click='ignore', key=f"export_download_{dataset}")
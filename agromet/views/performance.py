@@ -0,0 +1,83 @@
+"""Page « Performances » (réservée aux administrateurs)."""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from agromet import metrics
+from agromet.cache import get_cache
+from agromet.store import get_store
+from agromet.views.common import dataframe
+
+# Fichier lu par le collecteur « textfile » de node_exporter
+def prometheus_path():
+    return os.path.join(get_store().data_root, 'metrics', 'agromet.prom')
+
+def format_bytes(size):
+    return f"{size / (1024 * 1024):.1f} Mo"
+
+def show_performance():
+    st.header("⚙️ Performances de l'application")
+    
+    enabled = st.toggle("Mesures activées", value=metrics.enabled(),
+                        help="Chronométrage des pages, des calculs et des affichages, pour toutes les sessions")
+    if enabled != metrics.enabled():
+        metrics.set_enabled(enabled)
+    if not enabled:
+        st.info("ℹ️ Les mesures sont désactivées : activez-les pour chronométrer les prochaines exécutions.")
+    
+    # Mémoire du processus et des sessions
+    sessions = metrics.session_stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Mémoire du processus", format_bytes(metrics.process_memory_bytes()))
+    with col2:
+        st.metric("Sessions actives", len(sessions))
+    with col3:
+        st.metric("État des sessions", format_bytes(sum(sessions.values())))
+    
+    # Durées par portion chronométrée, toutes sessions confondues
+    st.subheader("⏱️ Durées mesurées")
+    spans = metrics.span_stats()
+    if spans:
+        dataframe(pd.DataFrame({
+            'Portion': list(spans),
+            'Appels': [count for count, _, _, _ in spans.values()],
+            'Moyenne (ms)': [total / count * 1000 for count, total, _, _ in spans.values()],
+            'Maximum (ms)': [maximum * 1000 for _, _, maximum, _ in spans.values()],
+            'Total (s)': [total for _, total, _, _ in spans.values()],
+        }).sort_values('Total (s)', ascending=False), use_container_width=True, hide_index=True)
+    else:
+        st.info("ℹ️ Aucune mesure enregistrée")
+    
+    # Cache partagé
+    st.subheader("🗄️ Cache partagé")
+    cache_stats = get_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Taux de succès", f"{cache_stats['hit_ratio'] * 100:.1f}%")
+    with col2:
+        st.metric("Entrées", cache_stats['entries'])
+    with col3:
+        st.metric("Taille", format_bytes(cache_stats['bytes']), f"budget {format_bytes(cache_stats['max_bytes'])}", delta_color="off")
+    with col4:
+        st.metric("Évictions", cache_stats['evictions'])
+    if cache_stats['datasets']:
+        dataframe(pd.DataFrame([
+            {'Jeu de données': dataset, 'Succès': counts['hits'], 'Calculs': counts['misses'], 'Attentes': counts['waits']}
+            for dataset, counts in cache_stats['datasets'].items()
+        ]), use_container_width=True, hide_index=True)
+    
+    # Export Prometheus
+    st.subheader("📤 Export Prometheus")
+    text = metrics.prometheus_text(cache_stats)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Télécharger (format texte Prometheus)", text, file_name="agromet.prom", mime="text/plain")
+    with col2:
+        st.caption(f"Fichier pour node_exporter réécrit toutes les {metrics.WRITE_INTERVAL} s tant que les mesures sont activées : {prometheus_path()}")
+        if st.button("💾 Écrire le fichier maintenant"):
+            st.success(f"✅ Mesures écrites dans {metrics.write_prometheus(prometheus_path(), cache_stats)}")
+    if st.button("🧹 Remettre les mesures à zéro"):
+        metrics.reset()
+        st.rerun()
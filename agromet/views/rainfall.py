@@ -0,0 +1,80 @@
+"""Page « Situation Pluviométrique »."""
+from datetime import datetime
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from agromet.cache import get_cache
+from agromet.dekads import get_aggregator
+from agromet.metrics import timed
+from agromet.normals import get_normals
+from agromet.schema import to_display
+from agromet.stations import STATIONS_DATA
+from agromet.views.common import available_normals, checked_store, data_version, dataframe, plotly_chart, region_stations, show_normals_progress
+from agromet.views.export import export_panel
+
+# Cumuls pluviométriques décadaires de la région pour l'année en cours (cache partagé)
+@timed('data.load_decade_rainfall_data')
+def load_decade_rainfall_data(region, store):
+    stations = region_stations(region)
+    year = datetime.now().year
+    
+    def build():
+        rain_normal = get_normals(store).region_dekad_rain(region)
+        return get_aggregator(store).region_frame(stations, year, rain_normal)
+    
+    return get_cache().get('dekads', region, year, data_version(stations, store), build)
+
+@timed('page.rainfall')
+def show_rainfall_situation(region):
+    st.header(f"🌧️ Situation Pluviométrique - Région {region}")
+    if available_normals() is None:
+        show_normals_progress()
+        return
+    
+    # Cumuls décadaires agrégés depuis les pluies journalières contrôlées des stations
+    store = checked_store()
+    rainfall_data = load_decade_rainfall_data(region, store)
+    
+    # Graphique de comparaison, reconstruit seulement si les données de la région changent
+    def build_chart():
+        fig = go.Figure()
+        
+        fig.add_trace(go.Bar(
+            name='Pluie observée',
+            x=rainfall_data['period'],
+            y=rainfall_data['rain_obs'],
+            marker_color='lightblue'
+        ))
+        
+        fig.add_trace(go.Bar(
+            name='Moyenne 30 ans',
+            x=rainfall_data['period'],
+            y=rainfall_data['rain_normal'],
+            marker_color='darkblue'
+        ))
+        
+        fig.add_trace(go.Bar(
+            name='Année précédente',
+            x=rainfall_data['period'],
+            y=rainfall_data['rain_prev'],
+            marker_color='green'
+        ))
+        
+        fig.update_layout(
+            title="📊 Comparaison Pluviométrique par Décade",
+            barmode='group',
+            xaxis_title="Période",
+            yaxis_title="Précipitations (mm)"
+        )
+        return fig
+    
+    fig = get_cache().get('dekads_figure', region, datetime.now().year, data_version(STATIONS_DATA[region], store), build_chart)
+    plotly_chart(fig, use_container_width=True)
+    
+    # Tableau des écarts
+    st.subheader("📋 Écarts par rapport à la normale")
+    dataframe(to_display(rainfall_data, columns=['period', 'rain_obs', 'rain_normal', 'rain_dev', 'rain_dev_pct']), use_container_width=True)
+    
+    with st.expander("📥 Exporter les cumuls décadaires"):
+        export_panel(region, 'dekads')
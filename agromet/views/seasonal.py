@@ -0,0 +1,178 @@
+"""Page « Prévision Saisonnière »."""
+from datetime import datetime
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+from agromet.cache import get_cache
+from agromet.dekads import get_aggregator
+from agromet.forecasts import SEASONAL_MONTHS, get_forecast_provider
+from agromet.metrics import timed
+from agromet.normals import default_period, get_normals
+from agromet.stations import STATIONS_DATA
+from agromet.terciles import CATEGORIES, combine, monthly_climatology, most_likely, tercile_outlook
+from agromet.views.common import available_normals, checked_store, data_version, plotly_chart, region_stations, show_normals_progress
+
+MONTH_NAMES = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin', 'Juillet', 'Août',
+               'Septembre', 'Octobre', 'Novembre', 'Décembre']
+CATEGORY_LABELS = {'below': 'Saison sèche', 'normal': 'Saison normale', 'above': 'Saison humide'}
+CATEGORY_COLORS = {'below': 'orange', 'normal': 'lightgreen', 'above': 'steelblue'}
+# Probabilité d'un mois sec au-delà de laquelle le mois est signalé
+DRY_MONTH_ALERT = 0.4
+
+def confidence_label(confidence):
+    if confidence >= 0.4:
+        return "forte"
+    if confidence >= 0.2:
+        return "moyenne"
+    return "faible"
+
+# Perspective saisonnière de la région (cache partagé, par région et date d'émission des prévisions) :
+# probabilités par terciles de la pluie face à la climatologie des stations, pluie et température prévues
+@timed('data.load_seasonal_outlook')
+def load_seasonal_outlook(region):
+    stations = region_stations(region)
+    store = checked_store()
+    provider = get_forecast_provider(store)
+    months = np.datetime64(datetime.now().date(), 'M') + 1 + np.arange(SEASONAL_MONTHS)
+    # Lecture du cache des prévisions : le rafraîchissement se fait en arrière-plan
+    ensemble, received = provider.seasonal(STATIONS_DATA[region], months, members=True)
+    issued = None if received is None else datetime.fromtimestamp(received).date()
+    
+    def build():
+        climatology = monthly_climatology(get_aggregator(store), stations, *default_period())
+        outlook = combine(tercile_outlook(ensemble['rain'], climatology, months.astype(np.int64) % 12))
+        # Pluie moyenne des membres ; moyenne climatologique des mois sans prévision
+        rain = np.where(np.isnan(outlook['mean']), outlook['climate_mean'], outlook['mean'])[:-1]
+        
+        # Température moyenne des membres ; normales journalières des mois sans prévision
+        normals = get_normals(store)
+        dates = np.arange(months[0], months[-1] + 1, dtype='datetime64[D]')
+        starts = (months.astype('datetime64[D]') - dates[0]).astype(np.int64)
+        days = np.diff(np.append(starts, dates.size))
+        tmean_normal = (normals.daily_values(stations, 'tmin', dates) + normals.daily_values(stations, 'tmax', dates)) / 2
+        tmean_normal = (np.add.reduceat(tmean_normal, starts, axis=1) / days).mean(axis=0)
+        forecast_tmean = ensemble['tmean'].reshape(-1, len(months))
+        valid = ~np.isnan(forecast_tmean)
+        count = valid.sum(axis=0)
+        tmean = np.where(count > 0, np.where(valid, forecast_tmean, 0).sum(axis=0) / np.maximum(count, 1), tmean_normal)
+        return {'outlook': outlook, 'rain': rain, 'tmean': tmean, 'members': ensemble['rain'].shape[0]}
+    
+    version = (provider.version('seasonal'), data_version(stations, store))
+    return months, get_cache().get('seasonal_outlook', region, (months[0], issued), version, build), received
+
+@timed('page.seasonal')
+def show_seasonal_forecast(region):
+    st.header(f"📅 Prévision Saisonnière - Région {region}")
+    if available_normals() is None:
+        show_normals_progress()
+        return
+    
+    forecast_months, seasonal, received = load_seasonal_outlook(region)
+    outlook = seasonal['outlook']
+    first_days = forecast_months.astype(object)
+    months = [MONTH_NAMES[day.month - 1] for day in first_days]
+    first, last = first_days[0], first_days[-1]
+    st.info(f"📋 Prévisions de {MONTH_NAMES[first.month - 1].lower()} {first.year} à {MONTH_NAMES[last.month - 1].lower()} {last.year}")
+    if received is None:
+        st.caption("Prévisions indisponibles : normales climatologiques des mois à venir")
+    else:
+        st.caption(f"Prévisions reçues le {datetime.fromtimestamp(received):%d/%m/%Y à %H:%M} "
+                   f"({seasonal['members']} membres d'ensemble)")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        # Graphique de prévision saisonnière
+        fig = go.Figure()
+        
+        fig.add_trace(go.Bar(
+            name='Précipitations (mm)',
+            x=months,
+            y=seasonal['rain'],
+            yaxis='y',
+            marker_color='lightblue'
+        ))
+        
+        fig.add_trace(go.Scatter(
+            name='Normale (mm)',
+            x=months,
+            y=outlook['climate_mean'][:-1],
+            yaxis='y',
+            mode='lines',
+            line=dict(color='gray', dash='dash')
+        ))
+        
+        fig.add_trace(go.Scatter(
+            name='Température (°C)',
+            x=months,
+            y=seasonal['tmean'],
+            yaxis='y2',
+            mode='lines+markers',
+            marker_color='red'
+        ))
+        
+        fig.update_layout(
+            title="📈 Prévisions Saisonnières",
+            xaxis_title="Mois",
+            yaxis=dict(title="Précipitations (mm)", side="left"),
+            yaxis2=dict(title="Température (°C)", side="right", overlaying="y")
+        )
+        
+        plotly_chart(fig, use_container_width=True)
+        
+        # Probabilités des terciles, mois par mois
+        fig = go.Figure()
+        for category in CATEGORIES:
+            fig.add_trace(go.Bar(
+                name=CATEGORY_LABELS[category].replace('Saison', 'Mois'),
+                x=months,
+                y=outlook[category][:-1] * 100,
+                marker_color=CATEGORY_COLORS[category]
+            ))
+        fig.update_layout(
+            title="🎲 Probabilités par Terciles",
+            barmode='stack',
+            xaxis_title="Mois",
+            yaxis=dict(title="Probabilité (%)", range=[0, 100])
+        )
+        plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.markdown("### 🎯 Tendances Attendues")
+        # Dernière colonne de la perspective : la saison entière
+        season = CATEGORIES[most_likely(outlook)[-1]]
+        probability = outlook[season][-1]
+        confidence = confidence_label(outlook['confidence'][-1])
+        anomaly = outlook['anomaly_pct'][-1]
+        if received is None:
+            st.info("ℹ️ **Pas de signal** : sans prévision, chaque catégorie a une chance sur trois")
+        elif season == 'below':
+            st.warning(f"⚠️ **Saison sèche probable** ({probability:.0%}, confiance {confidence}) : "
+                       f"cumul attendu {anomaly:+.0f}% par rapport à la normale")
+        elif season == 'above':
+            st.success(f"✅ **Saison humide probable** ({probability:.0%}, confiance {confidence}) : "
+                       f"cumul attendu {anomaly:+.0f}% par rapport à la normale")
+        else:
+            st.success(f"✅ **Saison proche de la normale** ({probability:.0%}, confiance {confidence})")
+        
+        # Mois au plus fort risque de déficit
+        driest = int(np.argmax(outlook['below'][:-1]))
+        if outlook['below'][driest] >= DRY_MONTH_ALERT:
+            st.warning(f"⚠️ **Attention** au déficit pluviométrique en {months[driest].lower()} "
+                       f"({outlook['below'][driest]:.0%} de risque de mois sec)")
+        
+        # Premier mois sans risque marqué de déficit et au moins aussi arrosé que la normale
+        favorable = (outlook['below'][:-1] < 1 / 3) & (seasonal['rain'] >= outlook['climate_mean'][:-1])
+        if received is not None and favorable.any():
+            st.info(f"ℹ️ **Recommandation** : Planifier les semis pour {months[int(np.argmax(favorable))].lower()}")
+        else:
+            st.info("ℹ️ **Recommandation** : Échelonner les semis et privilégier les variétés à cycle court")
+        
+        st.markdown("### 📊 Probabilités")
+        # Écart à la probabilité climatologique (une chance sur trois)
+        for category in ('normal', 'below', 'above'):
+            value = outlook[category][-1]
+            st.metric(CATEGORY_LABELS[category], f"{value:.0%}", f"{(value - 1 / 3) * 100:+.0f} pts",
+                      delta_color='inverse' if category == 'below' else 'normal')
@@ -0,0 +1,157 @@
+"""Page « Réserve en Eau du Sol »."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from agromet.cache import get_cache
+from agromet.forecasts import get_forecast_provider
+from agromet.metrics import timed
+from agromet.normals import get_normals
+from agromet.soil import CRITICAL_FRACTION, FIELD_CAPACITY_MM, OPTIMAL_FRACTION, get_soil_balance
+from agromet.stations import STATIONS_DATA, all_stations
+from agromet.store import get_store
+from agromet.views.common import available_normals, checked_store, data_version, plotly_chart, region_stations, show_normals_progress
+
+WEEKDAY_LABELS = ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim']
+# Horizon de la projection de la réserve (jours)
+PROJECTION_DAYS = 7
+
+# Réserve en eau du sol (% de la capacité au champ) moyenne des stations d'une région (cache partagé)
+@timed('data.load_soil_water_data')
+def load_soil_water_data(region, days=31):
+    for name in STATIONS_DATA:
+        region_stations(name)
+    # Bilan hydrique tenu sur les séries contrôlées
+    store = checked_store()
+    balance = get_soil_balance(store)
+    today = np.datetime64(datetime.now().date(), 'D')
+    
+    def build():
+        balance.update(today)
+        dates, reserve = balance.series(list(STATIONS_DATA[region]), today - (days - 1), today)
+        return pd.to_datetime(dates), reserve.mean(axis=0) / balance.capacity * 100
+    
+    # Le bilan dépend des données de toutes les stations (état commun du réseau)
+    return get_cache().get('soil_reserve', region, (today - (days - 1), today), data_version(all_stations(), store), build)
+
+# Pluies et températures prévues des 7 prochains jours, par station (normales à défaut de prévision)
+@timed('data.load_forecast')
+def load_forecast(region):
+    stations = region_stations(region)
+    store = get_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    dates = today + 1 + np.arange(PROJECTION_DAYS)
+    # Lecture du cache des prévisions : le rafraîchissement se fait en arrière-plan
+    forecast, received = get_forecast_provider(store).daily(STATIONS_DATA[region], dates)
+    normals = get_normals(store)
+    for variable, values in forecast.items():
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = normals.daily_values(stations, variable, dates)[missing]
+    return dates, forecast, received
+
+# Projection de la réserve à partir des pluies et températures prévues
+@timed('data.project_soil_water')
+def project_soil_water(region, dates, forecast):
+    stations = list(STATIONS_DATA[region])
+    balance = get_soil_balance(checked_store())
+    reserve = balance.project(stations, dates, forecast['rain'], forecast['tmin'], forecast['tmax'])
+    return pd.to_datetime(dates), reserve.mean(axis=0) / balance.capacity * 100
+
+@timed('page.soil_water')
+def show_soil_water_reserve(region):
+    st.header(f"🌍 Réserve en Eau du Sol et Prévisions - Région {region}")
+    if available_normals() is None:
+        show_normals_progress()
+        return
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        reserve_chart_panel(region)
+    
+    with col2:
+        forecast_panel(region)
+
+# Évolution de la réserve en eau et sa projection (fragment : recalculé indépendamment des prévisions)
+@st.fragment
+@timed('panel.reserve_chart_panel')
+def reserve_chart_panel(region):
+    # Réserve en eau simulée par le bilan hydrique, moyenne des stations de la région
+    dates, water_reserve = load_soil_water_data(region)
+    forecast_dates, forecast, _ = load_forecast(region)
+    forecast_dates, projected_reserve = project_soil_water(region, forecast_dates, forecast)
+    
+    # Graphique de l'évolution de la réserve en eau, reconstruit seulement si les données changent
+    def build_chart():
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatter(
+            x=dates,
+            y=water_reserve,
+            mode='lines+markers',
+            name='Réserve en eau (%)',
+            line=dict(color='blue', width=3),
+            fill='tonexty'
+        ))
+        
+        fig.add_trace(go.Scatter(
+            x=forecast_dates,
+            y=projected_reserve,
+            mode='lines+markers',
+            name='Projection 7 jours (%)',
+            line=dict(color='blue', width=2, dash='dot')
+        ))
+        
+        # Ligne de seuil critique
+        fig.add_hline(y=CRITICAL_FRACTION * 100, line_dash="dash", line_color="red", annotation_text="Seuil critique")
+        fig.add_hline(y=OPTIMAL_FRACTION * 100, line_dash="dash", line_color="green", annotation_text="Seuil optimal")
+        
+        fig.update_layout(
+            title="📈 Évolution de la Réserve en Eau du Sol",
+            xaxis_title="Date",
+            yaxis_title="Réserve en Eau (%)",
+            yaxis=dict(range=[0, 100])
+        )
+        return fig
+    
+    store = checked_store()
+    window = (dates[-1], get_forecast_provider(store).version('daily'))
+    fig = get_cache().get('soil_figure', region, window, data_version(all_stations(), store), build_chart)
+    plotly_chart(fig, use_container_width=True)
+
+# Prévisions des 7 prochains jours et état actuel de la réserve
+@st.fragment
+@timed('panel.forecast_panel')
+def forecast_panel(region):
+    _, water_reserve = load_soil_water_data(region)
+    forecast_dates, forecast, received = load_forecast(region)
+    forecast_dates, projected_reserve = project_soil_water(region, forecast_dates, forecast)
+    
+    st.markdown("### 🔮 Prévisions 7 Jours")
+    if received is None:
+        st.caption("Prévisions indisponibles : pluies normales de la période")
+    else:
+        st.caption(f"Prévisions reçues le {datetime.fromtimestamp(received):%d/%m/%Y à %H:%M}")
+    
+    forecast_days = [WEEKDAY_LABELS[date.weekday()] for date in pd.to_datetime(forecast_dates)]
+    # Pluie prévue moyenne des stations de la région
+    rain_forecast = forecast['rain'].mean(axis=0)
+    
+    for day, rain, reserve in zip(forecast_days, rain_forecast, projected_reserve):
+        if rain > 10:
+            st.success(f"🌧️ **{day}**: {rain:.1f}mm - Pluie significative (réserve {reserve:.0f}%)")
+        elif rain > 5:
+            st.info(f"🌦️ **{day}**: {rain:.1f}mm - Pluie modérée (réserve {reserve:.0f}%)")
+        elif rain > 0:
+            st.warning(f"🌤️ **{day}**: {rain:.1f}mm - Pluie faible (réserve {reserve:.0f}%)")
+        else:
+            st.error(f"☀️ **{day}**: {rain:.1f}mm - Pas de pluie (réserve {reserve:.0f}%)")
+    
+    # Métriques actuelles
+    st.markdown("### 📊 État Actuel")
+    st.metric("Réserve Utile", f"{water_reserve[-1]:.1f}%", f"{water_reserve[-1] - water_reserve[-2]:.1f}%")
+    st.metric("Capacité au champ", f"{FIELD_CAPACITY_MM:.0f} mm", "Stable")
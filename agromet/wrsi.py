@@ -0,0 +1,193 @@
+"""Indice de satisfaction des besoins en eau des cultures (WRSI).
+
+Le WRSI d'une campagne est le rapport, en %, entre l'évapotranspiration
+réelle et les besoins en eau de la culture (Kc × ET0) cumulés sur son cycle.
+Toutes les combinaisons station × date de semis × culture sont évaluées en
+un seul calcul sur tableaux : le bilan hydrique de chaque combinaison est
+une ligne du balayage préfixe de ``agromet.soil.run_bucket``.
+
+Pour les jours de la campagne qui ne sont pas encore observés, la pluie et
+les températures sont prises dans l'index des normales.
+"""
+import numpy as np
+
+from agromet.cache import get_cache
+from agromet.normals import day_of_year
+from agromet.soil import FIELD_CAPACITY_MM, INITIAL_FRACTION, reference_et, run_bucket
+from agromet.stations import STATIONS_DATA, station_coordinates
+
+# Fenêtre des dates de semis candidates : 60 jours à partir du 1er mai
+SOWING_START = (5, 1)
+SOWING_DAYS = 60
+# Découpage de la fenêtre en semis précoce, normal et tardif
+SOWING_WINDOWS = ('Semis précoce', 'Semis normal', 'Semis tardif')
+
+
+class CropProfile:
+    """Cycle d'une culture : stades (libellé, durée en jours, Kc).
+
+    Le Kc d'un stade est soit constant, soit un couple (début, fin)
+    interpolé linéairement sur la durée du stade.
+    """
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+        self.length = sum(days for _, days, _ in stages)
+        self.bounds = np.cumsum([0] + [days for _, days, _ in stages])
+
+    @property
+    def stage_labels(self):
+        return [label for label, _, _ in self.stages]
+
+    def kc_curve(self):
+        curves = []
+        for _, days, kc in self.stages:
+            start, end = kc if isinstance(kc, tuple) else (kc, kc)
+            curves.append(np.linspace(start, end, days))
+        return np.concatenate(curves)
+
+
+# Profils Kc (FAO-56, valeurs moyennes des cultures pluviales)
+CROPS = {
+    'Riz': CropProfile('Riz', [
+        ('Début croissance (Kc=0.3-0.5)', 30, (0.3, 0.5)),
+        ('Croissance végétative (Kc=0.8)', 40, 0.8),
+        ('Phase reproductive (Kc=1.2)', 50, 1.2),
+    ]),
+    'Maïs': CropProfile('Maïs', [
+        ('Levée (Kc=0.3)', 20, 0.3),
+        ('Croissance (Kc=0.3-1.2)', 35, (0.3, 1.2)),
+        ('Floraison (Kc=1.2)', 40, 1.2),
+        ('Maturation (Kc=1.2-0.6)', 30, (1.2, 0.6)),
+    ]),
+    'Arachide': CropProfile('Arachide', [
+        ('Levée (Kc=0.4)', 25, 0.4),
+        ('Croissance (Kc=0.4-1.15)', 35, (0.4, 1.15)),
+        ('Floraison et gousses (Kc=1.15)', 45, 1.15),
+        ('Maturation (Kc=1.15-0.6)', 25, (1.15, 0.6)),
+    ]),
+}
+
+
+def sowing_dates(season):
+    month, day = SOWING_START
+    first = np.datetime64(f"{season:04d}-{month:02d}-{day:02d}", 'D')
+    return first + np.arange(SOWING_DAYS)
+
+
+def evaluate(rain, et0, crops, capacity=FIELD_CAPACITY_MM, initial_fraction=INITIAL_FRACTION):
+    """WRSI de toutes les combinaisons station × culture × date de semis.
+
+    `rain` et `et0` sont de forme (N, SOWING_DAYS + durée du plus long
+    cycle), à partir de la première date de semis. Retourne le WRSI global
+    (N, C, W) et, par culture, le WRSI de chaque stade (N, W, stades).
+    """
+    n_stations = rain.shape[0]
+    n_crops = len(crops)
+    length = max(crop.length for crop in crops)
+
+    # Kc (C, L), nul après la fin du cycle de chaque culture
+    kc = np.zeros((n_crops, length))
+    for row, crop in enumerate(crops):
+        kc[row, :crop.length] = crop.kc_curve()
+
+    # Pluie et ET0 de chaque jour de cycle pour chaque date de semis : (N, W, L)
+    day_index = np.arange(SOWING_DAYS)[:, None] + np.arange(length)[None, :]
+    season_rain = np.nan_to_num(rain[:, day_index])
+    season_et0 = np.nan_to_num(et0[:, day_index])
+
+    # Besoins (N, C, W, L), puis un bilan par ligne (N × C × W, L)
+    requirement = kc[None, :, None, :] * season_et0[:, None, :, :]
+    water_in = np.broadcast_to(season_rain[:, None, :, :], requirement.shape).reshape(-1, length)
+    requirement = requirement.reshape(-1, length)
+    initial = np.full(water_in.shape[0], initial_fraction * capacity)
+    reserve = run_bucket(water_in, requirement, initial, capacity)
+
+    # ETR : besoin borné par l'eau disponible (réserve de la veille + pluie)
+    available = np.concatenate([initial[:, None], reserve[:, :-1]], axis=1) + water_in
+    actual = np.minimum(requirement, available)
+
+    shape = (n_stations, n_crops, SOWING_DAYS, length)
+    cumulative_actual = np.concatenate([np.zeros(shape[:-1] + (1,)), np.cumsum(actual.reshape(shape), axis=-1)], axis=-1)
+    cumulative_need = np.concatenate([np.zeros(shape[:-1] + (1,)), np.cumsum(requirement.reshape(shape), axis=-1)], axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wrsi = 100 * cumulative_actual[..., -1] / cumulative_need[..., -1]
+        stages = {}
+        for row, crop in enumerate(crops):
+            start, end = crop.bounds[:-1], crop.bounds[1:]
+            stage_actual = cumulative_actual[:, row, :, end] - cumulative_actual[:, row, :, start]
+            stage_need = cumulative_need[:, row, :, end] - cumulative_need[:, row, :, start]
+            # L'indexation avancée place l'axe des stades en tête : (stades, N, W)
+            stages[crop.name] = np.moveaxis(100 * stage_actual / stage_need, 0, -1)
+    return wrsi, stages
+
+
+class SeasonWRSI:
+    """Résultats d'une campagne pour les stations d'une région."""
+
+    def __init__(self, stations, season, crops, wrsi, stages):
+        self.stations = stations
+        self.season = season
+        self.crops = crops
+        self.sowing_dates = sowing_dates(season)
+        self.wrsi = wrsi
+        self.stages = stages
+
+    def crop_index(self, crop):
+        return [c.name for c in self.crops].index(crop)
+
+    def region_wrsi(self, crop):
+        """WRSI moyen de la région pour chaque date de semis (W,)."""
+        return np.nanmean(self.wrsi[:, self.crop_index(crop), :], axis=0)
+
+    def best_sowing(self, crop):
+        """Indice de la meilleure date de semis pour la région."""
+        return int(np.nanargmax(self.region_wrsi(crop)))
+
+    def stage_satisfaction(self, crop, sowing=None):
+        """WRSI moyen de la région par stade, pour une date de semis (la meilleure par défaut)."""
+        sowing = self.best_sowing(crop) if sowing is None else sowing
+        return np.nanmean(self.stages[crop][:, sowing, :], axis=0)
+
+    def sowing_windows(self, crop):
+        """(libellé, première date, dernière date, WRSI moyen) des semis précoce/normal/tardif."""
+        region = self.region_wrsi(crop)
+        windows = []
+        for label, days in zip(SOWING_WINDOWS, np.array_split(np.arange(SOWING_DAYS), len(SOWING_WINDOWS))):
+            windows.append((label, self.sowing_dates[days[0]], self.sowing_dates[days[-1]], float(np.nanmean(region[days]))))
+        return windows
+
+
+def season_inputs(store, normals, stations, season, today):
+    """Pluie et ET0 (N, T) de la campagne : observations jusqu'à `today`, normales au-delà."""
+    length = max(crop.length for crop in CROPS.values())
+    dates = sowing_dates(season)[0] + np.arange(SOWING_DAYS + length)
+    _, values = store.read_many(stations, dates[0], dates[-1], columns=('tmin', 'tmax', 'rain'))
+    future = dates > np.datetime64(today, 'D')
+    for column in ('tmin', 'tmax', 'rain'):
+        expected = normals.daily_values(stations, column, dates)
+        values[column] = np.where(future[None, :], expected, values[column])
+
+    latitudes = [station_coordinates(station)['lat'] for station in stations]
+    et0 = reference_et(values['tmin'], values['tmax'], latitudes, day_of_year(dates))
+    return values['rain'], et0
+
+
+def get_season_wrsi(store, normals, region, season, today):
+    """WRSI de la région pour la campagne, mis en cache par (région, campagne).
+
+    L'entrée est recalculée lorsque les données d'une station de la région
+    changent (version du stockage) ou que de nouveaux jours sont observés.
+    """
+    stations = list(STATIONS_DATA[region])
+    versions = (store.name,) + tuple(store.version(station) for station in stations) + (str(today),)
+
+    def build():
+        crops = list(CROPS.values())
+        rain, et0 = season_inputs(store, normals, stations, season, today)
+        wrsi, stages = evaluate(rain, et0, crops)
+        return SeasonWRSI(stations, season, crops, wrsi, stages)
+
+    return get_cache().get('season_wrsi', region, season, versions, build)
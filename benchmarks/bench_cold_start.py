@@ -0,0 +1,79 @@
+"""Mesure du démarrage à froid : temps et mémoire jusqu'à l'écran de connexion.
+
+Chaque mesure est faite dans un processus neuf : Streamlit est importé, puis
+le script de l'application est exécuté (mode « bare », sans serveur) jusqu'à
+l'affichage de l'écran de connexion. Seul ce second temps est imputé à
+l'application. Le script échoue si le budget est dépassé ou si une
+bibliothèque lourde (hors celles que Streamlit charge lui-même) est
+importée avant la connexion.
+
+Usage : python benchmarks/bench_cold_start.py [--script code.py] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Objectif : écran de connexion affiché en moins de 0,25 s après l'import de Streamlit
+BUDGET_SECONDS = 0.25
+# Bibliothèques qui ne doivent être chargées qu'à l'ouverture des pages
+HEAVY_MODULES = ('numpy', 'pandas', 'plotly.graph_objects', 'matplotlib', 'seaborn', 'fpdf', 'openpyxl')
+
+_PROBE = r"""
+import json, logging, resource, runpy, sys, time
+logging.disable(logging.WARNING)
+import streamlit
+preloaded = set(sys.modules)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name='__main__')
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': after,
+    'rss_delta_kb': after - before,
+    'modules': [name for name in sys.argv[2:] if name in sys.modules and name not in preloaded],
+}))
+"""
+
+
+def measure(script):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE, script, *HEAVY_MODULES],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--script', default=os.path.join(ROOT, 'code.py'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure(os.path.abspath(args.script)) for _ in range(args.repeat)]
+    seconds = statistics.median(run['seconds'] for run in runs)
+    rss = statistics.median(run['rss_kb'] for run in runs) / 1024
+    rss_delta = statistics.median(run['rss_delta_kb'] for run in runs) / 1024
+    modules = runs[-1]['modules']
+    print(f"écran de connexion : {seconds * 1000:8.1f} ms (médiane de {args.repeat} processus)")
+    print(f"mémoire            : {rss:8.1f} Mo au total, {rss_delta:+.1f} Mo pour l'application")
+    print(f"modules lourds     : {', '.join(modules) or 'aucun'}")
+
+    if modules:
+        print("ÉCHEC : bibliothèques lourdes chargées avant la connexion")
+        return 1
+    if seconds > BUDGET_SECONDS:
+        print(f"ÉCHEC : démarrage au-delà du budget de {BUDGET_SECONDS:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Mesure du rafraîchissement des prévisions d'un grand nombre de points.
+
+Le service est remplacé par des serveurs de prévisions simulées
+(``python -m agromet.forecasts --stub``), lancés dans des processus
+séparés qui partagent un port, avec une latence simulée par requête ; le
+fournisseur rafraîchit les prévisions journalières puis saisonnières
+(ensemble de 51 membres) de tous les points, et la lecture d'une région
+pendant le rafraîchissement montre que les pages n'attendent pas le réseau.
+
+Usage : python benchmarks/bench_forecasts.py [--points 5000] [--latency 0.05] [--connections 64]
+        [--servers 4]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agromet.forecasts import KINDS, ForecastProvider  # noqa: E402
+
+# Objectif : 5 000 points rafraîchis en quelques secondes par type de prévision
+# (15 s au plus, serveurs simulés et client sur un seul cœur)
+BUDGET_SECONDS = 15.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.05, help="latence simulée du service (secondes)")
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--servers', type=int, default=4, help="processus du service simulé")
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, '-m', 'agromet.forecasts', '--stub', str(port), '--delay', str(args.latency)]
+    if args.servers > 1:
+        command.append('--reuse-port')
+    servers = [subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True) for _ in range(args.servers)]
+    for server in servers:
+        # Attend l'annonce « Prévisions simulées sur ... » de chaque serveur
+        server.stdout.readline()
+    url = f"http://127.0.0.1:{port}"
+
+    # Grille de points couvrant le pays
+    points = {f"Point {i:05d}": {"lat": 4.5 + (i % 100) * 0.06, "lon": -8.5 + (i // 100) * 0.1}
+              for i in range(args.points)}
+    region = dict(list(points.items())[:10])
+    dates = np.datetime64('today', 'D') + 1 + np.arange(7)
+
+    try:
+        failed = refresh_all(url, points, region, dates, args.connections)
+    finally:
+        for server in servers:
+            server.terminate()
+    sys.exit(1 if failed else 0)
+
+
+def refresh_all(url, points, region, dates, connections):
+    failed = False
+    with tempfile.TemporaryDirectory() as root:
+        provider = ForecastProvider(root, url, points, max_connections=connections)
+        for kind in KINDS:
+            start = time.perf_counter()
+            job = provider.refresh(kind)
+            # Lecture d'une région pendant le rafraîchissement : servie depuis le cache
+            read_start = time.perf_counter()
+            provider.daily(region, dates)
+            read = time.perf_counter() - read_start
+            fetched = job.result()
+            elapsed = time.perf_counter() - start
+            print(f"{kind:9s} {fetched}/{len(points)} points en {elapsed:6.2f} s "
+                  f"(lecture pendant le rafraîchissement : {read * 1000:.1f} ms)")
+            failed |= elapsed > BUDGET_SECONDS or fetched < len(points)
+        print(f"échecs : {provider.errors}")
+        provider.close()
+    return failed
+
+
+if __name__ == '__main__':
+    main()
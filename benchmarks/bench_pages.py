@@ -0,0 +1,274 @@
+"""Mesure des réexécutions de chaque page, pour des réseaux de taille croissante.
+
+L'application est pilotée sans navigateur (``streamlit.testing.v1.AppTest``)
+sur des réseaux synthétiques de 6 (le réseau réel) à 10 000 stations et des
+historiques de 7 jours à 30 ans. Pour chaque page sont relevés :
+
+- le temps du premier affichage, puis la médiane (p50) et le 95e centile
+  (p95) des réexécutions ;
+- la mémoire résidente maximale du processus ;
+- la taille des éléments envoyés au navigateur (protobuf).
+
+Chaque réseau est préparé une fois dans un stockage temporaire (données,
+normales, bilan hydrique), puis chaque page est mesurée dans un processus
+neuf. Les résultats sont écrits en JSON ; avec ``--baseline``, ils sont
+comparés à une mesure de référence et le script échoue si une page est
+plus lente, plus gourmande ou plus lourde au-delà de la tolérance.
+
+Usage : python benchmarks/bench_pages.py [--stations 6 100] [--days 7 365]
+        [--pages daily_weather ...] [--repeat 10] [--output bench_pages.json]
+        [--baseline baseline.json] [--tolerance 1.25]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'code.py')
+sys.path.insert(0, ROOT)
+
+# Pages mesurées : identifiant -> entrée du menu de navigation
+PAGES = {
+    'daily_weather': "📊 Paramètres Météo Journaliers",
+    'rainfall': "🌧️ Situation Pluviométrique",
+    'seasonal': "📅 Prévision Saisonnière",
+    'crop_water': "💧 Satisfaction en Eau des Cultures",
+    'soil_water': "🌍 Réserve en Eau du Sol",
+    'advice': "💡 Avis et Conseils",
+}
+STATION_COUNTS = (6, 100, 1000, 10000)
+HISTORY_DAYS = (7, 365, 10958)
+# Stations par région des réseaux synthétiques
+REGION_SIZE = 50
+# Au-delà de ce nombre de valeurs station × jour, un scénario est ignoré (--max-cells)
+MAX_CELLS = 2e7
+# Stations générées par lot lors de la préparation
+SEED_BATCH = 200
+
+# Métriques comparées à la référence, et écart absolu en deçà duquel un écart est du bruit
+COMPARED_METRICS = {'p50_s': 0.005, 'p95_s': 0.005, 'peak_rss_mb': 16.0, 'payload_kb': 1.0}
+
+
+def synthetic_network(n_stations):
+    """Réseau {région: {station: {"lat", "lon"}}} de n stations (le réseau réel pour 6)."""
+    from agromet.spatial import GRID_BOUNDS
+    from agromet.stations import STATIONS_DATA
+
+    if n_stations == sum(len(stations) for stations in STATIONS_DATA.values()):
+        return {region: dict(stations) for region, stations in STATIONS_DATA.items()}
+    rng = np.random.default_rng(n_stations)
+    lats = rng.uniform(*GRID_BOUNDS['lat'], n_stations).round(4)
+    lons = rng.uniform(*GRID_BOUNDS['lon'], n_stations).round(4)
+    network = {}
+    for i in range(n_stations):
+        region = f"Région {i // REGION_SIZE + 1:03d}"
+        network.setdefault(region, {})[f"Station {i:05d}"] = {'lat': float(lats[i]), 'lon': float(lons[i])}
+    return network
+
+
+def install_network(n_stations):
+    # Tous les modules partagent le même dictionnaire : il est remplacé sur place
+    from agromet.stations import STATIONS_DATA
+
+    network = synthetic_network(n_stations)
+    STATIONS_DATA.clear()
+    STATIONS_DATA.update(network)
+
+
+def prepare(data_root, n_stations, n_days):
+    """Remplit le stockage de `data_root` et calcule normales et bilan hydrique."""
+    os.environ['AGROMET_DATA_DIR'] = data_root
+    install_network(n_stations)
+    from agromet.normals import ensure_normals
+    from agromet.soil import get_soil_balance
+    from agromet.stations import all_stations
+    from agromet.store import get_store
+    from agromet.synthetic import synthesize_weather
+
+    store = get_store()
+    today = np.datetime64(datetime.now().date(), 'D')
+    dates = np.arange(today - (n_days - 1), today + 1, dtype='datetime64[D]')
+    stations = all_stations()
+    for first in range(0, len(stations), SEED_BATCH):
+        batch = stations[first:first + SEED_BATCH]
+        drawn = synthesize_weather(batch, dates)
+        for row, station in enumerate(batch):
+            store.write(station, dates, {name: values[row] for name, values in drawn.items()})
+    ensure_normals(store)
+    get_soil_balance(store).update(today)
+
+
+def _payload_bytes(node):
+    proto = getattr(node, 'proto', None)
+    total = proto.ByteSize() if proto is not None and hasattr(proto, 'ByteSize') else 0
+    for child in (getattr(node, 'children', None) or {}).values():
+        total += _payload_bytes(child)
+    return total
+
+
+def measure_page(data_root, n_stations, page, repeat):
+    """Mesures d'une page dans le processus courant (appelé dans un processus neuf)."""
+    import logging
+    logging.disable(logging.WARNING)
+    os.environ['AGROMET_DATA_DIR'] = data_root
+    install_network(n_stations)
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP, default_timeout=3600)
+    app.run()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    app.text_input[0].input('benchmark')
+    app.text_input[1].input('benchmark')
+    app.button[0].click()
+
+    # Le premier affichage de la page par défaut suit directement la connexion
+    start = time.perf_counter()
+    app.run()
+    if PAGES[page] != app.sidebar.radio[0].value:
+        start = time.perf_counter()
+        app.sidebar.radio[0].set_value(PAGES[page]).run()
+    cold = time.perf_counter() - start
+    errors = [exception.message for exception in app.exception]
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    # Une erreur du premier affichage se répète à chaque réexécution : gardée une fois
+    errors = list(dict.fromkeys(errors + [exception.message for exception in app.exception]))
+
+    return {
+        'cold_s': cold,
+        'p50_s': float(np.percentile(timings, 50)),
+        'p95_s': float(np.percentile(timings, 95)),
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'payload_kb': _payload_bytes(app._tree) / 1024,
+        'errors': errors,
+    }
+
+
+def _child(*args):
+    # Relance ce script dans un processus neuf ; la dernière ligne de sortie est du JSON
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), *map(str, args)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else 'échec')
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Écarts au-delà de la tolérance : [(scénario, métrique, référence, mesure)]."""
+    reference = {(r['page'], r['stations'], r['days']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['page'], result['stations'], result['days'])
+        # Une page en erreur dans la référence n'a pas de mesure comparable
+        if key not in reference or reference[key].get('errors'):
+            continue
+        for metric, noise in COMPARED_METRICS.items():
+            before, after = reference[key].get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * tolerance and after - before > noise:
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, nargs='+', default=list(STATION_COUNTS))
+    parser.add_argument('--days', type=int, nargs='+', default=list(HISTORY_DAYS))
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-cells', type=float, default=MAX_CELLS,
+                        help="nombre maximal de valeurs station × jour d'un scénario")
+    parser.add_argument('--output', default='bench_pages.json')
+    parser.add_argument('--baseline', help="résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="rapport mesure / référence toléré avant de signaler une régression")
+    # Modes internes, exécutés dans un processus neuf
+    parser.add_argument('--prepare', nargs=3, metavar=('RACINE', 'STATIONS', 'JOURS'), help=argparse.SUPPRESS)
+    parser.add_argument('--measure', nargs=3, metavar=('RACINE', 'STATIONS', 'PAGE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        root, n_stations, n_days = args.prepare
+        start = time.perf_counter()
+        prepare(root, int(n_stations), int(n_days))
+        print(json.dumps({'prepare_s': time.perf_counter() - start}))
+        return 0
+    if args.measure:
+        root, n_stations, page = args.measure
+        print(json.dumps(measure_page(root, int(n_stations), page, args.repeat)))
+        return 0
+
+    results, skipped = [], []
+    for n_stations in args.stations:
+        for n_days in args.days:
+            if n_stations * n_days > args.max_cells:
+                skipped.append((n_stations, n_days))
+                print(f"{n_stations:>6} stations × {n_days:>5} jours : ignoré (au-delà de --max-cells)")
+                continue
+            root = tempfile.mkdtemp(prefix='agromet-bench-')
+            try:
+                prepared = _child('--prepare', root, n_stations, n_days)
+                print(f"{n_stations:>6} stations × {n_days:>5} jours : préparé en {prepared['prepare_s']:.1f} s")
+                for page in args.pages:
+                    try:
+                        measured = _child('--measure', root, n_stations, page, '--repeat', args.repeat)
+                    except RuntimeError as error:
+                        measured = {'errors': [str(error)]}
+                    result = {'page': page, 'stations': n_stations, 'days': n_days, **measured}
+                    results.append(result)
+                    if 'p50_s' in measured:
+                        print(f"    {page:<14} premier {measured['cold_s'] * 1000:8.1f} ms"
+                              f"  p50 {measured['p50_s'] * 1000:8.1f} ms  p95 {measured['p95_s'] * 1000:8.1f} ms"
+                              f"  mémoire {measured['peak_rss_mb']:7.1f} Mo  envoi {measured['payload_kb']:8.1f} ko")
+                    for error in measured['errors']:
+                        print(f"    {page:<14} ERREUR : {error}")
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'skipped': skipped,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Résultats : {args.output}")
+
+    status = 1 if any(result['errors'] for result in results) else 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for (page, n_stations, n_days), metric, before, after in regressions:
+            print(f"RÉGRESSION {page} ({n_stations} stations × {n_days} jours) : "
+                  f"{metric} {before:.4g} -> {after:.4g} (×{after / before:.2f})")
+        if regressions:
+            status = 1
+        else:
+            print(f"Aucune régression au-delà de ×{args.tolerance:.2f} par rapport à {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
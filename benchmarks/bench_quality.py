@@ -0,0 +1,94 @@
+"""Mesure du contrôle qualité : passe sur tableaux et retraitement complet de l'historique.
+
+La passe de contrôle (bornes, pics, cohérence spatiale, bouchage) est
+mesurée sur une année d'un réseau national simulé, avec des trous et des
+valeurs aberrantes. Le retraitement complet (lecture, contrôle, écriture
+des séries et des indicateurs) est mesuré sur un stockage temporaire de
+quelques dizaines de stations amorcé sur 31 ans, puis extrapolé au réseau
+national, le coût étant proportionnel au nombre de stations × années.
+
+Usage : python benchmarks/bench_quality.py [--stations 5000] [--store-stations 40] [--national 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agromet.quality import MARGIN_DAYS, REJECTED, QualityControl, check_series  # noqa: E402
+from agromet.spatial import SpatialIndex  # noqa: E402
+from agromet.store import HISTORY_YEARS, StationStore  # noqa: E402
+from agromet.synthetic import synthesize_weather  # noqa: E402
+
+# Objectif : retraitement complet de 30 ans du réseau national en quelques minutes
+BUDGET_MINUTES = 30.0
+
+
+def network(n_stations):
+    # Grille de stations couvrant le pays, en une seule région
+    return {'Réseau': {f"Station {i:05d}": {"lat": 4.5 + (i % 70) * 0.09, "lon": -8.5 + (i // 70) * 0.09 % 6.0}
+                       for i in range(n_stations)}}
+
+
+def degrade(values, rng):
+    # 3 % de jours manquants, 0,2 % de pics et 0,1 % de valeurs hors bornes
+    for column in values.values():
+        if column.dtype != np.float32:
+            continue
+        column[rng.random(column.shape) < 0.03] = np.nan
+        spikes = rng.random(column.shape) < 0.002
+        column[spikes] += 30
+        column[rng.random(column.shape) < 0.001] = 999
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=5000)
+    parser.add_argument('--store-stations', type=int, default=40)
+    parser.add_argument('--national', type=int, default=5000, help="stations du réseau national extrapolé")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    # Passe de contrôle sur une année du réseau national
+    data = network(args.stations)
+    index = SpatialIndex.from_stations(data)
+    qc = QualityControl(StationStore(tempfile.mkdtemp(), 'quality'), StationStore(tempfile.mkdtemp(), 'quality'), data)
+    dates = np.datetime64('2024-01-01') - MARGIN_DAYS + np.arange(366 + 2 * MARGIN_DAYS)
+    values = degrade(synthesize_weather(index.names, dates), rng)
+    start = time.perf_counter()
+    _, flags = check_series(values, qc.neighbours, qc.weights)
+    elapsed = time.perf_counter() - start
+    rejected = sum(int(np.count_nonzero(flag & REJECTED)) for flag in flags.values())
+    print(f"contrôle       {args.stations} stations × 1 an : {elapsed:6.2f} s ({rejected} valeurs rejetées)")
+
+    # Retraitement complet d'un stockage amorcé sur HISTORY_YEARS années
+    with tempfile.TemporaryDirectory() as root:
+        source = StationStore(root)
+        data = network(args.store_stations)
+        today = np.datetime64('today', 'D')
+        for station in data['Réseau']:
+            source.ensure_history(station, today)
+        quality = QualityControl(source, StationStore(root, 'quality'), data)
+        start = time.perf_counter()
+        quality.update(today, full=True)
+        full = time.perf_counter() - start
+
+        source.write(next(iter(data['Réseau'])), [today], {'tmax': np.array([60.0], dtype=np.float32)})
+        start = time.perf_counter()
+        quality.update(today)
+        incremental = time.perf_counter() - start
+
+    national = full / (args.store_stations * HISTORY_YEARS) * args.national * HISTORY_YEARS / 60
+    print(f"retraitement   {args.store_stations} stations × {HISTORY_YEARS} ans : {full:6.2f} s, "
+          f"mise à jour d'un jour : {incremental * 1000:.0f} ms")
+    print(f"extrapolation  {args.national} stations × {HISTORY_YEARS} ans : {national:6.1f} min")
+    sys.exit(1 if national > BUDGET_MINUTES else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Mesure du calcul des agrégats régionaux : passe groupée complète et mise à jour d'un jour.
+
+Usage : python benchmarks/bench_rollups.py [--stations 10000] [--regions 100] [--days 366]
+        [--store-stations 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agromet.rollups import VARIABLES, RegionRollups, grouped_statistics  # noqa: E402
+from agromet.store import StationStore  # noqa: E402
+from agromet.synthetic import synthesize_weather  # noqa: E402
+
+# Objectif : la passe groupée d'un réseau national sur un an en moins d'une seconde par variable
+BUDGET_SECONDS = 1.0
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=10000)
+    parser.add_argument('--regions', type=int, default=100)
+    parser.add_argument('--days', type=int, default=366)
+    parser.add_argument('--store-stations', type=int, default=500,
+                        help="stations d'un stockage temporaire pour la mise à jour incrémentale")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    end = np.datetime64('2024-12-31', 'D')
+    dates = np.arange(end - (args.days - 1), end + 1, dtype='datetime64[D]')
+    stations = [f"Station {i:05d}" for i in range(args.stations)]
+    drawn = synthesize_weather(stations, dates)
+    # Régions de tailles inégales
+    starts = np.unique(np.sort(np.random.default_rng(0).choice(np.arange(1, args.stations), args.regions - 1, replace=False)))
+    starts = np.concatenate([[0], starts])
+
+    elapsed = best_of(lambda: grouped_statistics(drawn['tmax'], starts), args.repeat)
+    print(f"passe groupée  {args.stations} stations × {args.days} jours, {starts.size} régions : {elapsed * 1000:8.1f} ms par variable")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = StationStore(root)
+        subset = stations[:args.store_stations]
+        values = synthesize_weather(subset, dates)
+        for row, station in enumerate(subset):
+            store.write(station, dates[:-1], {name: values[name][row, :-1] for name in VARIABLES})
+        size = max(len(subset) // 20, 1)
+        regions = {f"Région {i}": subset[i:i + size] for i in range(0, len(subset), size)}
+        rollups = RegionRollups(store, regions)
+        start = time.perf_counter()
+        rollups.update(dates[-2])
+        full = time.perf_counter() - start
+
+        # Un nouveau jour pour toutes les stations, puis une correction tardive dans une région
+        for row, station in enumerate(subset):
+            store.write(station, dates[-1:], {name: values[name][row, -1:] for name in VARIABLES})
+        start = time.perf_counter()
+        rollups.update(dates[-1])
+        new_day = time.perf_counter() - start
+        store.write(subset[0], dates[-30:-29], {'rain': np.array([50.0], dtype=np.float32)})
+        start = time.perf_counter()
+        rollups.update(dates[-1])
+        correction = time.perf_counter() - start
+        print(f"stockage       {len(subset)} stations, {len(regions)} régions : calcul complet {full * 1000:.1f} ms, "
+              f"nouveau jour {new_day * 1000:.1f} ms, correction tardive {correction * 1000:.1f} ms")
+
+    sys.exit(1 if elapsed > BUDGET_SECONDS else 0)
+
+
+if __name__ == '__main__':
+    main()
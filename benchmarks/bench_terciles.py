@@ -0,0 +1,52 @@
+"""Mesure du calcul des probabilités par terciles d'un ensemble saisonnier national.
+
+Usage : python benchmarks/bench_terciles.py [--members 500] [--stations 5000] [--months 6] [--years 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agromet.terciles import combine, tercile_outlook  # noqa: E402
+
+# Objectif : un ensemble national traité en temps interactif
+BUDGET_SECONDS = 1.0
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--stations', type=int, default=5000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--years', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Cumuls mensuels de type gamma, avec 5 % d'années manquantes
+    rng = np.random.default_rng(0)
+    climatology = rng.gamma(4.0, 50.0, (args.stations, args.years, 12))
+    climatology[rng.random(climatology.shape) < 0.05] = np.nan
+    ensemble = rng.gamma(4.0, 52.0, (args.members, args.stations, args.months)).astype(np.float32)
+    calendar_months = (4 + np.arange(args.months)) % 12
+
+    elapsed = best_of(lambda: combine(tercile_outlook(ensemble, climatology, calendar_months)), args.repeat)
+    print(f"terciles  {args.members} membres × {args.stations} stations × {args.months} mois : {elapsed * 1000:8.1f} ms")
+
+    sys.exit(1 if elapsed > BUDGET_SECONDS else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Mesure de la génération et de la lecture par lots des données journalières.
+
+Usage : python benchmarks/bench_weather_batch.py [--stations 10000] [--days 365]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agromet.store import StationStore  # noqa: E402
+from agromet.synthetic import synthesize_weather  # noqa: E402
+
+# Objectif : 10 000 stations × 365 jours générées en moins d'une seconde
+BUDGET_SECONDS = 1.0
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--read-stations', type=int, default=200,
+                        help="nombre de stations relues depuis un stockage temporaire")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    stations = [f"Station {i:05d}" for i in range(args.stations)]
+    end = np.datetime64('2024-12-31', 'D')
+    dates = np.arange(end - (args.days - 1), end + 1, dtype='datetime64[D]')
+
+    generation = best_of(lambda: synthesize_weather(stations, dates), args.repeat)
+    print(f"génération  {args.stations} stations × {args.days} jours : {generation * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = StationStore(root)
+        subset = stations[:args.read_stations]
+        drawn = synthesize_weather(subset, dates)
+        for row, station in enumerate(subset):
+            store.write(station, dates, {name: values[row] for name, values in drawn.items()})
+        reading = best_of(lambda: store.read_many(subset, dates[0], dates[-1]), args.repeat)
+        print(f"lecture     {len(subset)} stations × {args.days} jours : {reading * 1000:8.1f} ms")
+
+    if args.stations >= 10000 and args.days >= 365 and generation > BUDGET_SECONDS:
+        print(f"ÉCHEC : génération au-delà du budget de {BUDGET_SECONDS:.1f} s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Cache partagé : calcul unique, éviction LRU par budget, invalidation par version."""
+import threading
+import time
+
+import pytest
+
+from agromet.cache import SharedCache
+
+
+def test_concurrent_get_builds_once():
+    cache = SharedCache()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'valeur'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('d', 's', 'w', 1, build))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Les autres sessions attendent le calcul en cours
+    while cache.stats()['waits'] < len(threads) - 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['valeur'] * len(threads)
+    assert cache.stats()['misses'] == 1
+
+
+def test_over_budget_evicts_least_recently_used():
+    cache = SharedCache(max_bytes=300)
+    for subject in ('a', 'b', 'c'):
+        cache.get('d', subject, 'w', 1, lambda subject=subject: subject, size=100)
+    # 'a' redevient la plus récemment utilisée : 'b' part en premier
+    cache.get('d', 'a', 'w', 1, lambda: pytest.fail("'a' devrait être en cache"))
+    cache.get('d', 'e', 'w', 1, lambda: 'e', size=100)
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.bytes == 300
+    rebuilt = []
+    cache.get('d', 'b', 'w', 1, lambda: rebuilt.append('b') or 'b', size=100)
+    assert rebuilt == ['b']
+
+
+def test_entry_larger_than_budget_is_served_not_kept():
+    cache = SharedCache(max_bytes=100)
+    assert cache.get('d', 's', 'w', 1, lambda: 'gros', size=101) == 'gros'
+    assert cache.stats()['entries'] == 0
+
+
+def test_version_bump_misses():
+    cache = SharedCache()
+    assert cache.get('d', 's', 'w', 1, lambda: 'v1', size=10) == 'v1'
+    assert cache.get('d', 's', 'w', 1, lambda: 'autre', size=10) == 'v1'
+    assert cache.get('d', 's', 'w', 2, lambda: 'v2', size=10) == 'v2'
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+    assert (stats['entries'], cache.bytes) == (1, 10)
+
+
+def test_invalidate_by_dataset_and_subject():
+    cache = SharedCache()
+    for dataset, subject in (('d', 'a'), ('d', 'b'), ('e', 'a')):
+        cache.get(dataset, subject, 'w', 1, lambda: 0, size=10)
+
+    assert cache.invalidate(subject='a') == 2
+    assert cache.stats()['entries'] == 1
+    assert cache.invalidate('d') == 1
+    assert cache.bytes == 0
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    cache = SharedCache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("calcul impossible")
+
+    errors = []
+
+    def request():
+        try:
+            cache.get('d', 's', 'w', 1, failing)
+        except ValueError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()['waits'] < len(threads) - 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == len(threads)
+    assert cache.stats()['entries'] == 0
+    assert cache.get('d', 's', 'w', 1, lambda: 'reprise') == 'reprise'
+
+
+def test_prefetch_fills_entry_in_background():
+    cache = SharedCache()
+    assert cache.prefetch('d', 's', 'w', 1, lambda: 'voisine', size=10)
+    cache._prefetcher.shutdown(wait=True)
+    assert not cache.prefetch('d', 's', 'w', 1, lambda: 'voisine', size=10)
+    assert cache.get('d', 's', 'w', 1, lambda: pytest.fail("entrée attendue en cache")) == 'voisine'
@@ -0,0 +1,31 @@
+"""Non-régression du démarrage à froid : écran de connexion sans bibliothèque lourde, dans le budget.
+
+Les mesures sont celles de ``benchmarks/bench_cold_start.py``, chacune dans
+un processus neuf. Le budget de temps dépend de la machine : il n'est
+vérifié que sur demande, sur une machine au repos :
+
+    AGROMET_BENCH=1 python -m pytest tests
+"""
+import os
+import statistics
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from bench_cold_start import BUDGET_SECONDS, ROOT, measure  # noqa: E402
+
+# Processus mesurés (médiane) pour lisser le bruit de la machine
+RUNS = 3
+
+
+@pytest.mark.skipif(os.environ.get('AGROMET_BENCH', '0') != '1', reason="mesure de temps : AGROMET_BENCH=1 pour l'activer")
+def test_login_screen_within_budget():
+    runs = [measure(os.path.join(ROOT, 'code.py')) for _ in range(RUNS)]
+    seconds = statistics.median(run['seconds'] for run in runs)
+    assert seconds <= BUDGET_SECONDS, f"écran de connexion en {seconds:.3f} s (budget {BUDGET_SECONDS:.2f} s)"
+
+
+def test_no_heavy_module_before_login():
+    assert measure(os.path.join(ROOT, 'code.py'))['modules'] == []
@@ -0,0 +1,78 @@
+"""Cumuls décadaires : la mise à jour incrémentale égale un recalcul complet."""
+import numpy as np
+import pytest
+
+from agromet.dekads import DekadAggregator, dekad_bounds, dekad_of
+from agromet.store import StationStore
+
+STATION = 'Dimbokro'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StationStore(str(tmp_path))
+    dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2025-06-30') + 1)
+    rng = np.random.default_rng(4)
+    rain = rng.gamma(0.6, 8.0, dates.size).astype(np.float32)
+    rain[rng.random(dates.size) < 0.1] = np.nan
+    store.write(STATION, dates, {'rain': rain})
+    return store
+
+
+def assert_same(incremental, full):
+    assert incremental.first_year == full.first_year
+    np.testing.assert_array_equal(incremental.counts, full.counts)
+    np.testing.assert_allclose(incremental.totals, full.totals)
+
+
+def test_dekad_of_and_bounds():
+    dates = np.array(['2025-01-01', '2025-01-10', '2025-01-11', '2025-02-21', '2025-02-28', '2025-12-31'], dtype='datetime64[D]')
+    np.testing.assert_array_equal(dekad_of(dates), [0, 0, 1, 5, 5, 35])
+    assert dekad_bounds('2025-02-25') == (np.datetime64('2025-02-21'), np.datetime64('2025-02-28'))
+    assert dekad_bounds('2024-02-21')[1] == np.datetime64('2024-02-29')
+
+
+def test_late_days_reread_only_the_changed_dekads(store, monkeypatch):
+    aggregator = DekadAggregator(store)
+    aggregator.station(STATION)
+
+    # Pluie en retard au milieu d'une décade passée, et correction d'un jour déjà observé
+    store.write(STATION, np.array(['2024-03-15'], dtype='datetime64[D]'), {'rain': np.array([42.0], np.float32)})
+    store.write(STATION, np.array(['2024-11-02'], dtype='datetime64[D]'), {'rain': np.array([np.nan], np.float32)})
+
+    reads = []
+    read = store.read
+    monkeypatch.setattr(store, 'read', lambda station, start, end, columns=None: reads.append((start, end)) or read(station, start, end, columns))
+    incremental = aggregator.station(STATION)
+
+    # Relecture bornée aux décades modifiées (du 11 mars au 10 novembre)
+    assert reads == [(np.datetime64('2024-03-11'), np.datetime64('2024-11-10'))]
+    monkeypatch.undo()
+    assert_same(incremental, DekadAggregator(store).station(STATION))
+    assert incremental.version == store.version(STATION)
+
+
+def test_new_days_and_new_year_match_full_recompute(store):
+    aggregator = DekadAggregator(store)
+    aggregator.station(STATION)
+
+    dates = np.arange(np.datetime64('2025-07-01'), np.datetime64('2026-01-15') + 1)
+    store.write(STATION, dates, {'rain': np.linspace(0, 20, dates.size).astype(np.float32)})
+    store.write(STATION, np.array(['2024-12-31'], dtype='datetime64[D]'), {'rain': np.array([7.5], np.float32)})
+
+    incremental = aggregator.station(STATION)
+    assert_same(incremental, DekadAggregator(store).station(STATION))
+    assert np.isnan(incremental.years(2026, 2027)[0, 2])
+    assert aggregator.station(STATION) is incremental
+
+
+def test_region_frame_matches_after_update(store):
+    aggregator = DekadAggregator(store)
+    normal = np.full(36, 30.0)
+    aggregator.region_frame([STATION], 2024, normal)
+    store.write(STATION, np.array(['2024-06-05'], dtype='datetime64[D]'), {'rain': np.array([80.0], np.float32)})
+
+    incremental = aggregator.region_frame([STATION], 2024, normal)
+    full = DekadAggregator(store).region_frame([STATION], 2024, normal)
+    np.testing.assert_allclose(incremental['rain_obs'], full['rain_obs'])
+    np.testing.assert_allclose(incremental['rain_dev'], full['rain_dev'])
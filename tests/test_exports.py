@@ -0,0 +1,116 @@
+"""Exports par morceaux : mêmes lignes qu'un tableau unique, un seul en-tête, anciennes versions supprimées."""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import load_workbook
+
+from agromet.exports import (EXPORT_LABELS, ExportQueue, dekad_chunks, export_path, observation_chunks, write_csv,
+                             write_excel, write_parquet)
+from agromet.normals import build_normals
+from agromet.schema import to_display
+from agromet.stations import STATIONS_DATA
+from agromet.store import StationStore
+from agromet.synthetic import synthesize_weather
+
+REGION = next(iter(STATIONS_DATA))
+STATIONS = list(STATIONS_DATA[REGION])
+START, END = '2023-11-20', '2025-02-10'
+# Décades de la plage par station, sur trois années : un morceau par station
+N_ROWS_PER_STATION = 36 * 3
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StationStore(str(tmp_path))
+    dates = np.arange(np.datetime64('2023-01-01'), np.datetime64('2025-03-31') + 1)
+    drawn = synthesize_weather(STATIONS, dates)
+    for row, station in enumerate(STATIONS):
+        store.write(station, dates, {name: values[row] for name, values in drawn.items()})
+    return store
+
+
+@pytest.fixture
+def normals(store):
+    return build_normals(store, STATIONS, 2023, 2024)
+
+
+def single_frame(chunks):
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+def display(frame):
+    return to_display(frame).rename(columns=EXPORT_LABELS)
+
+
+def assert_same_rows(frame, reference):
+    # Les catégories propres à chaque morceau ne sont pas comparées : seul le texte écrit compte
+    pd.testing.assert_frame_equal(display(frame).astype(str), display(reference).astype(str))
+
+
+@pytest.mark.parametrize('chunk_rows', [50, 500])
+def test_observation_chunks_match_one_frame(store, chunk_rows):
+    # 50 lignes : par station et fenêtres de dates ; 500 : par groupes de stations
+    chunks = list(observation_chunks(store, REGION, START, END, chunk_rows=chunk_rows))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= chunk_rows for chunk in chunks)
+    reference = single_frame(observation_chunks(store, REGION, START, END, chunk_rows=10 ** 9))
+    assert_same_rows(single_frame(chunks), reference)
+
+
+def test_dekad_chunks_match_one_frame(store, normals):
+    chunks = list(dekad_chunks(store, normals, REGION, START, END, chunk_rows=N_ROWS_PER_STATION))
+    assert len(chunks) == len(STATIONS)
+    reference = single_frame(dekad_chunks(store, normals, REGION, START, END, chunk_rows=10 ** 9))
+    assert_same_rows(single_frame(chunks), reference)
+
+
+def test_multi_chunk_csv_has_one_header(store, tmp_path):
+    path = tmp_path / 'export.csv'
+    write_csv(observation_chunks(store, REGION, START, END, chunk_rows=50), path)
+    reference = display(single_frame(observation_chunks(store, REGION, START, END, chunk_rows=10 ** 9)))
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    header = ','.join(reference.columns)
+    assert lines.count(header) == 1 and lines[0] == header
+    written = pd.read_csv(path, keep_default_na=False, dtype=str)
+    assert len(written) == len(reference)
+    assert written.iloc[:, :3].values.tolist() == reference.iloc[:, :3].astype(str).values.tolist()
+
+
+def test_multi_chunk_excel_has_one_header(store, tmp_path):
+    path = tmp_path / 'export.xlsx'
+    write_excel(observation_chunks(store, REGION, START, END, chunk_rows=50), path, 'Observations')
+    reference = display(single_frame(observation_chunks(store, REGION, START, END, chunk_rows=10 ** 9)))
+
+    rows = list(load_workbook(path, read_only=True).worksheets[0].iter_rows(values_only=True))
+    assert rows.count(tuple(reference.columns)) == 1 and rows[0] == tuple(reference.columns)
+    assert len(rows) == len(reference) + 1
+    assert [list(row[:3]) for row in rows[1:]] == reference.iloc[:, :3].values.tolist()
+
+
+def test_multi_chunk_parquet_matches_one_frame(store, normals, tmp_path):
+    path = tmp_path / 'export.parquet'
+    write_parquet(dekad_chunks(store, normals, REGION, START, END, chunk_rows=N_ROWS_PER_STATION), path)
+    reference = single_frame(dekad_chunks(store, normals, REGION, START, END, chunk_rows=10 ** 9))
+
+    assert pq.ParquetFile(path).num_row_groups == len(STATIONS)
+    written = pq.read_table(path).to_pandas()
+    assert_same_rows(written, reference)
+
+
+def test_prune_removes_older_versions_and_expired_exports(tmp_path):
+    queue = ExportQueue(str(tmp_path))
+    request = ('observations', REGION, START, END, 'csv')
+    old, other = export_path(str(tmp_path), *request, 'ancienne'), export_path(str(tmp_path), 'dekads', REGION, START, END, 'csv', 'v1')
+    expired = export_path(str(tmp_path), 'observations', REGION, '2020-01-01', '2020-12-31', 'csv', 'v1')
+    os.makedirs(os.path.dirname(old))
+    for path in (old, other, expired):
+        open(path, 'w').close()
+    os.utime(expired, (0, 0))
+
+    queue.prune(request + ('nouvelle',))
+    assert not os.path.exists(old) and not os.path.exists(expired)
+    assert os.path.exists(other)
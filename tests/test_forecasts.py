@@ -0,0 +1,134 @@
+"""Prévisions : requêtes simultanées au serveur simulé, repli sur le cache sans service, persistance."""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from agromet import forecasts
+from agromet.forecasts import FORECAST_DAYS, SEASONAL_MONTHS, ForecastProvider, stub_payload
+from agromet.stations import STATIONS_DATA
+
+POINTS = {station: point for stations in STATIONS_DATA.values() for station, point in stations.items()}
+# Latence simulée par requête : les requêtes d'un rafraîchissement se chevauchent
+DELAY = 0.2
+TIMEOUT = 30
+
+
+class Stub:
+    """Serveur de prévisions simulées dans sa propre boucle, qui compte ses connexions ouvertes."""
+
+    def __init__(self):
+        self.active = self.peak = 0
+        self._writers = set()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._server = self._run(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(TIMEOUT)
+
+    async def _handle(self, reader, writer):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self._writers.add(writer)
+        try:
+            await forecasts._serve_stub_connection(reader, writer, DELAY)
+        finally:
+            self.active -= 1
+            self._writers.discard(writer)
+
+    async def _stop(self):
+        # Arrêt du service : plus d'écoute, connexions persistantes coupées
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    def stop(self):
+        if self._server.is_serving():
+            self._run(self._stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@pytest.fixture
+def stub():
+    stub = Stub()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def provider(stub, tmp_path):
+    provider = ForecastProvider(str(tmp_path), stub.url, POINTS)
+    yield provider
+    provider.close()
+
+
+def forecast_dates():
+    return np.datetime64('today', 'D') + np.arange(FORECAST_DAYS)
+
+
+def expected_rain(station):
+    point = POINTS[station]
+    payload = stub_payload(f"/v1/forecast?latitude={point['lat']}&longitude={point['lon']}&forecast_days={FORECAST_DAYS}")
+    return np.array(payload['daily']['precipitation_sum'], dtype=np.float32)
+
+
+def test_refresh_fetches_all_points_concurrently(provider, stub):
+    assert provider.refresh('daily').result(TIMEOUT) == len(POINTS)
+    assert stub.peak > 1
+    assert provider.errors == 0
+
+    values, received = provider.daily(POINTS, forecast_dates())
+    assert received is not None
+    for row, station in enumerate(POINTS):
+        np.testing.assert_array_equal(values['rain'][row], expected_rain(station))
+    assert not np.isnan(values['wind']).any()
+    assert provider.version('daily') == 1
+
+    # Mêmes prévisions reçues : pas de nouvelle version (caches des figures gardés)
+    assert provider.refresh('daily').result(TIMEOUT) == len(POINTS)
+    assert provider.version('daily') == 1
+
+
+def test_stale_forecasts_are_served_while_service_is_down(provider, stub, monkeypatch):
+    provider.refresh('daily').result(TIMEOUT)
+    before, received = provider.daily(POINTS, forecast_dates())
+    stub.stop()
+
+    # Prévisions périmées : servies telles quelles, rafraîchissement lancé en arrière-plan
+    monkeypatch.setitem(forecasts.MAX_AGE_SECONDS, 'daily', -1)
+    values, stale_received = provider.daily(POINTS, forecast_dates())
+    np.testing.assert_array_equal(values['rain'], before['rain'])
+    assert stale_received == received
+
+    deadline = time.monotonic() + TIMEOUT
+    while provider.errors < len(POINTS) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert provider.errors == len(POINTS)
+
+    # Échec de toutes les requêtes : les prévisions précédentes restent servies
+    values, _ = provider.daily(POINTS, forecast_dates())
+    np.testing.assert_array_equal(values['tmax'], before['tmax'])
+    assert provider.version('daily') == 1
+
+
+def test_saved_forecasts_reload_without_service(provider, tmp_path):
+    for kind in ('daily', 'seasonal'):
+        provider.refresh(kind).result(TIMEOUT)
+    months = np.datetime64('today', 'M') + 1 + np.arange(SEASONAL_MONTHS)
+    daily, received = provider.daily(POINTS, forecast_dates())
+    seasonal, _ = provider.seasonal(POINTS, months, members=True)
+
+    reloaded = ForecastProvider(str(tmp_path), None, POINTS)
+    reloaded_daily, reloaded_received = reloaded.daily(POINTS, forecast_dates())
+    reloaded_seasonal, _ = reloaded.seasonal(POINTS, months, members=True)
+    assert reloaded_received == received
+    for name in daily:
+        np.testing.assert_array_equal(reloaded_daily[name], daily[name])
+    for name in seasonal:
+        assert seasonal[name].shape[0] == forecasts.STUB_MEMBERS
+        np.testing.assert_array_equal(reloaded_seasonal[name], seasonal[name])
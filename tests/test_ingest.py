@@ -0,0 +1,138 @@
+"""Acquisition des observations : validation, doublons, observations en retard ou corrigées, filigrane."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from agromet.ingest import Ingestor, parse_csv, parse_synop, validate
+from agromet.store import StationStore
+
+TODAY = np.datetime64(date.today(), 'D')
+STATION = 'Dimbokro'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StationStore(str(tmp_path))
+
+
+def ingest_csv(store, text):
+    return Ingestor(store).ingest_batches(parse_csv(text))
+
+
+def day(offset):
+    return TODAY - offset
+
+
+def read(store, start, end, columns=('tmin', 'tmax', 'rain')):
+    return store.read(STATION, start, end, columns=list(columns))[1]
+
+
+def test_out_of_order_records_are_stored_by_date(store):
+    report = ingest_csv(store, f"""station,date,tmin,tmax,rain
+{STATION},{day(3)},23,33,0
+{STATION},{day(5)},21,31,5
+{STATION},{day(4)},22,32,
+""")
+    assert (report.accepted, report.appended, report.late) == (3, 3, 0)
+    values = read(store, day(5), day(3))
+    np.testing.assert_array_equal(values['tmax'], [31, 32, 33])
+    np.testing.assert_array_equal(values['rain'], [5, np.nan, 0])
+    manifest = store.manifest(STATION)
+    assert (manifest['first_date'], manifest['last_date']) == (str(day(5)), str(day(3)))
+    assert manifest['observed']
+
+
+def test_late_correction_keeps_absent_variables(store):
+    ingest_csv(store, f"""station,date,tmin,tmax,rain
+{STATION},{day(5)},21,31,5
+{STATION},{day(4)},22,32,1
+{STATION},{day(3)},23,33,0
+""")
+    version = store.version(STATION)
+
+    # Correction de la pluie d'un jour passé : les températures sont gardées
+    report = ingest_csv(store, f"station,date,rain\n{STATION},{day(4)},12.5\n")
+    assert (report.appended, report.late) == (0, 1)
+    values = read(store, day(5), day(3))
+    np.testing.assert_array_equal(values['tmin'], [21, 22, 23])
+    np.testing.assert_array_equal(values['rain'], [5, 12.5, 0])
+    # Seul le jour corrigé est signalé, et le filigrane ne recule pas
+    assert store.changes_since(STATION, version) == (day(4), day(4))
+    assert store.manifest(STATION)['last_date'] == str(day(3))
+    assert store.changes_since(STATION, store.version(STATION)) is None
+
+
+def test_last_record_of_a_day_wins_within_a_batch(store):
+    report = ingest_csv(store, f"""station,date,tmax
+{STATION},{day(2)},30
+{STATION},{day(2)},31.5
+""")
+    assert report.accepted == 1
+    np.testing.assert_array_equal(read(store, day(2), day(2))['tmax'], [31.5])
+
+
+def test_validate_rejects_unknown_station_and_out_of_history_dates():
+    records = next(parse_csv(f"""station,date,tmin,tmax,rain
+Inconnue,{day(1)},20,30,0
+{STATION},{TODAY + 1},20,30,0
+{STATION},1900-01-01,20,30,0
+{STATION},pas une date,20,30,0
+{STATION},{day(1)},,,
+{STATION},{day(2)},25,999,0
+{STATION},{day(3)},35,30,2
+"""))
+    valid, rejected = validate(records, TODAY)
+
+    assert rejected == {'station inconnue': 1, 'date hors historique': 2, 'date invalide': 1,
+                        'aucune mesure': 1, 'tmax hors bornes': 1, 'tmin > tmax': 1}
+    assert len(valid) == 2
+    # Mesure hors bornes ou températures inversées : la mesure devient manquante
+    assert np.isnan(valid['tmax']).all()
+    assert valid['tmin'].isna().tolist() == [False, True]
+    assert valid['rain'].tolist() == [0, 2]
+
+
+def test_synop_messages_with_missing_groups(store):
+    text = f"""SYNOP {day(2)}
+{STATION} TN=21.5 TX=32.0 RR=12.4 DD=SW=
+Bocanda TN=22.0 TX=// RR=0.0=
+NNNN
+"""
+    report = Ingestor(store).ingest_batches(parse_synop(text))
+    assert (report.accepted, report.appended) == (2, 2)
+    values = read(store, day(2), day(2), ('tmin', 'tmax', 'rain', 'wind', 'wind_dir'))
+    assert (values['tmin'][0], values['tmax'][0], values['rain'][0]) == (21.5, 32.0, np.float32(12.4))
+    assert np.isnan(values['wind'][0])
+    _, bocanda = store.read('Bocanda', day(2), day(2), columns=['tmax', 'wind_dir'])
+    assert np.isnan(bocanda['tmax'][0]) and bocanda['wind_dir'][0] == 255
+
+
+def test_observed_station_gets_no_synthetic_days(store):
+    # Amorçage simulé jusqu'à J-5, puis une observation à J-2
+    store.ensure_history(STATION, day(5))
+    seeded = store.manifest(STATION)
+    report = ingest_csv(store, f"station,date,tmax\n{STATION},{day(2)},30\n")
+    assert report.appended == 1
+    version = store.version(STATION)
+
+    # La station alimentée par le service n'est plus complétée
+    store.ensure_history(STATION, TODAY)
+    manifest = store.manifest(STATION)
+    assert store.version(STATION) == version
+    assert manifest['last_date'] == str(day(2))
+    assert manifest['synthetic_until'] == seeded['synthetic_until'] == str(day(5))
+    # Jours sans observation : manquants, pas simulés
+    values = read(store, day(4), day(2))
+    assert np.isnan(values['tmax'][:2]).all() and values['tmax'][2] == 30
+    assert np.isnan(values['tmin']).all()
+
+
+def test_observation_over_a_synthetic_day_does_not_reuse_simulated_values(store):
+    store.ensure_history(STATION, day(1))
+    report = ingest_csv(store, f"station,date,tmax\n{STATION},{day(3)},30\n")
+    # Un jour simulé remplacé n'est ni en retard ni corrigé
+    assert (report.appended, report.late) == (1, 0)
+    values = read(store, day(3), day(3))
+    assert values['tmax'][0] == 30
+    assert np.isnan(values['tmin'][0]) and np.isnan(values['rain'][0])
@@ -0,0 +1,157 @@
+"""Contrôle qualité : indicateurs et valeurs bouchées de séries fixes, retraitement incrémental."""
+import numpy as np
+import pytest
+
+from agromet.quality import (FLAG_ESTIMATED, FLAG_INTERPOLATED, FLAG_MISSING, FLAG_RANGE, FLAG_SPATIAL, FLAG_STEP,
+                             PAGE_DAYS, QualityControl, check_series)
+from agromet.stations import all_stations
+from agromet.store import COLUMNS, FLAG_COLUMNS, StationStore
+from agromet.synthetic import synthesize_weather
+
+# Trois stations voisines les unes des autres, de même poids
+NEIGHBOURS = np.array([[1, 2], [0, 2], [0, 1]])
+WEIGHTS = np.ones((3, 2))
+N_DAYS = 10
+
+
+def series(value, **changes):
+    # Tableau (3 stations, N_DAYS jours) constant, modifié aux (station, jour) donnés
+    column = np.full((3, N_DAYS), value, dtype=np.float32)
+    for position, new in changes.items():
+        station, day = (int(part) for part in position[1:].split('_'))
+        column[station, day] = new
+    return column
+
+
+def check(**values):
+    return check_series(values, NEIGHBOURS, WEIGHTS)
+
+
+def only(flags, station, day):
+    # Indicateur de (station, jour), et vérification que toutes les autres valeurs sont propres
+    others = flags.copy()
+    others[station, day] = 0
+    assert not others.any()
+    return flags[station, day]
+
+
+def test_out_of_range_value_is_flagged_and_interpolated():
+    checked, flags = check(tmax=series(30, s0_2=60))
+    assert only(flags['tmax'], 0, 2) == FLAG_RANGE | FLAG_INTERPOLATED
+    assert checked['tmax'][0, 2] == 30
+
+
+def test_isolated_spike_is_flagged_and_interpolated():
+    checked, flags = check(tmax=series(30, s1_5=45))
+    assert only(flags['tmax'], 1, 5) == FLAG_STEP | FLAG_INTERPOLATED
+    assert checked['tmax'][1, 5] == 30
+
+
+def test_step_within_limit_is_kept():
+    checked, flags = check(tmax=series(30, s1_5=36))
+    assert not flags['tmax'].any()
+    assert checked['tmax'][1, 5] == 36
+
+
+def test_value_far_from_neighbours_is_flagged():
+    # Écart de 10 °C : pas un pic (limite 10), mais au-delà de la tolérance spatiale (8)
+    checked, flags = check(tmax=series(30, s2_7=40))
+    assert only(flags['tmax'], 2, 7) == FLAG_SPATIAL | FLAG_INTERPOLATED
+    assert checked['tmax'][2, 7] == 30
+
+
+def test_rain_above_neighbours_is_replaced_by_their_estimate():
+    rain = series(0)
+    rain[:, 4] = [150, 10, 20]
+    checked, flags = check(rain=rain)
+    # La pluie n'est pas interpolée : estimation des voisines (moyenne pondérée)
+    assert only(flags['rain'], 0, 4) == FLAG_SPATIAL | FLAG_ESTIMATED
+    assert checked['rain'][0, 4] == 15
+
+
+def test_inverted_temperatures_reject_both():
+    checked, flags = check(tmin=series(20, s0_7=26), tmax=series(30, s0_7=25))
+    assert only(flags['tmin'], 0, 7) == FLAG_RANGE | FLAG_INTERPOLATED
+    assert only(flags['tmax'], 0, 7) == FLAG_RANGE | FLAG_INTERPOLATED
+    assert (checked['tmin'][0, 7], checked['tmax'][0, 7]) == (20, 30)
+
+
+def test_short_gap_is_interpolated_linearly():
+    tmax = np.tile(np.arange(30, 30 + N_DAYS, dtype=np.float32), (3, 1))
+    tmax[0, 2:4] = np.nan
+    checked, flags = check(tmax=tmax)
+    np.testing.assert_array_equal(flags['tmax'][0, 2:4], [FLAG_INTERPOLATED] * 2)
+    np.testing.assert_array_equal(checked['tmax'][0], np.arange(30, 30 + N_DAYS))
+
+
+def test_long_gap_is_estimated_from_neighbours():
+    tmax = series(30)
+    tmax[0, 2:7] = np.nan
+    tmax[1, 2:7] = 28
+    tmax[2, 2:7] = 33
+    checked, flags = check(tmax=tmax)
+    np.testing.assert_array_equal(flags['tmax'][0, 2:7], [FLAG_ESTIMATED] * 5)
+    np.testing.assert_array_equal(checked['tmax'][0, 2:7], [30.5] * 5)
+
+
+def test_day_missing_everywhere_stays_missing():
+    rain = series(2.0)
+    rain[:, 0] = np.nan
+    checked, flags = check(rain=rain)
+    np.testing.assert_array_equal(flags['rain'][:, 0], [FLAG_MISSING] * 3)
+    assert np.isnan(checked['rain'][:, 0]).all()
+    assert not flags['rain'][:, 1:].any()
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = StationStore(str(tmp_path))
+    dates = np.arange(np.datetime64('2025-01-01'), np.datetime64('2025-04-30') + 1)
+    drawn = synthesize_weather(all_stations(), dates)
+    for row, station in enumerate(all_stations()):
+        source.write(station, dates, {name: values[row] for name, values in drawn.items()})
+    return source
+
+
+def read_all(store):
+    _, values = store.read_many(all_stations(), '2025-01-01', '2025-05-10', columns=COLUMNS + FLAG_COLUMNS)
+    return values
+
+
+def test_incremental_update_matches_full_reprocess(source, tmp_path):
+    until = np.datetime64('2025-05-10')
+    quality = QualityControl(source, StationStore(str(tmp_path), 'quality'))
+    assert not quality.ready()
+    quality.update(until)
+    assert quality.ready()
+    assert quality.update(until) == 0
+
+    # Pic en milieu d'historique, puis une nouvelle journée
+    _, stored = source.read('Gagnoa', '2025-03-10', '2025-03-10', columns=['tmax'])
+    source.write('Gagnoa', np.array(['2025-03-10'], dtype='datetime64[D]'), {'tmax': stored['tmax'] + 20})
+    source.write('Oumé', np.array(['2025-05-01'], dtype='datetime64[D]'), {'tmax': np.array([31], np.float32)})
+    assert quality.update(until) > 0
+
+    full = QualityControl(source, StationStore(str(tmp_path / 'complet'), 'quality'))
+    full.update(until, full=True)
+    incremental, reference = read_all(quality.store), read_all(full.store)
+    for name in reference:
+        np.testing.assert_array_equal(incremental[name], reference[name], err_msg=name)
+
+    row = all_stations().index('Gagnoa')
+    flag = quality.flags(['Gagnoa'], '2025-03-10', '2025-03-10')['tmax'][0, 0]
+    assert flag & (FLAG_STEP | FLAG_SPATIAL | FLAG_RANGE)
+    assert incremental['tmax'][row, 68] != stored['tmax'][0] + 20
+
+
+def test_page_update_leaves_first_pass_to_the_backlog(source, tmp_path):
+    quality = QualityControl(source, StationStore(str(tmp_path), 'quality'))
+    assert quality.update('2025-05-10', max_days=PAGE_DAYS) == 0
+    assert sorted(quality.backlog) == sorted(all_stations())
+    assert not quality.ready()
+
+    quality.update('2025-05-10')
+    source.write('Dimbokro', np.array(['2025-04-20'], dtype='datetime64[D]'), {'rain': np.array([5], np.float32)})
+    assert quality.update('2025-05-10', max_days=PAGE_DAYS) > 0
+    assert quality.backlog == []
+    assert quality.source_version('Dimbokro') == source.version('Dimbokro')